@@ -67,13 +67,15 @@ export const getForexRealtime = async (currencyPairs = null) => {
  * @param {string} chartType - 图表类型：'line'（分时）或'kline'（K线）
  * @param {string} period - 周期：'1min', '5min', '15min', '30min', '1h', '1d'
  * @param {number} count - 数据条数
+ * @param {number} maxPoints - 最大返回点数（可选），超过时由后端降采样
  * @returns {Promise<Object>} 图表数据
  */
 export const getForexChartData = async (
   currencyPair = "USDCNY",
   chartType = "line",
   period = "5min",
-  count = 100
+  count = 100,
+  maxPoints = null
 ) => {
   try {
     const url = "http://localhost:5000/api/forex/chart";
@@ -83,6 +85,9 @@ export const getForexChartData = async (
       period: period,
       count: count,
     };
+    if (maxPoints) {
+      params.max_points = maxPoints;
+    }
 
     const response = await axios.get(url, { params });
     return response.data;
@@ -92,6 +97,34 @@ export const getForexChartData = async (
   }
 };
 
+// 批量获取多个货币对的图表数据（后端合并为一次上游请求）
+export const getForexChartsBatch = async (
+  currencyPairs = ["USDCNY", "EURUSD", "GBPUSD", "USDJPY"],
+  chartType = "line",
+  period = "5min",
+  count = 100,
+  maxPoints = null
+) => {
+  try {
+    const url = "http://localhost:5000/api/forex/charts";
+    const params = {
+      currency_pairs: currencyPairs.join(","),
+      chart_type: chartType,
+      period: period,
+      count: count,
+    };
+    if (maxPoints) {
+      params.max_points = maxPoints;
+    }
+
+    const response = await axios.get(url, { params });
+    return response.data;
+  } catch (error) {
+    console.error("批量获取外汇图表数据失败：", error);
+    throw error;
+  }
+};
+
 /**
  * 获取外汇技术指标数据
  * @param {string} currencyPair - 货币对
@@ -147,3 +180,47 @@ export const getForexMultiIndicators = async (
     throw error;
   }
 };
+
+/**
+ * 订阅外汇实时行情与新收盘K线推送（Server-Sent Events）
+ * 服务端首次发送完整快照（snapshot），之后只发送变化的字段（delta）；
+ * 断线后浏览器自动重连并携带最后收到的序号，服务端据此补发增量
+ * @param {Array} currencyPairs - 货币对数组，如['USDCNY', 'EURUSD']
+ * @param {Object} handlers - { onQuote(quote), onBar({code, period, bar}) }，quote 为合并后的完整行情
+ * @param {Array} barPeriods - 推送的K线周期，如['1min']，为空时只推送行情
+ * @returns {EventSource} 推送连接，调用 close() 取消订阅
+ */
+export const subscribeForexStream = (
+  currencyPairs,
+  { onQuote, onBar } = {},
+  barPeriods = ["1min"]
+) => {
+  const params = new URLSearchParams({
+    currency_pairs: currencyPairs.join(","),
+    bar_periods: barPeriods.join(","),
+  });
+  const source = new EventSource(
+    `http://localhost:5000/api/forex/stream?${params.toString()}`
+  );
+
+  // 将增量合并为完整行情 { "USDCNY.FX": {latest, changeRatio, ...} }
+  const quotes = {};
+  const applyQuotes = (msg, replace) => {
+    Object.entries(msg.q).forEach(([code, fields]) => {
+      quotes[code] = replace ? { ...fields } : { ...quotes[code], ...fields };
+      if (onQuote) {
+        onQuote({ code, ...quotes[code], seq: msg.seq, timestamp: msg.t });
+      }
+    });
+  };
+
+  source.addEventListener("snapshot", (e) => applyQuotes(JSON.parse(e.data), true));
+  source.addEventListener("delta", (e) => applyQuotes(JSON.parse(e.data), false));
+  if (onBar) {
+    source.addEventListener("bar", (e) => onBar(JSON.parse(e.data)));
+  }
+  source.onerror = (error) => {
+    console.error("外汇行情推送连接异常：", error);
+  };
+  return source;
+};
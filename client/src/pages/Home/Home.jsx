@@ -7,6 +7,7 @@ import {
   getForexRealtime,
   getForexChartData,
   getForexMultiIndicators,
+  subscribeForexStream,
 } from "../../components/Api/api";
 
 const Home = () => {
@@ -517,15 +518,27 @@ const Home = () => {
       addChartTypeListeners();
     }, 100);
 
-    // 定时更新实时数据
-    const realtimeInterval = setInterval(fetchRealtimeData, 30000); // 30秒更新一次
-
-    // 定时更新图表数据（分时线模式下）
-    const chartUpdateInterval = setInterval(() => {
-      if (currentChartType === "line") {
-        updateChartData(currentCurrencyPair, currentChartType);
+    // 订阅服务端推送：行情变化时更新状态栏，新1分钟K线收盘时更新图表（分时线模式下）
+    const forexStream = subscribeForexStream(
+      ["USDCNY", "EURUSD", "GBPUSD", "USDJPY"],
+      {
+        onQuote: (d) => {
+          const k = d.code.replace(".FX", "");
+          setRealtimeData((prev) => ({
+            ...prev,
+            [k]: { close: d.latest, change_rate: d.changeRatio },
+          }));
+        },
+        onBar: (d) => {
+          if (
+            currentChartType === "line" &&
+            d.code === currentCurrencyPair + ".FX"
+          ) {
+            updateChartData(currentCurrencyPair, currentChartType);
+          }
+        },
       }
-    }, 60000); // 1分钟更新一次
+    );
 
     // 初始化词云图
     const wordCloudChart = echarts.init(
@@ -643,8 +656,7 @@ const Home = () => {
       }
       window.removeEventListener("resize", resizeMain);
       window.removeEventListener("resize", resizeOthers);
-      clearInterval(realtimeInterval);
-      clearInterval(chartUpdateInterval);
+      forexStream.close();
 
       if (mainChartRef.current) {
         mainChartRef.current.dispose();
@@ -4,14 +4,86 @@ from routes.portfolio_routes import portfolio_bp
 from routes.risk_routes import risk_bp
 from routes.forex_routes import forex_bp
 from services.forex_service import init_forex_service
+from services.forex_service_async import init_async_forex_service
 import os
 
 app = Flask(__name__)
 CORS(app)  # 启用CORS支持
 
+
+def _env_pairs(name, default=""):
+    """读取逗号分隔的货币对环境变量，USDCNY 与 USDCNY.FX 两种写法均可"""
+    pairs = (p.strip().upper() for p in os.getenv(name, default).split(","))
+    return [p if p.endswith(".FX") else p + ".FX" for p in pairs if p]
+
+
 # 初始化外汇服务（需要配置同花顺refresh_token）
 IFIND_REFRESH_TOKEN = os.getenv("IFIND_REFRESH_TOKEN", "your_refresh_token_here")
-init_forex_service(IFIND_REFRESH_TOKEN)
+forex_service = init_forex_service(
+    IFIND_REFRESH_TOKEN,
+    pool_connections=int(os.getenv("IFIND_POOL_CONNECTIONS", 4)),
+    pool_maxsize=int(os.getenv("IFIND_POOL_MAXSIZE", 16)),
+    connect_timeout=float(os.getenv("IFIND_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.getenv("IFIND_READ_TIMEOUT", 10)),
+    bar_store_dir=os.getenv(
+        "FOREX_BAR_STORE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bars"),
+    ),
+    indicator_state_path=os.getenv(
+        "FOREX_INDICATOR_STATE_PATH",
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "data", "indicator_state.json"
+        ),
+    ),
+    realtime_coalesce_window=float(os.getenv("FOREX_REALTIME_COALESCE_WINDOW", 0.05)),
+    breaker_failure_threshold=int(os.getenv("IFIND_BREAKER_FAILURES", 5)),
+    breaker_reset_timeout=float(os.getenv("IFIND_BREAKER_RESET_TIMEOUT", 30)),
+    rate_limit=float(os.getenv("IFIND_RATE_LIMIT", 10)),
+    rate_burst=int(os.getenv("IFIND_RATE_BURST", 20)),
+    record_cassette=os.getenv("IFIND_RECORD_CASSETTE"),
+    replay_cassette=os.getenv("IFIND_REPLAY_CASSETTE"),
+    replay_speed=float(os.getenv("IFIND_REPLAY_SPEED", 1)),
+    minute_chunk_bars=int(os.getenv("IFIND_MINUTE_CHUNK_BARS", 5000)),
+    chunk_workers=int(os.getenv("IFIND_CHUNK_WORKERS", 4)),
+)
+
+
+def start_background_tasks():
+    """启动令牌刷新、实时行情轮询与历史K线回填等后台任务"""
+    # 后台线程在令牌过期前主动刷新，避免用户请求等待刷新
+    forex_service.start_token_refresher(
+        lead_seconds=float(os.getenv("IFIND_TOKEN_REFRESH_LEAD", 300))
+    )
+    # 后台轮询实时行情，/realtime 直接读取最新快照；间隔为0时关闭
+    quote_poll_interval = float(os.getenv("FOREX_QUOTE_POLL_INTERVAL", 3))
+    if quote_poll_interval > 0:
+        forex_service.start_quote_poller(
+            pairs=_env_pairs("FOREX_QUOTE_POLL_PAIRS", "USDCNY,EURUSD,GBPUSD,USDJPY"),
+            interval=quote_poll_interval,
+        )
+    # 后台回填历史K线（新部署冷启动），未配置货币对时不回填
+    backfill_pairs = _env_pairs("FOREX_BACKFILL_PAIRS")
+    if backfill_pairs:
+        forex_service.start_backfill(
+            pairs=backfill_pairs,
+            minute_days=float(os.getenv("FOREX_BACKFILL_MINUTE_DAYS", 60)),
+            daily_years=float(os.getenv("FOREX_BACKFILL_DAILY_YEARS", 5)),
+            workers=int(os.getenv("FOREX_BACKFILL_WORKERS", 4)),
+        )
+
+
+# debug 模式下 Werkzeug 重载器会在子进程（WERKZEUG_RUN_MAIN=true）中重新执行本模块，
+# 父进程只监视文件变化；后台任务只在处理请求的进程中启动，避免重复轮询上游、
+# 重复刷新令牌以及两个回填任务同时写入K线存储
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    start_background_tasks()
+
+# 异步服务与同步服务共享令牌，用于组合接口的并发上游请求
+init_async_forex_service(
+    forex_service,
+    pool_maxsize=int(os.getenv("IFIND_ASYNC_POOL_MAXSIZE", 32)),
+    pool_per_host=int(os.getenv("IFIND_POOL_MAXSIZE", 16)),
+)
 
 # 注册蓝图路由
 app.register_blueprint(portfolio_bp, url_prefix="/api/portfolio")
@@ -0,0 +1,246 @@
+"""
+外汇数据处理性能基准脚本
+不依赖同花顺接口，使用合成K线数据对比本地实现与逐元素 Python 实现的吞吐量
+
+用法：
+    python benchmark_forex.py                  # 运行全部基准
+    python benchmark_forex.py indicators       # 只运行技术指标基准
+    python benchmark_forex.py format           # 只运行图表数据格式化基准
+    python benchmark_forex.py upstream         # 通过本地同花顺接口替身压测请求链路
+"""
+
+import sys
+import threading
+import time
+import numpy as np
+from utils.bar_utils import Bars, bars_to_raw, format_bars
+from utils.indicators import compute_indicator
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+
+
+def make_bars(count, seed=42):
+    """生成 count 根合成1分钟K线"""
+    rng = np.random.default_rng(seed)
+    t = 1_700_000_000 - 1_700_000_000 % 60 + np.arange(count, dtype=np.int64) * 60
+    close = 7.1 + np.cumsum(rng.normal(0, 0.0005, count))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0003, count))
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    return Bars(t, open_, high, low, close, np.zeros(count))
+
+
+def timeit(func, min_seconds=0.5):
+    """重复执行 func 至少 min_seconds 秒，返回每秒执行次数"""
+    func()
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs / elapsed
+
+
+def _loop_sma(close, period):
+    out = [None] * len(close)
+    for i in range(period - 1, len(close)):
+        out[i] = sum(close[i - period + 1 : i + 1]) / period
+    return out
+
+
+def _loop_ema(values, period):
+    alpha = 2.0 / (period + 1)
+    out = [values[0]]
+    for v in values[1:]:
+        out.append(alpha * v + (1 - alpha) * out[-1])
+    return out
+
+
+def _loop_ma_macd(close):
+    """逐元素计算 MA20 与 MACD(12,26,9)，作为对照"""
+    ma = _loop_sma(close, 20)
+    fast = _loop_ema(close, 12)
+    slow = _loop_ema(close, 26)
+    dif = [f - s for f, s in zip(fast, slow)]
+    dea = _loop_ema(dif, 9)
+    return ma, [2 * (d - e) for d, e in zip(dif, dea)]
+
+
+def bench_indicators(sizes=(500, 5000, 100000)):
+    """技术指标：一次K线获取计算 MA20 + MACD，对比逐元素实现"""
+    print("技术指标（MA20 + MACD）")
+    print(f"{'K线数':>8} {'本地引擎(次/秒)':>16} {'逐元素(次/秒)':>14} {'加速比':>8}")
+    for size in sizes:
+        bars = make_bars(size)
+        close_list = bars.close.tolist()
+
+        def vectorized():
+            compute_indicator("MA", (20,), bars)
+            compute_indicator("MACD", (12, 26, 9), bars)
+
+        # 校验两种实现结果一致
+        _, loop_macd = _loop_ma_macd(close_list)
+        np_macd = compute_indicator("MACD", (12, 26, 9), bars)["MACD"]
+        assert np.allclose(np_macd, loop_macd, atol=1e-9)
+
+        fast = timeit(vectorized)
+        slow = timeit(lambda: _loop_ma_macd(close_list))
+        print(f"{size:>8} {fast:>16.1f} {slow:>14.1f} {fast / slow:>7.1f}x")
+
+    # 原实现：首页每次刷新调用两次 /multi-indicators，每次分别请求 MA 和 MACD
+    print("每次首页刷新的上游请求数：原实现 4 次，本地计算 1 次（仅增量K线）")
+
+
+def _loop_format_chart_data(raw_data, chart_type="line"):
+    """逐元素格式化图表数据（原实现），作为对照"""
+    formatted = []
+    for tbl in raw_data["tables"]:
+        time_arr = tbl.get("time", [])
+        values = tbl.get("table", {})
+        if chart_type == "kline":
+            opens = values.get("open", [])
+            closes = values.get("latest", []) or values.get("close", [])
+            lows = values.get("low", [])
+            highs = values.get("high", [])
+            vols = values.get("volume", []) or []
+            for i in range(len(time_arr)):
+                if (
+                    i < len(opens)
+                    and i < len(closes)
+                    and i < len(lows)
+                    and i < len(highs)
+                    and opens[i] is not None
+                    and closes[i] is not None
+                    and lows[i] is not None
+                    and highs[i] is not None
+                ):
+                    v = float(vols[i]) if i < len(vols) and vols[i] is not None else 0.0
+                    formatted.append(
+                        [
+                            time_arr[i],
+                            float(opens[i]),
+                            float(closes[i]),
+                            float(lows[i]),
+                            float(highs[i]),
+                            v,
+                        ]
+                    )
+        else:
+            price_values = values.get("latest", []) or values.get("close", [])
+            for i in range(len(time_arr)):
+                if i < len(price_values) and price_values[i] is not None:
+                    formatted.append([time_arr[i], float(price_values[i])])
+    formatted.sort(key=lambda x: x[0])
+    return formatted
+
+
+def bench_format(sizes=(500, 5000, 100000)):
+    """图表数据格式化：含缺失值过滤与按时间排序，对比逐元素实现"""
+    header = f"{'K线数':>8} {'类型':>6} {'向量化(次/秒)':>14} {'逐元素(次/秒)':>14} {'加速比':>8}"
+
+    def run(title, prepare, fast_func, slow_func):
+        print(title)
+        print(header)
+        for size in sizes:
+            bars = make_bars(size)
+            # 约 1% 的K线缺失收盘价
+            bars.close[::97] = np.nan
+            data = prepare(bars)
+            for chart_type in ("line", "kline"):
+                assert fast_func(data, chart_type) == slow_func(data, chart_type)
+                fast = timeit(lambda: fast_func(data, chart_type))
+                slow = timeit(lambda: slow_func(data, chart_type))
+                print(
+                    f"{size:>8} {chart_type:>6} {fast:>14.1f} {slow:>14.1f} "
+                    f"{fast / slow:>7.1f}x"
+                )
+
+    # /chart 接口：缓存K线直接格式化，原实现需先还原为接口响应结构再逐元素格式化
+    run(
+        "缓存K线 -> 图表数据（format_bars）",
+        lambda bars: bars,
+        format_bars,
+        lambda bars, chart_type: _loop_format_chart_data(
+            bars_to_raw("USDCNY.FX", bars, "m"), chart_type
+        ),
+    )
+
+
+def _percentile_ms(latencies, q):
+    return np.percentile(np.array(latencies) * 1000, q)
+
+
+def bench_upstream(threads=32, requests_per_thread=10, latency=0.05):
+    """并发请求本地接口替身（固定延迟），对比实时行情请求合并开启与关闭"""
+    stub = start_in_thread(latency=latency)
+    print(f"上游链路（接口替身延迟 {latency * 1000:.0f}ms，{threads} 个并发线程）")
+    print(
+        f"{'场景':>14} {'请求数':>8} {'上游请求':>8} {'p50(ms)':>9} {'p99(ms)':>9} "
+        f"{'吞吐(次/秒)':>12}"
+    )
+
+    def run(title, service, func):
+        service.base_url = stub.url
+        service.get_access_token()
+        before = sum(stub.stats["requests"].values())
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(requests_per_thread):
+                start = time.perf_counter()
+                func(service)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        upstream = sum(stub.stats["requests"].values()) - before
+        print(
+            f"{title:>14} {len(latencies):>8} {upstream:>8} "
+            f"{_percentile_ms(latencies, 50):>9.1f} {_percentile_ms(latencies, 99):>9.1f} "
+            f"{len(latencies) / elapsed:>12.1f}"
+        )
+
+    def realtime(service):
+        service.get_forex_realtime_data("USDCNY.FX,EURUSD.FX")
+
+    run(
+        "实时行情/不合并",
+        IFindForexService(
+            "benchmark", realtime_coalesce_window=0, pool_maxsize=threads, rate_limit=0
+        ),
+        realtime,
+    )
+    run(
+        "实时行情/合并",
+        IFindForexService("benchmark", pool_maxsize=threads, rate_limit=0),
+        realtime,
+    )
+    stub.shutdown()
+
+
+BENCHMARKS = {
+    "indicators": bench_indicators,
+    "format": bench_format,
+    "upstream": bench_upstream,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,53 @@
-from flask import request, jsonify
-from services.forex_service import get_forex_service
+from flask import request, jsonify, Response, stream_with_context
+from services.forex_service import (
+    get_forex_service,
+    DEFAULT_QUOTE_PAIRS,
+    HIGH_FREQUENCY_PATH,
+    MINUTE_PERIODS,
+    KLINE_PERIODS,
+    REALTIME_PATH,
+)
+from services.forex_service_async import get_async_forex_service
+from services.circuit_breaker import CircuitOpenError
+from services.quote_stream import format_sse
+from utils.chart_encoding import (
+    bars_to_columns,
+    encode_columns,
+    msgpack,
+    negotiate_format,
+    pack,
+    raw_to_columns,
+)
+from utils.indicators import indicator_labels, parse_indicator_specs
 import traceback
+import time
+
+# 批量图表接口一次最多请求的货币对数量
+MAX_BATCH_PAIRS = 20
+
+
+def _parse_currency_pairs(currency_pairs=None):
+    """解析 currency_pairs 查询参数（如 USDCNY,EURUSD），返回同花顺代码列表"""
+    if not currency_pairs:
+        currency_pairs = [
+            pair.strip()
+            for pair in request.args.get("currency_pairs", "").split(",")
+            if pair.strip()
+        ]
+
+    # 默认货币对
+    if not currency_pairs:
+        currency_pairs = DEFAULT_QUOTE_PAIRS
+
+    # 转换为同花顺格式
+    return [
+        pair + ".FX" if not pair.endswith(".FX") else pair for pair in currency_pairs
+    ]
+
+
+def _freshness(stale_age):
+    """数据新旧字段：上游失败或熔断时返回的是最近一次成功的结果，stale 为 True"""
+    return {"stale": stale_age is not None, "staleness": stale_age or 0}
 
 
 def get_forex_realtime(currency_pairs=None):
@@ -10,28 +57,168 @@ def get_forex_realtime(currency_pairs=None):
         if not forex_service:
             return jsonify({"error": "外汇服务未初始化"}), 500
 
-        # 默认货币对
-        if not currency_pairs:
-            currency_pairs = ["USDCNY.FX", "EURUSD.FX", "GBPUSD.FX", "USDJPY.FX"]
+        ifind_pairs = _parse_currency_pairs(currency_pairs)
 
-        # 转换为同花顺格式
-        ifind_pairs = [
-            pair + ".FX" if not pair.endswith(".FX") else pair
-            for pair in currency_pairs
-        ]
-        pairs_str = ",".join(ifind_pairs)
+        # 后台轮询的快照覆盖全部货币对（交叉汇率可由快照换算）时直接返回快照，不请求上游
+        snapshot = forex_service.get_quote_snapshot()
+        quotes = snapshot and forex_service.snapshot_quotes(snapshot, ifind_pairs)
+        if quotes:
+            # 快照距今的秒数，超过三个轮询间隔说明轮询持续失败
+            staleness = round(time.time() - snapshot.timestamp, 3)
+            return jsonify(
+                {
+                    "success": True,
+                    "data": quotes,
+                    "seq": snapshot.seq,
+                    "timestamp": snapshot.timestamp,
+                    "stale": staleness > forex_service.quote_poller.interval * 3,
+                    "staleness": staleness,
+                }
+            )
 
-        raw_data = forex_service.get_forex_realtime_data(pairs_str)
-        formatted_data = forex_service.format_realtime_data(raw_data)
+        pairs_str = ",".join(ifind_pairs)
+        formatted_data, stale_age = forex_service.with_fallback(
+            ("realtime", pairs_str),
+            lambda: forex_service.format_realtime_data(
+                forex_service.get_forex_realtime_data(pairs_str)
+            ),
+            REALTIME_PATH,
+        )
 
-        return jsonify({"success": True, "data": formatted_data})
+        return jsonify(
+            {
+                "success": True,
+                "data": formatted_data,
+                "seq": None,
+                "timestamp": time.time() - (stale_age or 0),
+                **_freshness(stale_age),
+            }
+        )
 
+    except CircuitOpenError as e:
+        # 上游熔断且没有可用的旧数据，快速返回 503
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"获取实时外汇数据错误: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+def stream_forex_quotes():
+    """以 Server-Sent Events 推送订阅货币对的实时行情与新收盘K线"""
+    try:
+        forex_service = get_forex_service()
+        if not forex_service:
+            return jsonify({"error": "外汇服务未初始化"}), 500
+        if forex_service.quote_poller is None:
+            return jsonify({"error": "实时行情轮询未启动"}), 503
+
+        ifind_pairs = _parse_currency_pairs()
+        unknown = [p for p in ifind_pairs if p not in forex_service.quote_poller.pairs]
+        if unknown:
+            return jsonify({"error": f"货币对未在轮询范围内: {','.join(unknown)}"}), 400
+
+        # K线周期，如 1min,5min；为空时只推送行情
+        bar_periods = [
+            p.strip()
+            for p in request.args.get("bar_periods", "1min").split(",")
+            if p.strip()
+        ]
+        unsupported = [p for p in bar_periods if p not in MINUTE_PERIODS]
+        if unsupported:
+            return jsonify({"error": f"不支持的K线周期: {','.join(unsupported)}"}), 400
+
+        heartbeat = float(request.args.get("heartbeat", 15))
+        # 续传位置：浏览器重连时自动携带 Last-Event-ID，也可通过 since 参数指定
+        since = request.headers.get("Last-Event-ID") or request.args.get("since")
+        since = int(since) if since and since.isdigit() else None
+
+        stream = forex_service.quote_stream
+        subscription = stream.subscribe(ifind_pairs, bar_periods)
+        # 先订阅再取续传事件，期间新到的增量在下面按序号去重
+        backlog, last_seq = stream.catch_up(subscription.pairs, since)
+
+        def generate():
+            seen, dropped = last_seq, 0
+            try:
+                for event, data, seq in backlog:
+                    yield format_sse(event, data, seq)
+                while True:
+                    if subscription.dropped != dropped:
+                        # 队列溢出丢弃过增量，从日志补发（或发送完整快照）以保持客户端状态一致
+                        dropped = subscription.dropped
+                        events, seen = stream.catch_up(subscription.pairs, seen)
+                        for event, data, seq in events:
+                            yield format_sse(event, data, seq)
+
+                    item = subscription.get(timeout=heartbeat)
+                    if item is None:
+                        # 心跳注释，防止代理断开空闲连接，也用于及时发现客户端断开
+                        yield ": keep-alive\n\n"
+                        continue
+                    event, data, seq = item
+                    if seq is not None:
+                        if seq <= seen:
+                            continue
+                        seen = seq
+                    yield format_sse(event, data, seq)
+            finally:
+                stream.unsubscribe(subscription)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    except Exception as e:
+        print(f"建立外汇行情推送错误: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+def _response_format():
+    """按 format 参数或 Accept 请求头确定响应格式，返回 (格式, 错误响应)"""
+    try:
+        response_format = negotiate_format(
+            request.args.get("format"), request.accept_mimetypes
+        )
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    if response_format == "msgpack" and msgpack is None:
+        return None, (jsonify({"error": "服务端未安装 msgpack"}), 406)
+    return response_format, None
+
+
+def _max_points():
+    """读取 max_points 参数（降采样后的最大点数），返回 (点数, 错误响应)"""
+    max_points = request.args.get("max_points", type=int)
+    # 降采样至少保留首尾两点与中间一点
+    if max_points is not None and max_points < 3:
+        return None, (jsonify({"error": "max_points 不能小于 3"}), 400)
+    return max_points, None
+
+
+def _columnar_response(response_format, data, meta):
+    """
+    以列式格式返回数据
+    Args:
+        response_format: columnar 或 msgpack
+        data: (t, columns) 或 {键名: (t, columns)}
+        meta: 附加在响应中的其他字段
+    """
+    binary = response_format == "msgpack"
+    if isinstance(data, dict):
+        encoded = {key: encode_columns(*value, binary) for key, value in data.items()}
+    else:
+        encoded = encode_columns(*data, binary)
+
+    payload = {"success": True, "data": encoded, **meta}
+    if binary:
+        return Response(pack(payload), mimetype="application/msgpack")
+    return jsonify(payload)
+
+
 def get_forex_chart_data():
     """获取外汇图表数据"""
     try:
@@ -39,11 +226,20 @@ def get_forex_chart_data():
         if not forex_service:
             return jsonify({"error": "外汇服务未初始化"}), 500
 
+        # 响应格式：json（行格式，默认）、columnar（列式 JSON）、msgpack（列式二进制）
+        response_format, error = _response_format()
+        if error:
+            return error
+
         # 获取请求参数
         currency_pair = request.args.get("currency_pair", "USDCNY")
         chart_type = request.args.get("chart_type", "line")
         period = request.args.get("period", "5min")  # 改为默认5分钟，因为1分钟数据为空
         count = int(request.args.get("count", 100))
+        # 返回的最大点数，超过时分时线按 LTTB、K线按分组聚合降采样
+        max_points, error = _max_points()
+        if error:
+            return error
 
         # 转换为同花顺格式
         ifind_pair = (
@@ -52,19 +248,32 @@ def get_forex_chart_data():
             else currency_pair
         )
 
-        # 根据周期选择不同的接口
-        if period in ["1min", "5min", "15min", "30min", "60min"]:
-            # 使用分钟级数据接口
-            interval = period.replace("min", "")
-            raw_data = forex_service.get_forex_minute_data(ifind_pair, interval, count)
-        elif period in ["1d", "1w", "1m", "1q", "1y"]:
-            # 使用K线数据接口
-            raw_data = forex_service.get_forex_kline_data(ifind_pair, period, count)
-        else:
+        # 各周期数据由缓存的最细粒度K线在本地重采样得到
+        data_period = period
+        if period not in MINUTE_PERIODS and period not in KLINE_PERIODS:
             # 默认使用5分钟数据
-            raw_data = forex_service.get_forex_minute_data(ifind_pair, "5", count)
+            data_period = "5min"
+        # 列式 JSON / msgpack 直接由列式K线编码
+        key = (ifind_pair, data_period, count, chart_type, max_points)
+        path = forex_service.chart_path(data_period)
+        if response_format != "json":
+            bars, stale_age = forex_service.with_fallback(
+                ("chart_bars",) + key, lambda: forex_service.get_chart_bars(*key), path
+            )
+            return _columnar_response(
+                response_format,
+                bars_to_columns(bars, chart_type),
+                {
+                    "currency_pair": currency_pair,
+                    "chart_type": chart_type,
+                    "period": period,
+                    **_freshness(stale_age),
+                },
+            )
 
-        formatted_data = forex_service.format_chart_data(raw_data, chart_type)
+        formatted_data, stale_age = forex_service.with_fallback(
+            ("chart",) + key, lambda: forex_service.get_forex_chart_data(*key), path
+        )
 
         return jsonify(
             {
@@ -73,15 +282,120 @@ def get_forex_chart_data():
                 "currency_pair": currency_pair,
                 "chart_type": chart_type,
                 "period": period,
+                **_freshness(stale_age),
             }
         )
 
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"获取图表数据错误: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+def get_forex_charts_batch():
+    """批量获取多个货币对的图表数据，上游请求按代码合并"""
+    try:
+        forex_service = get_forex_service()
+        if not forex_service:
+            return jsonify({"error": "外汇服务未初始化"}), 500
+
+        response_format, error = _response_format()
+        if error:
+            return error
+
+        ifind_pairs = _parse_currency_pairs()
+        if len(ifind_pairs) > MAX_BATCH_PAIRS:
+            return (
+                jsonify({"error": f"一次最多请求 {MAX_BATCH_PAIRS} 个货币对"}),
+                400,
+            )
+
+        chart_type = request.args.get("chart_type", "line")
+        period = request.args.get("period", "5min")
+        count = int(request.args.get("count", 100))
+        max_points, error = _max_points()
+        if error:
+            return error
+
+        data_period = period
+        if period not in MINUTE_PERIODS and period not in KLINE_PERIODS:
+            data_period = "5min"
+
+        meta = {
+            "currency_pairs": [pair[: -len(".FX")] for pair in ifind_pairs],
+            "chart_type": chart_type,
+            "period": period,
+        }
+
+        # 返回数据以不带 .FX 后缀的货币对为键
+        key = (tuple(ifind_pairs), data_period, count, chart_type, max_points)
+        path = forex_service.chart_path(data_period)
+        if response_format != "json":
+            bars_by_pair, stale_age = forex_service.with_fallback(
+                ("charts_bars",) + key,
+                lambda: forex_service.get_chart_bars_batch(*key),
+                path,
+            )
+            return _columnar_response(
+                response_format,
+                {
+                    pair[: -len(".FX")]: bars_to_columns(bars, chart_type)
+                    for pair, bars in bars_by_pair.items()
+                },
+                {**meta, **_freshness(stale_age)},
+            )
+
+        data, stale_age = forex_service.with_fallback(
+            ("charts",) + key,
+            lambda: forex_service.get_forex_chart_data_batch(*key),
+            path,
+        )
+        return jsonify(
+            {
+                "success": True,
+                "data": {pair[: -len(".FX")]: rows for pair, rows in data.items()},
+                **meta,
+                **_freshness(stale_age),
+            }
+        )
+
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"批量获取图表数据错误: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+def _compute_indicator_set(forex_service, ifind_pair, indicators, count, interval):
+    """按指标描述计算多个技术指标，返回 {键名: 同花顺响应结构}"""
+    specs = parse_indicator_specs(indicators)
+    labels = indicator_labels(specs)
+
+    if forex_service.bar_cache is not None:
+        # 一次获取K线，在本地计算全部指标
+        results = forex_service.get_forex_indicator_set(
+            ifind_pair, specs, count, interval
+        )
+    else:
+        # 未启用K线缓存时由同花顺计算，各指标并发请求
+        async_service = get_async_forex_service()
+        results = async_service.run(
+            async_service.gather(
+                *(
+                    async_service.get_forex_indicators(
+                        ifind_pair, name, params[0], count, interval
+                    )
+                    for name, params in specs
+                )
+            )
+        )
+
+    return dict(zip(labels, results))
+
+
 def get_forex_indicators():
     """获取外汇技术指标数据"""
     try:
@@ -89,6 +403,10 @@ def get_forex_indicators():
         if not forex_service:
             return jsonify({"error": "外汇服务未初始化"}), 500
 
+        response_format, error = _response_format()
+        if error:
+            return error
+
         # 获取请求参数
         currency_pair = request.args.get("currency_pair", "USDCNY")
         indicator_type = request.args.get("indicator_type", "MA")
@@ -103,9 +421,40 @@ def get_forex_indicators():
             else currency_pair
         )
 
-        data = forex_service.get_forex_indicators(
-            ifind_pair, indicator_type, period, count, interval
-        )
+        # indicators 参数可一次请求多个指标，如 MA:20,MACD:12-26-9,RSI:14
+        indicators = request.args.get("indicators")
+        if indicators:
+            data, stale_age = forex_service.with_fallback(
+                ("indicator_set", ifind_pair, indicators, count, interval),
+                lambda: _compute_indicator_set(
+                    forex_service, ifind_pair, indicators, count, interval
+                ),
+                HIGH_FREQUENCY_PATH,
+            )
+        else:
+            data, stale_age = forex_service.with_fallback(
+                ("indicators", ifind_pair, indicator_type, period, count, interval),
+                lambda: forex_service.get_forex_indicators(
+                    ifind_pair, indicator_type, period, count, interval
+                ),
+                HIGH_FREQUENCY_PATH,
+            )
+
+        if response_format != "json":
+            if indicators:
+                columns = {label: raw_to_columns(raw) for label, raw in data.items()}
+            else:
+                columns = raw_to_columns(data)
+            return _columnar_response(
+                response_format,
+                columns,
+                {
+                    "currency_pair": currency_pair,
+                    "indicator_type": indicator_type,
+                    "period": period,
+                    **_freshness(stale_age),
+                },
+            )
 
         return jsonify(
             {
@@ -114,9 +463,12 @@ def get_forex_indicators():
                 "currency_pair": currency_pair,
                 "indicator_type": indicator_type,
                 "period": period,
+                **_freshness(stale_age),
             }
         )
 
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"获取技术指标数据错误: {e}")
         traceback.print_exc()
@@ -124,12 +476,16 @@ def get_forex_indicators():
 
 
 def get_multiple_indicators():
-    """获取多个技术指标数据（MA和MACD）"""
+    """获取多个技术指标数据（默认MA和MACD）"""
     try:
         forex_service = get_forex_service()
         if not forex_service:
             return jsonify({"error": "外汇服务未初始化"}), 500
 
+        response_format, error = _response_format()
+        if error:
+            return error
+
         currency_pair = request.args.get("currency_pair", "USDCNY")
         count = int(request.args.get("count", 100))
         interval = request.args.get("interval", "1")
@@ -141,25 +497,49 @@ def get_multiple_indicators():
             else currency_pair
         )
 
-        # 获取MA数据
-        ma_data = forex_service.get_forex_indicators(
-            ifind_pair, "MA", 20, count, interval
+        indicators = request.args.get("indicators", "MA:20,MACD:12")
+        data, stale_age = forex_service.with_fallback(
+            ("indicator_set", ifind_pair, indicators, count, interval),
+            lambda: _compute_indicator_set(
+                forex_service, ifind_pair, indicators, count, interval
+            ),
+            HIGH_FREQUENCY_PATH,
         )
 
-        # 获取MACD数据
-        macd_data = forex_service.get_forex_indicators(
-            ifind_pair, "MACD", 12, count, interval
-        )
+        if response_format != "json":
+            return _columnar_response(
+                response_format,
+                {label: raw_to_columns(raw) for label, raw in data.items()},
+                {"currency_pair": currency_pair, **_freshness(stale_age)},
+            )
 
         return jsonify(
             {
                 "success": True,
-                "data": {"ma": ma_data, "macd": macd_data},
+                "data": data,
                 "currency_pair": currency_pair,
+                **_freshness(stale_age),
             }
         )
 
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"获取多指标数据错误: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+
+
+def get_forex_metrics():
+    """获取外汇服务运行指标（连接池、缓存等）"""
+    try:
+        forex_service = get_forex_service()
+        if not forex_service:
+            return jsonify({"error": "外汇服务未初始化"}), 500
+
+        return jsonify({"success": True, "data": forex_service.get_metrics()})
+
+    except Exception as e:
+        print(f"获取外汇服务指标错误: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
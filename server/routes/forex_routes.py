@@ -1,9 +1,12 @@
 from flask import Blueprint
 from controllers.forex_controller import (
     get_forex_realtime,
+    stream_forex_quotes,
     get_forex_chart_data,
+    get_forex_charts_batch,
     get_forex_indicators,
     get_multiple_indicators,
+    get_forex_metrics,
 )
 
 # 创建Blueprint
@@ -12,11 +15,20 @@ forex_bp = Blueprint("forex", __name__)
 # 外汇实时数据接口
 forex_bp.route("/realtime", methods=["GET"])(get_forex_realtime)
 
+# 外汇实时行情与新收盘K线推送接口（Server-Sent Events）
+forex_bp.route("/stream", methods=["GET"])(stream_forex_quotes)
+
 # 外汇图表数据接口（支持分时线和K线）
 forex_bp.route("/chart", methods=["GET"])(get_forex_chart_data)
 
+# 多货币对图表数据批量接口（上游请求合并）
+forex_bp.route("/charts", methods=["GET"])(get_forex_charts_batch)
+
 # 外汇技术指标接口
 forex_bp.route("/indicators", methods=["GET"])(get_forex_indicators)
 
 # 多指标数据接口
 forex_bp.route("/multi-indicators", methods=["GET"])(get_multiple_indicators)
+
+# 外汇服务运行指标接口
+forex_bp.route("/metrics", methods=["GET"])(get_forex_metrics)
@@ -0,0 +1,319 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.bar_utils import empty_bars, to_epoch
+
+DAY = 86400
+
+# 每次上游请求覆盖的时间跨度（秒），分钟K线每块约 4320 根，不超过单次分钟数据请求的分段上限
+CHUNK_SPANS = {
+    "1": 3 * DAY,
+    "5": 15 * DAY,
+    "15": 45 * DAY,
+    "30": 90 * DAY,
+    "60": 180 * DAY,
+    "1d": 3650 * DAY,
+    "1w": 3650 * DAY,
+    "1m": 3650 * DAY,
+    "1q": 3650 * DAY,
+    "1y": 3650 * DAY,
+}
+
+# 各周期单根K线的秒数，用于估算回填范围内的K线数量
+BAR_SECONDS = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "1d": DAY,
+    "1w": 7 * DAY,
+    "1m": 31 * DAY,
+    "1q": 92 * DAY,
+    "1y": 365 * DAY,
+}
+
+
+def backfill_ranges(
+    minute_days: float = 60,
+    daily_years: float = 5,
+    minute_interval: str = "1",
+    now: int = None,
+):
+    """
+    回填范围：最近 minute_days 天的分钟K线与最近 daily_years 年的日K线
+    Returns:
+        {周期: (start_ts, end_ts)}，天数为 0 的周期不回填
+    """
+    if now is None:
+        # K线时间戳以本地时间按 UTC 换算
+        now = to_epoch(datetime.now())
+    ranges = {}
+    if minute_days > 0:
+        ranges[minute_interval] = (int(now - minute_days * DAY), now)
+    if daily_years > 0:
+        ranges["1d"] = (int(now - daily_years * 365 * DAY), now)
+    return ranges
+
+
+class BackfillJob:
+    """历史K线并发分块回填
+
+    每个周期的时间范围按固定网格切分为若干块（CHUNK_SPANS），缺失同一块的货币对
+    合并为一次上游请求，多块在线程池中并发请求，全部经过限流器的 backfill 通道，
+    不会挤占交互请求的令牌。
+
+    断点即K线缓存本身：每个 (货币对, 周期) 只回填缓存范围之外的部分，
+    新于最后一根缓存K线的块按时间正序、早于缓存起点的块按时间倒序依次写入缓存，
+    写入的数据始终与已缓存的数据相连，covered_from 随之前移。配置了 BarStore 时
+    每块写入即落盘，任务中断后重新运行只会请求尚未写入的块。
+    同一时间戳的K线在合并时去重，以新数据为准。
+
+    某个方向（增量或向前）的块重试后仍失败时，其后的块已无法与缓存相连，
+    该货币对在这个方向上尚未开始的块不再请求。
+    """
+
+    def __init__(
+        self,
+        service,
+        pairs,
+        ranges,
+        workers: int = 4,
+        retries: int = 2,
+        chunk_spans=None,
+    ):
+        """
+        Args:
+            service: IFindForexService（需开启K线缓存）
+            pairs: 同花顺代码列表
+            ranges: {周期: (start_ts, end_ts)}，见 backfill_ranges
+            workers: 并发请求数
+            retries: 每块请求失败后的重试次数
+            chunk_spans: {周期: 每块秒数}，默认见 CHUNK_SPANS
+        """
+        if service.bar_cache is None:
+            raise ValueError("回填需要开启K线缓存")
+        self.service = service
+        self.cache = service.bar_cache
+        self.pairs = list(pairs)
+        self.ranges = dict(ranges)
+        self.workers = workers
+        self.retries = retries
+        self.chunk_spans = dict(CHUNK_SPANS if chunk_spans is None else chunk_spans)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._keys = {}
+
+        # 回填统计
+        self.chunks_total = 0
+        self.chunks_fetched = 0
+        self.chunks_committed = 0
+        self.chunks_failed = 0
+        self.chunks_skipped = 0
+        self.requests = 0
+        self.bars = 0
+        self.errors = []
+        self.started_at = None
+        self.finished_at = None
+
+    def _bounds(self, interval, k):
+        """第 k 块的时间范围（截取到回填范围内）"""
+        span = self.chunk_spans[interval]
+        start_ts, end_ts = self.ranges[interval]
+        return max(k * span, start_ts), min((k + 1) * span - 1, end_ts)
+
+    def plan(self):
+        """
+        根据缓存现状规划需要请求的块
+        Returns:
+            [(周期, 块序号, 货币对列表)]，按时间从新到旧排列
+        """
+        groups = {}
+        self._keys = {}
+        for interval, (start_ts, end_ts) in self.ranges.items():
+            span = self.chunk_spans[interval]
+            max_span = self.cache.max_bars * BAR_SECONDS[interval]
+            if end_ts - start_ts > max_span:
+                # 超出缓存容量的部分写入后会被裁掉，回填没有意义
+                start_ts = end_ts - max_span
+                self.ranges[interval] = (start_ts, end_ts)
+                print(
+                    f"回填范围超出K线缓存容量，{interval} 周期只回填最近 {max_span} 秒"
+                )
+
+            for pair in self.pairs:
+                covered_from, last_ts = self.cache.coverage(pair, interval)
+                if covered_from is None:
+                    tail, head_from = [], end_ts
+                else:
+                    # 最后一根缓存K线可能仍在形成中，增量从它开始
+                    tail = list(range(last_ts // span, end_ts // span + 1))
+                    head_from = covered_from - 1
+                head = []
+                if head_from >= start_ts:
+                    head = list(range(head_from // span, start_ts // span - 1, -1))
+
+                # 覆盖起点与最后一根K线在同一块时，该块同时属于两个方向，只请求一次
+                for k in dict.fromkeys(tail + head):
+                    groups.setdefault((interval, k), []).append(pair)
+                self._keys[(pair, interval)] = {
+                    "tail": deque(tail),
+                    "head": deque(head),
+                    "done": {},
+                    "committed": set(),
+                    "failed": {},
+                }
+
+        self.chunks_total = sum(len(pairs) for pairs in groups.values())
+        return sorted(
+            ((interval, k, pairs) for (interval, k), pairs in groups.items()),
+            key=lambda chunk: -self._bounds(chunk[0], chunk[1])[1],
+        )
+
+    def run(self):
+        """执行回填（阻塞直至完成或被停止），返回统计信息"""
+        self.started_at = time.time()
+        self.finished_at = None
+        chunks = self.plan()
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="forex-backfill"
+        ) as pool:
+            for interval, k, pairs in chunks:
+                pool.submit(self._fetch_chunk, interval, k, pairs)
+        self.finished_at = time.time()
+        return self.get_stats()
+
+    def _pending(self, pair, interval, k, state=None):
+        """第 k 块对该货币对是否仍有用：所在方向上排在它之前的块没有失败（需持有锁）"""
+        state = state or self._keys[(pair, interval)]
+        return any(_reachable(state, segment, k) for segment in ("tail", "head"))
+
+    def _fetch_chunk(self, interval, k, pairs):
+        """请求一块K线（失败时退避重试），再按货币对写入缓存"""
+        with self._lock:
+            wanted = [pair for pair in pairs if self._pending(pair, interval, k)]
+            self.chunks_skipped += len(pairs) - len(wanted)
+        if not wanted:
+            return
+        pairs = wanted
+        start_ts, end_ts = self._bounds(interval, k)
+        for attempt in range(self.retries + 1):
+            if self._stop.is_set():
+                return
+            try:
+                with self._lock:
+                    self.requests += 1
+                with self.service.upstream_lane("backfill"):
+                    fetched = self.service.fetch_bar_range(
+                        pairs, interval, start_ts, end_ts
+                    )
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    with self._lock:
+                        self.chunks_failed += len(pairs)
+                        self.errors.append(f"{interval} {start_ts}-{end_ts}: {e}")
+                        for pair in pairs:
+                            self._abandon(pair, interval, k)
+                    print(
+                        f"回填失败 {','.join(pairs)} {interval} {start_ts}-{end_ts}: {e}"
+                    )
+                    return
+                self._stop.wait(2**attempt)
+
+        for pair in pairs:
+            self._complete(pair, interval, k, fetched.get(pair, empty_bars()))
+
+    def _abandon(self, pair, interval, k):
+        """第 k 块失败：放弃其所在方向的后续块，释放只属于这些方向的已获取块（需持有锁）"""
+        state = self._keys[(pair, interval)]
+        for segment in ("tail", "head"):
+            if _reachable(state, segment, k):
+                state["failed"][segment] = k
+        for ready in list(state["done"]):
+            if not self._pending(pair, interval, ready, state):
+                del state["done"][ready]
+
+    def _complete(self, pair, interval, k, bars):
+        """记录已获取的块，并按顺序写入与缓存相连的块"""
+        with self._lock:
+            self.chunks_fetched += 1
+            self.bars += len(bars.t)
+            state = self._keys[(pair, interval)]
+            if not self._pending(pair, interval, k, state):
+                # 请求期间所在方向已有块失败，无法再写入
+                return
+            state["done"][k] = bars
+            for segment in ("tail", "head"):
+                order = state[segment]
+                while order and order[0] in state["done"]:
+                    ready = order.popleft()
+                    chunk_bars = state["done"][ready]
+                    if not self._pending(pair, interval, ready, state):
+                        del state["done"][ready]
+                    # 更早的块写入后覆盖起点前移；增量块不改变覆盖起点
+                    covered_from = (
+                        self._bounds(interval, ready)[0] if segment == "head" else None
+                    )
+                    self.cache.put(pair, interval, chunk_bars, covered_from)
+                    if ready not in state["committed"]:
+                        state["committed"].add(ready)
+                        self.chunks_committed += 1
+
+    def start(self):
+        """在后台线程中执行回填，重复调用无副作用"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_safely, name="forex-backfill", daemon=True
+        )
+        self._thread.start()
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.errors.append(str(e))
+            print(f"历史K线回填失败: {e}")
+
+    def stop(self):
+        """停止回填：已开始的请求完成后退出，已写入的块保留"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def get_stats(self):
+        """获取回填进度"""
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "pairs": self.pairs,
+                "intervals": list(self.ranges),
+                "running": bool(self._thread and self._thread.is_alive()),
+                "chunks_total": self.chunks_total,
+                "chunks_fetched": self.chunks_fetched,
+                "chunks_committed": self.chunks_committed,
+                "chunks_failed": self.chunks_failed,
+                "chunks_skipped": self.chunks_skipped,
+                "requests": self.requests,
+                "bars": self.bars,
+                "errors": self.errors[-5:],
+                "elapsed": (
+                    round(end - self.started_at, 3) if self.started_at else None
+                ),
+            }
+
+
+def _reachable(state, segment, k):
+    """第 k 块在该方向的写入顺序中，且排在已失败的块之前"""
+    order = state[segment]
+    if k not in order:
+        return False
+    failed = state["failed"].get(segment)
+    return failed is None or order.index(k) < order.index(failed)
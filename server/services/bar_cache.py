@@ -0,0 +1,229 @@
+import threading
+import numpy as np
+from utils.bar_utils import empty_bars, merge_bars, slice_bars, tail_bars
+
+
+class BarCache:
+    """按 (货币对, 周期) 缓存已获取的K线
+
+    每个键记录已缓存的K线以及已覆盖的最早时间。再次请求时只向上游
+    拉取最后一根缓存K线之后的数据（包含最后一根，因为它可能仍在形成中），
+    合并后从本地返回所需窗口。
+
+    传入 store（BarStore）时缓存会写穿到磁盘，进程重启或新的工作进程
+    首次访问某个键时直接从磁盘内存映射加载，无需重新拉取历史数据。
+    """
+
+    def __init__(self, max_bars: int = 100000, store=None):
+        self.max_bars = max_bars
+        self.store = store
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # 已有K线的 (货币对, 周期)，启动时从磁盘扫描一次，之后随写入更新
+        self._keys = set(store.keys()) if store is not None else set()
+
+        # 缓存命中统计
+        self.full_fetches = 0
+        self.tail_fetches = 0
+        self.head_fetches = 0
+        self.store_loads = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _store_for(self, key):
+        """键对应的磁盘存储，未配置或代码不合法（不能用作目录名）时只缓存在内存"""
+        if self.store is not None and self.store.is_valid_key(*key):
+            return self.store
+        return None
+
+    def _entry(self, key):
+        """读取缓存项，内存中不存在时尝试从磁盘加载（需持有键锁）"""
+        entry = self._entries.get(key)
+        store = self._store_for(key)
+        if entry is None and store is not None:
+            bars, covered_from = store.load(*key)
+            if bars is not None:
+                entry = {"bars": bars, "covered_from": covered_from}
+                self._entries[key] = entry
+                self.store_loads += 1
+        return entry
+
+    def peek(self, pair: str, interval: str):
+        """读取缓存中的K线（不触发上游请求）"""
+        with self._key_lock((pair, interval)):
+            entry = self._entry((pair, interval))
+        return entry["bars"] if entry else empty_bars()
+
+    def coverage(self, pair: str, interval: str):
+        """
+        已缓存的时间范围
+        Returns:
+            (covered_from, 最后一根K线的时间戳)，没有缓存K线时为 (None, None)
+        """
+        with self._key_lock((pair, interval)):
+            entry = self._entry((pair, interval))
+        if entry is None or entry["covered_from"] is None or not len(entry["bars"].t):
+            return None, None
+        return entry["covered_from"], int(entry["bars"].t[-1])
+
+    def cached_pairs(self, interval: str):
+        """已缓存（内存或磁盘）指定周期K线的货币对集合"""
+        with self._lock:
+            return {
+                pair for pair, key_interval in self._keys if key_interval == interval
+            }
+
+    def put(self, pair: str, interval: str, bars, covered_from: int = None):
+        """写入K线并与已有缓存合并"""
+        with self._key_lock((pair, interval)):
+            self._merge(pair, interval, bars, covered_from)
+
+    def _merge(self, pair, interval, bars, covered_from, keep_from=None):
+        """合并K线并按 max_bars 裁剪，keep_from 之后（正在返回的窗口内）的K线不裁剪"""
+        key = (pair, interval)
+        entry = self._entry(key)
+        if entry is None:
+            merged = bars
+            if covered_from is None:
+                covered_from = int(bars.t[0]) if len(bars.t) else None
+        else:
+            merged = merge_bars(entry["bars"], bars)
+            if covered_from is None or (
+                entry["covered_from"] is not None
+                and entry["covered_from"] < covered_from
+            ):
+                covered_from = entry["covered_from"]
+
+        if len(merged.t) > self.max_bars:
+            keep = self.max_bars
+            if keep_from is not None:
+                keep = max(keep, len(merged.t) - np.searchsorted(merged.t, keep_from))
+            if keep < len(merged.t):
+                merged = tail_bars(merged, keep)
+                covered_from = int(merged.t[0])
+
+        self._entries[key] = {"bars": merged, "covered_from": covered_from}
+        if len(merged.t):
+            with self._lock:
+                self._keys.add(key)
+        store = self._store_for(key)
+        if store is not None and len(bars.t):
+            try:
+                # 已有缓存时只追加本次新增的K线，由存储层定期合并
+                store.save(
+                    pair,
+                    interval,
+                    merged,
+                    covered_from,
+                    delta=bars if entry is not None else None,
+                )
+            except OSError as e:
+                print(f"K线写入磁盘失败 {key}: {e}")
+        return merged
+
+    def get_window(self, pair: str, interval: str, start_ts: int, end_ts: int, fetch):
+        """
+        获取 [start_ts, end_ts] 内的K线，缺失部分通过 fetch 从上游补齐
+        Args:
+            pair: 同花顺代码
+            interval: 周期标识
+            start_ts: 窗口起始时间戳
+            end_ts: 窗口结束时间戳
+            fetch: fetch(start_ts, end_ts) -> Bars，请求上游数据
+        Returns:
+            窗口内的 Bars
+        """
+        windows = self.get_windows(
+            [pair], interval, start_ts, end_ts, lambda pairs, s, e: {pair: fetch(s, e)}
+        )
+        return windows[pair]
+
+    def get_windows(
+        self, pairs, interval: str, start_ts: int, end_ts: int, fetch, fresh=()
+    ):
+        """
+        批量获取多个货币对 [start_ts, end_ts] 内的K线，缺失部分合并为最多两次上游请求
+        （一次补齐窗口/前段，一次拉取增量），每次请求包含所有需要该时间段的货币对
+        Args:
+            pairs: 同花顺代码列表
+            interval: 周期标识
+            start_ts: 窗口起始时间戳
+            end_ts: 窗口结束时间戳
+            fetch: fetch(pairs, start_ts, end_ts) -> {pair: Bars}，请求上游数据，
+                   未返回的货币对视为无数据
+            fresh: 缓存由本地实时维护的货币对，不请求增量
+        Returns:
+            {pair: 窗口内的 Bars}
+        """
+        keys = sorted({(pair, interval) for pair in pairs})
+        # 按固定顺序获取键锁，避免并发的批量请求相互死锁
+        locks = [self._key_lock(key) for key in keys]
+        for lock in locks:
+            lock.acquire()
+        try:
+            full, head, tail = [], [], {}
+            for key in keys:
+                entry = self._entry(key)
+                if (
+                    entry is None
+                    or entry["covered_from"] is None
+                    or not len(entry["bars"].t)
+                ):
+                    full.append(key[0])
+                    continue
+                if entry["covered_from"] > start_ts:
+                    # 窗口比已缓存的范围更长，需要补齐前面缺失的部分
+                    head.append((key[0], entry["covered_from"]))
+                # 只请求最后一根缓存K线之后的增量（包含最后一根）
+                if key[0] not in fresh:
+                    tail[key[0]] = int(entry["bars"].t[-1])
+
+            self.full_fetches += len(full)
+            self.head_fetches += len(head)
+            self.tail_fetches += len(tail)
+
+            if full or head:
+                if full:
+                    # 有货币对需要完整窗口时，需要补前段的货币对一并请求完整窗口
+                    fetch_end = end_ts
+                    for pair, _ in head:
+                        tail.pop(pair, None)
+                else:
+                    fetch_end = max(covered_from for _, covered_from in head)
+                fetched_pairs = full + [pair for pair, _ in head]
+                fetched = fetch(fetched_pairs, start_ts, fetch_end)
+                for pair in fetched_pairs:
+                    bars = fetched.get(pair, empty_bars())
+                    self._merge(pair, interval, bars, start_ts, start_ts)
+
+            if tail:
+                fetched = fetch(list(tail), min(tail.values()), end_ts)
+                for pair in tail:
+                    self._merge(
+                        pair, interval, fetched.get(pair, empty_bars()), None, start_ts
+                    )
+
+            return {
+                key[0]: slice_bars(self._entries[key]["bars"], start_ts, end_ts)
+                for key in keys
+            }
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def get_stats(self):
+        """获取缓存统计信息"""
+        return {
+            "keys": len(self._entries),
+            "bars": sum(len(e["bars"].t) for e in self._entries.values()),
+            "full_fetches": self.full_fetches,
+            "tail_fetches": self.tail_fetches,
+            "head_fetches": self.head_fetches,
+            "store_loads": self.store_loads,
+            "store_dir": self.store.root_dir if self.store is not None else None,
+        }
@@ -0,0 +1,215 @@
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from utils.bar_utils import Bars, merge_bars, slice_bars
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，只做进程内互斥
+    fcntl = None
+
+COLUMNS = ("t", "open", "high", "low", "close", "volume")
+
+# 货币对代码与周期标识直接用作目录名，只接受以下格式
+PAIR_PATTERN = re.compile(r"^[A-Z]{6}\.FX$")
+INTERVAL_PATTERN = re.compile(r"^[0-9a-z]{1,4}$")
+
+
+class BarStore:
+    """K线列式磁盘存储
+
+    每个 (货币对, 周期) 对应一个目录，各列分别保存为 .npy 文件
+    （t 为 int64，其余为 float64），读取时通过 np.load(mmap_mode="r")
+    内存映射，没有增量段时不做反序列化和拷贝。
+
+    目录结构：
+        <root>/<pair>/<interval>/meta.json   当前版本、增量段列表、覆盖起点、K线数量
+        <root>/<pair>/<interval>/<version>/  各列 .npy 文件
+        <root>/<pair>/<interval>/<version>/<segment>/  增量段的各列 .npy 文件
+
+    写入时先生成新版本目录，再原子替换 meta.json，读者始终看到完整的一组列；
+    旧版本目录延迟清理，已经映射旧文件的进程不受影响。
+
+    增量写入（图表刷新、回填的每一段、本地聚合的每根K线）只把本次新增的K线写为
+    当前版本下的一个增量段，读取时按顺序合并（同一时间戳以较新的段为准）。
+    增量段达到 max_segments 个时整组列合并写为新版本，写入量与已存储的K线总数无关。
+
+    追加增量段需要读取、修改再替换 meta.json，写入时持有该键的锁
+    （进程内线程锁加 <key_dir>/.lock 文件锁），多个线程或工作进程同时写入
+    同一个键不会丢失增量段。读取不加锁。
+    """
+
+    def __init__(self, root_dir: str, keep_versions: int = 2, max_segments: int = 32):
+        self.root_dir = root_dir
+        self.keep_versions = keep_versions
+        self.max_segments = max_segments
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    @staticmethod
+    def is_valid_key(pair: str, interval: str):
+        """(货币对, 周期) 是否可以作为存储目录"""
+        return bool(
+            PAIR_PATTERN.fullmatch(pair or "")
+            and INTERVAL_PATTERN.fullmatch(interval or "")
+        )
+
+    def _key_dir(self, pair: str, interval: str):
+        if not self.is_valid_key(pair, interval):
+            raise ValueError(f"不支持存储的K线键: {pair!r}/{interval!r}")
+        return os.path.join(self.root_dir, pair, interval)
+
+    @contextmanager
+    def _locked(self, key_dir: str):
+        """持有键的写锁：先取进程内线程锁，再对 .lock 文件加排他锁"""
+        with self._locks_lock:
+            lock = self._locks.setdefault(key_dir, threading.Lock())
+        with lock:
+            os.makedirs(key_dir, exist_ok=True)
+            with open(os.path.join(key_dir, ".lock"), "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self, key_dir: str):
+        try:
+            with open(os.path.join(key_dir, "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load(self, pair: str, interval: str):
+        """
+        读取磁盘上的K线
+        Args:
+            pair: 同花顺代码
+            interval: 周期标识
+        Returns:
+            (Bars, covered_from)，不存在时返回 (None, None)
+        """
+        key_dir = self._key_dir(pair, interval)
+        meta = self._read_meta(key_dir)
+        if meta is None:
+            return None, None
+
+        version_dir = os.path.join(key_dir, meta["version"])
+        segments = meta.get("segments", [])
+        try:
+            bars = self._load_columns(version_dir)
+            for segment in segments:
+                bars = merge_bars(
+                    bars, self._load_columns(os.path.join(version_dir, segment))
+                )
+        except FileNotFoundError:
+            return None, None
+
+        covered_from = meta.get("covered_from")
+        if segments and covered_from is not None:
+            # 内存中超出 max_bars 被截掉的旧K线在合并写入新版本前仍留在基础版本中
+            bars = slice_bars(bars, covered_from)
+        return bars, covered_from
+
+    def _load_columns(self, col_dir: str):
+        return Bars(
+            *(
+                np.load(os.path.join(col_dir, f"{col}.npy"), mmap_mode="r")
+                for col in COLUMNS
+            )
+        )
+
+    def _write_columns(self, col_dir: str, bars):
+        os.makedirs(col_dir, exist_ok=True)
+        for col, values in zip(COLUMNS, bars):
+            dtype = np.int64 if col == "t" else np.float64
+            np.save(os.path.join(col_dir, f"{col}.npy"), np.asarray(values, dtype))
+
+    def _write_meta(self, key_dir: str, meta: dict):
+        tmp_path = os.path.join(key_dir, f"meta.json.{_new_name()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(key_dir, "meta.json"))
+
+    def save(
+        self, pair: str, interval: str, bars, covered_from: int = None, delta=None
+    ):
+        """
+        将K线写入磁盘
+        Args:
+            pair: 同花顺代码
+            interval: 周期标识
+            bars: 合并后的全部 Bars
+            covered_from: 已覆盖的最早时间戳
+            delta: 本次新增的 Bars；给出时只追加为增量段，增量段已满或磁盘上
+                   还没有该键时整组列替换为新版本
+        """
+        key_dir = self._key_dir(pair, interval)
+        with self._locked(key_dir):
+            self._save_locked(key_dir, bars, covered_from, delta)
+
+    def _save_locked(self, key_dir: str, bars, covered_from, delta):
+        meta = self._read_meta(key_dir) if delta is not None else None
+        if meta is not None and len(meta.get("segments", [])) < self.max_segments:
+            segment = _new_name()
+            self._write_columns(os.path.join(key_dir, meta["version"], segment), delta)
+            meta["segments"] = meta.get("segments", []) + [segment]
+            meta["covered_from"] = covered_from
+            self._write_meta(key_dir, meta)
+            return
+
+        version = _new_name()
+        self._write_columns(os.path.join(key_dir, version), bars)
+        self._write_meta(
+            key_dir,
+            {
+                "version": version,
+                "covered_from": covered_from,
+                "length": int(len(bars.t)),
+                "segments": [],
+            },
+        )
+        self._cleanup(key_dir, version)
+
+    def _cleanup(self, key_dir: str, current: str):
+        """只保留最近 keep_versions 个版本目录"""
+        versions = sorted(
+            name
+            for name in os.listdir(key_dir)
+            if os.path.isdir(os.path.join(key_dir, name)) and name != current
+        )
+        for name in versions[: max(len(versions) - (self.keep_versions - 1), 0)]:
+            shutil.rmtree(os.path.join(key_dir, name), ignore_errors=True)
+
+    def keys(self):
+        """列出已存储的 (货币对, 周期)"""
+        result = []
+        if not os.path.isdir(self.root_dir):
+            return result
+        for pair in sorted(os.listdir(self.root_dir)):
+            pair_dir = os.path.join(self.root_dir, pair)
+            if not os.path.isdir(pair_dir):
+                continue
+            for interval in sorted(os.listdir(pair_dir)):
+                if not self.is_valid_key(pair, interval):
+                    continue
+                if self._read_meta(os.path.join(pair_dir, interval)) is not None:
+                    result.append((pair, interval))
+        return result
+
+
+_name_counter = itertools.count()
+
+
+def _new_name():
+    """按写入时间排序的唯一目录/文件名（同一纳秒内的多次写入由计数器区分）"""
+    return f"{time.time_ns()}-{os.getpid()}-{next(_name_counter):06d}"
@@ -0,0 +1,178 @@
+import atexit
+import gzip
+import json
+import threading
+import time
+from collections import deque
+import requests
+
+TOKEN_PATH = "/api/v1/get_access_token"
+
+# 与请求时间相关的字段，回放时不参与匹配（重放时的请求窗口与录制时不同）
+TIME_FIELDS = ("starttime", "endtime", "startdate", "enddate")
+
+
+class CassetteMiss(RuntimeError):
+    """回放时没有与请求匹配的录制记录"""
+
+
+def request_key(path: str, body):
+    """请求的匹配键：接口路径 + 去掉时间字段后的请求体"""
+    body = {k: v for k, v in (body or {}).items() if k not in TIME_FIELDS}
+    return path, json.dumps(body, sort_keys=True, ensure_ascii=False)
+
+
+def make_response(status: int, text: str, url: str = None):
+    """构造 requests.Response，回放结果对调用方与真实响应无差别"""
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = text.encode("utf-8")
+    resp.encoding = "utf-8"
+    resp.url = url
+    return resp
+
+
+class CassetteRecorder:
+    """将上游请求与响应写入 gzip 压缩的 JSON Lines 文件（cassette）
+
+    每行记录：相对录制开始的时间 t、接口耗时 elapsed、接口路径、限流通道、请求体、
+    状态码与响应原文。
+    请求头不录制；令牌接口响应中的 access_token 替换为占位符，cassette 中不含凭据。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.records = 0
+        atexit.register(self.close)
+
+    def record(
+        self, path: str, body, status: int, text: str, started, elapsed, lane=None
+    ):
+        """
+        记录一次上游调用
+        Args:
+            path: 接口路径
+            body: 请求体
+            status: 响应状态码，网络错误时为 None
+            text: 响应原文（网络错误时为错误信息）
+            started: 请求开始时的 time.monotonic()
+            elapsed: 接口耗时（秒）
+            lane: 请求所属的限流通道
+        """
+        if path == TOKEN_PATH and status == 200:
+            text = _redact_token(text)
+        line = json.dumps(
+            {
+                "t": round(started - self._started, 4),
+                "elapsed": round(elapsed, 4),
+                "path": path,
+                "lane": lane,
+                "body": body,
+                "status": status,
+                "response": text,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.records += 1
+
+    def close(self):
+        """写入并关闭文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self):
+        return {"mode": "record", "path": self.path, "records": self.records}
+
+
+def _redact_token(text):
+    try:
+        res = json.loads(text)
+    except ValueError:
+        return text
+    data = res.get("data", res)
+    if isinstance(data, dict) and "access_token" in data:
+        data["access_token"] = "recorded-token"
+        # 回放时间晚于录制时的过期时间，改为相对有效期
+        data.pop("expire_at", None)
+        data["expires_in"] = 86400
+    return json.dumps(res, ensure_ascii=False)
+
+
+def load_cassette(path: str):
+    """读取 cassette 中的全部记录"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class CassettePlayer:
+    """按录制内容回放上游响应
+
+    请求按 request_key 匹配，同一键的记录按录制顺序依次返回，用完后重复返回最后一条。
+    每次响应前按录制时的接口耗时等待（除以 speed），speed 为 0 时不等待。
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self.entries = load_cassette(path)
+        self._queues = {}
+        for entry in self.entries:
+            key = request_key(entry["path"], entry["body"])
+            self._queues.setdefault(key, deque()).append(entry)
+        self._lock = threading.Lock()
+
+        # 回放统计
+        self.served = 0
+        self.misses = 0
+
+    def respond(self, path: str, body, url: str = None):
+        """
+        返回与请求匹配的录制响应
+        Raises:
+            CassetteMiss: 没有匹配的记录
+            requests.ConnectionError: 录制时该请求发生网络错误
+        """
+        key = request_key(path, body)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                entry = queue.popleft() if len(queue) > 1 else queue[0]
+                self.served += 1
+            else:
+                entry = None
+                if path != TOKEN_PATH:
+                    self.misses += 1
+
+        if entry is None:
+            if path == TOKEN_PATH:
+                # 录制时令牌仍有效、没有令牌请求的 cassette 也可以回放
+                text = json.dumps(
+                    {"data": {"access_token": "recorded-token", "expires_in": 86400}}
+                )
+                return make_response(200, text, url)
+            raise CassetteMiss(f"cassette 中没有匹配的请求: {path} {key[1][:200]}")
+
+        if self.speed > 0 and entry["elapsed"] > 0:
+            time.sleep(entry["elapsed"] / self.speed)
+        if entry["status"] is None:
+            raise requests.ConnectionError(f"录制时请求失败: {entry['response']}")
+        return make_response(entry["status"], entry["response"], url)
+
+    def get_stats(self):
+        return {
+            "mode": "replay",
+            "path": self.path,
+            "speed": self.speed,
+            "records": len(self.entries),
+            "served": self.served,
+            "misses": self.misses,
+        }
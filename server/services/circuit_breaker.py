@@ -0,0 +1,112 @@
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间拒绝调用上游"""
+
+
+class CircuitBreaker:
+    """单个上游接口的熔断器
+
+    连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝调用（快速失败）；
+    之后进入半开状态，只放行一次试探调用，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+        # 熔断统计
+        self.calls = 0
+        self.failures_total = 0
+        self.rejected = 0
+        self.opens = 0
+
+    @property
+    def state(self):
+        """当前状态，打开超过 reset_timeout 后视为半开"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (
+            self._state == self.OPEN
+            and self.clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def before_call(self):
+        """调用上游前检查，熔断中（或半开状态已有试探调用）时抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                self.rejected += 1
+                remaining = self.reset_timeout - (self.clock() - self._opened_at)
+                raise CircuitOpenError(
+                    f"{self.name} 暂时不可用（熔断中，{remaining:.0f} 秒后重试）"
+                )
+            if state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} 暂时不可用（正在试探恢复）")
+                self._probing = True
+            self.calls += 1
+
+    def cancel_call(self):
+        """before_call 之后未实际调用上游（如限流排队超时），释放半开状态的试探名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        """上游调用成功，关闭熔断器"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """上游调用失败，连续失败达到阈值或试探失败时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            self.failures_total += 1
+            self._probing = False
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    self.opens += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+    def get_stats(self):
+        """获取熔断统计信息"""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "calls": self.calls,
+                "failures": self.failures_total,
+                "rejected": self.rejected,
+                "opens": self.opens,
+            }
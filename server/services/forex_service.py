@@ -1,24 +1,432 @@
 import requests
 import json
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from services.bar_cache import BarCache
+from services.bar_store import BarStore
+from utils.bar_utils import (
+    BarsBuffer,
+    bars_from_raw,
+    bars_to_raw,
+    columns_to_raw,
+    drop_missing,
+    empty_bars,
+    format_bars,
+    from_epoch,
+    tail_bars,
+    to_epoch,
+)
+from utils.resample import bucket_starts, resample_bars
+from utils.downsample import downsample_bars
+from utils.fx_calendar import FXCalendar
+from utils.cross_rates import find_legs, synthesize_bars, synthesize_quote
+from services.indicator_state import IndicatorStateRegistry
+from services.realtime_coalescer import RealtimeCoalescer
+from services.quote_poller import QuotePoller
+from services.quote_stream import QuoteStream
+from services.circuit_breaker import CircuitBreaker
+from services.stale_cache import StaleWhileRevalidate
+from services.rate_limiter import PriorityRateLimiter
+from services.cassette import CassettePlayer, CassetteRecorder
+from services.backfill import BackfillJob, backfill_ranges
+from services.tick_aggregator import TICK_BAR_INTERVAL, TickBarAggregator
+from utils.indicators import DEFAULT_PARAMS, normalize_params, warmup_bars
+
+# 图表周期与同花顺接口参数的对应关系
+MINUTE_PERIODS = {"1min": "1", "5min": "5", "15min": "15", "30min": "30", "60min": "60"}
+KLINE_PERIODS = ["1d", "1w", "1m", "1q", "1y"]
+# 各K线周期最多包含的日K线数量，用于判断重采样所需的日线是否超出缓存容量
+KLINE_DAILY_BARS = {"1d": 1, "1w": 7, "1m": 31, "1q": 92, "1y": 366}
+
+# 实时行情返回的字段
+REALTIME_FIELDS = ("latest", "changeRatio", "open", "high", "low")
+
+# 默认展示及后台轮询的货币对
+DEFAULT_QUOTE_PAIRS = ["USDCNY.FX", "EURUSD.FX", "GBPUSD.FX", "USDJPY.FX"]
+
+REALTIME_PATH = "/api/v1/real_time_quotation"
+HISTORY_PATH = "/api/v1/cmd_history_quotation"
+HIGH_FREQUENCY_PATH = "/api/v1/high_frequency"
+
+# 当前上游请求所属的限流通道，未设置时实时行情接口为 realtime，其余为 chart
+_upstream_lane = ContextVar("upstream_lane", default=None)
+
+
+def _idle_connections(pool):
+    """连接池中空闲的连接数（urllib3 的队列预先填充了 None 占位，只统计实际连接）"""
+    if pool.pool is None:
+        return 0
+    with pool.pool.mutex:
+        return sum(conn is not None for conn in pool.pool.queue)
 
 
 class IFindForexService:
-    def __init__(self, refresh_token):
+    def __init__(
+        self,
+        refresh_token,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        pool_block: bool = True,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10,
+        enable_bar_cache: bool = True,
+        bar_store_dir: str = None,
+        resample_base_interval: str = "1",
+        indicator_state_path: str = None,
+        realtime_coalesce_window: float = 0.05,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_timeout: float = 30.0,
+        rate_limit: float = 10.0,
+        rate_burst: int = 20,
+        record_cassette: str = None,
+        replay_cassette: str = None,
+        replay_speed: float = 1.0,
+        minute_chunk_bars: int = 5000,
+        chunk_workers: int = 4,
+        trading_calendar: FXCalendar = None,
+    ):
         self.refresh_token = refresh_token
         self.base_url = "https://ft.10jqka.com.cn"
         self.access_token = None
         self.token_expires_at = None
 
-    def get_access_token(self):
-        """获取或刷新访问令牌"""
-        if (
+        # 令牌单飞刷新与后台刷新线程
+        self._token_cond = threading.Condition()
+        self._token_refreshing = False
+        self._token_refresh_error = None
+        self._refresher_thread = None
+        self._refresher_stop = threading.Event()
+
+        # 连接池配置：pool_connections 为缓存的主机连接池数量，
+        # pool_maxsize 为单个主机连接池的最大连接数
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self._build_session()
+
+        # K线增量缓存：刷新图表时只向上游请求最新的增量K线；
+        # 配置 bar_store_dir 后缓存会持久化到磁盘，重启后直接内存映射加载
+        self.bar_cache = None
+        if enable_bar_cache:
+            store = BarStore(bar_store_dir) if bar_store_dir else None
+            self.bar_cache = BarCache(store=store)
+
+        # 大时间窗口的分钟数据按每块 minute_chunk_bars 根K线分段，最多 chunk_workers 段并发请求
+        self.minute_chunk_bars = minute_chunk_bars
+        self.chunk_workers = chunk_workers
+
+        # 交易日历：按交易时段计算 count 根K线所需的请求时间范围
+        self.calendar = trading_calendar or FXCalendar()
+
+        # 分钟周期重采样所用的基础周期，以及基础周期暂无数据的货币对
+        self.resample_base_interval = resample_base_interval
+        self._resample_base_misses = {}
+
+        # 技术指标增量状态，配置路径后退出时保存、启动时恢复
+        self.indicator_states = IndicatorStateRegistry(indicator_state_path)
+
+        # 实时行情请求合并：窗口内的并发请求合并为一次上游调用，窗口为0时关闭
+        self.realtime_coalescer = None
+        if realtime_coalesce_window > 0:
+            self.realtime_coalescer = RealtimeCoalescer(
+                self._fetch_realtime_data, window=realtime_coalesce_window
+            )
+
+        # 实时行情后台轮询，启动后 /realtime 直接读取最新快照
+        self.quote_poller = None
+
+        # 由轮询行情聚合1分钟K线，本地维护的货币对读取图表时不再请求上游增量
+        self.tick_aggregator = None
+        if self.bar_cache is not None:
+            self.tick_aggregator = TickBarAggregator(self.bar_cache, self.calendar)
+
+        # 历史K线后台回填任务
+        self.backfill_job = None
+
+        # 行情与新收盘K线推送：行情按快照序号增量推送，K线在每个周期结束后检查一次。
+        # 新K线的检查与上游请求在独立线程中进行，不阻塞行情轮询与行情推送
+        self.quote_stream = QuoteStream()
+        self._bar_marks = {}
+        self._bar_wakeup = threading.Event()
+        self._bar_stop = threading.Event()
+        self._bar_thread = None
+
+        # 按接口路径熔断：连续失败后快速失败，接口层返回最近一次成功的结果并在后台刷新
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self._breakers = {}
+        self.stale_cache = StaleWhileRevalidate()
+
+        # 上游请求限流：所有接口共用同花顺配额，按通道优先级分配令牌，rate_limit 为0时关闭
+        self.rate_limiter = None
+        if rate_limit > 0:
+            self.rate_limiter = PriorityRateLimiter(rate_limit, rate_burst)
+
+        # 录制/回放：录制模式把每次上游请求与响应写入 cassette，
+        # 回放模式不访问网络，按录制时的耗时（除以 replay_speed）返回录制的响应
+        self.cassette = None
+        if replay_cassette:
+            self.cassette = CassettePlayer(replay_cassette, replay_speed)
+        elif record_cassette:
+            self.cassette = CassetteRecorder(record_cassette)
+
+        # 连接池饱和度统计
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+        self._saturated_requests = 0
+
+    def _build_session(self):
+        """创建带keep-alive连接池的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+
+    def _send(self, url: str, headers: dict, body: dict = None, timeout=None):
+        """通过连接池发送POST请求，并记录连接池使用情况"""
+        with self._stats_lock:
+            self._total_requests += 1
+            if self._in_flight >= self.pool_maxsize:
+                # 所有连接均被占用，本次请求需要排队等待空闲连接
+                self._saturated_requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        try:
+            return self._send_upstream(url, headers, body, timeout)
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    def _send_upstream(self, url: str, headers: dict, body: dict, timeout):
+        """发送请求；录制模式下记录请求与响应，回放模式下返回录制的响应"""
+        path = urlsplit(url).path
+        if isinstance(self.cassette, CassettePlayer):
+            return self.cassette.respond(path, body, url)
+
+        started = time.monotonic()
+        try:
+            resp = self.session.post(
+                url, json=body, headers=headers, timeout=timeout or self.timeout
+            )
+        except requests.RequestException as e:
+            self._record(path, body, None, str(e), started)
+            raise
+        self._record(path, body, resp.status_code, resp.text, started)
+        return resp
+
+    def _record(self, path: str, body: dict, status, text: str, started):
+        """录制模式下记录一次上游调用（含所属限流通道）"""
+        if self.cassette is not None:
+            elapsed = time.monotonic() - started
+            self.cassette.record(
+                path, body, status, text, started, elapsed, self.lane_for(path)
+            )
+
+    def _post(self, path: str, body: dict, error_prefix: str):
+        """携带access_token调用同花顺接口（经过该接口的熔断器）"""
+        url = f"{self.base_url}{path}"
+        breaker = self._breaker(path)
+        breaker.before_call()
+        settled = False
+        try:
+            self._acquire_rate_limit(path)
+            try:
+                headers = {
+                    "Content-Type": "application/json",
+                    "access_token": self.get_access_token(),
+                }
+                resp = self._send(url, headers, body)
+            except Exception:
+                settled = True
+                breaker.record_failure()
+                raise
+
+            # 4xx 说明上游可用（请求参数问题），不计入熔断
+            settled = True
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        finally:
+            # 限流排队超时或被中断时没有上游结果，释放半开状态的试探名额
+            if not settled:
+                breaker.cancel_call()
+        if resp.status_code != 200:
+            raise RuntimeError(f"{error_prefix}: {resp.text}")
+        return resp.json()
+
+    def _breaker(self, path: str):
+        """获取接口路径对应的熔断器"""
+        with self._stats_lock:
+            if path not in self._breakers:
+                self._breakers[path] = CircuitBreaker(
+                    path, self.breaker_failure_threshold, self.breaker_reset_timeout
+                )
+            return self._breakers[path]
+
+    def lane_for(self, path: str):
+        """上游请求所属的限流通道"""
+        return _upstream_lane.get() or (
+            "realtime" if path == REALTIME_PATH else "chart"
+        )
+
+    def _acquire_rate_limit(self, path: str):
+        """按请求所属通道获取限流令牌"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.lane_for(path))
+
+    @contextmanager
+    def upstream_lane(self, lane: str):
+        """在该上下文内发起的上游请求使用指定的限流通道"""
+        token = _upstream_lane.set(lane)
+        try:
+            yield
+        finally:
+            _upstream_lane.reset(token)
+
+    def upstream_degraded(self, path: str):
+        """该上游接口是否处于熔断（打开或半开）状态"""
+        with self._stats_lock:
+            breaker = self._breakers.get(path)
+        return breaker is not None and breaker.state != CircuitBreaker.CLOSED
+
+    @staticmethod
+    def chart_path(period: str):
+        """图表周期的K线来自的上游接口"""
+        return HISTORY_PATH if period in KLINE_PERIODS else HIGH_FREQUENCY_PATH
+
+    def with_fallback(self, key, compute, path: str):
+        """
+        调用 compute 获取数据，上游失败或熔断时返回最近一次成功的结果
+        Args:
+            key: 请求标识，如 ("chart", 货币对, 周期, ...)
+            compute: compute() -> 数据
+            path: compute 请求的上游接口，只有该接口熔断时才直接返回旧结果
+        Returns:
+            (数据, 过期秒数)，过期秒数为 None 表示数据是本次获取的
+        """
+        return self.stale_cache.get(key, compute, self.upstream_degraded(path))
+
+    def get_pool_stats(self):
+        """获取连接池统计信息"""
+        with self._stats_lock:
+            stats = {
+                "pool_connections": self.pool_connections,
+                "pool_maxsize": self.pool_maxsize,
+                "pool_block": self.pool_block,
+                "connect_timeout": self.timeout[0],
+                "read_timeout": self.timeout[1],
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "total_requests": self._total_requests,
+                "saturated_requests": self._saturated_requests,
+            }
+
+        hosts = {}
+        for adapter in set(self.session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                    "connections_opened": pool.num_connections,
+                    "requests_sent": pool.num_requests,
+                    "idle_connections": _idle_connections(pool),
+                }
+        stats["hosts"] = hosts
+        return stats
+
+    def get_metrics(self):
+        """汇总服务运行指标"""
+        metrics = {"pool": self.get_pool_stats()}
+        if self.bar_cache is not None:
+            metrics["bar_cache"] = self.bar_cache.get_stats()
+        metrics["indicator_states"] = self.indicator_states.get_stats()
+        if self.realtime_coalescer is not None:
+            metrics["realtime_coalescer"] = self.realtime_coalescer.get_stats()
+        if self.quote_poller is not None:
+            metrics["quote_poller"] = self.quote_poller.get_stats()
+        metrics["quote_stream"] = self.quote_stream.get_stats()
+        if self.tick_aggregator is not None:
+            metrics["tick_aggregator"] = self.tick_aggregator.get_stats()
+        if self.backfill_job is not None:
+            metrics["backfill"] = self.backfill_job.get_stats()
+        with self._stats_lock:
+            breakers = dict(self._breakers)
+        metrics["circuit_breakers"] = {
+            path: breaker.get_stats() for path, breaker in breakers.items()
+        }
+        metrics["stale_cache"] = self.stale_cache.get_stats()
+        if self.rate_limiter is not None:
+            metrics["rate_limiter"] = self.rate_limiter.get_stats()
+        if self.cassette is not None:
+            metrics["cassette"] = self.cassette.get_stats()
+        return metrics
+
+    def _token_valid(self):
+        """当前令牌是否仍在有效期内"""
+        return (
             self.access_token
             and self.token_expires_at
             and datetime.now() < self.token_expires_at
-        ):
+        )
+
+    def get_access_token(self):
+        """获取或刷新访问令牌"""
+        if self._token_valid():
             return self.access_token
+        return self._refresh_access_token_single_flight()
+
+    def _refresh_access_token_single_flight(self, force: bool = False):
+        """单飞刷新：同一时刻只有一个线程请求新令牌，其余线程等待其结果"""
+        with self._token_cond:
+            if not force and self._token_valid():
+                return self.access_token
+
+            if self._token_refreshing:
+                self._token_cond.wait_for(
+                    lambda: not self._token_refreshing, timeout=self.timeout[0] + 8
+                )
+                if self._token_valid():
+                    return self.access_token
+                raise RuntimeError(
+                    f"获取 token 失败: {self._token_refresh_error or '等待刷新超时'}"
+                )
 
+            self._token_refreshing = True
+            self._token_refresh_error = None
+
+        try:
+            return self._fetch_access_token()
+        except Exception as e:
+            self._token_refresh_error = str(e)
+            raise
+        finally:
+            with self._token_cond:
+                self._token_refreshing = False
+                self._token_cond.notify_all()
+
+    def _fetch_access_token(self):
+        """请求同花顺接口获取新的访问令牌"""
         url = f"{self.base_url}/api/v1/get_access_token"
         headers = {
             "Content-Type": "application/json",
@@ -26,26 +434,28 @@ class IFindForexService:
         }
 
         try:
-            resp = requests.post(url, headers=headers, timeout=8)
+            resp = self._send(url, headers, timeout=(self.timeout[0], 8))
             if resp.status_code != 200:
                 raise RuntimeError(f"获取 token 失败: {resp.text}")
 
             res = resp.json()
             data = res["data"] if "data" in res else res
 
-            self.access_token = data.get("access_token")
-            if not self.access_token:
+            access_token = data.get("access_token")
+            if not access_token:
                 raise RuntimeError("响应中缺少 access_token")
 
             if "expire_at" in data:
-                self.token_expires_at = datetime.strptime(
+                expires_at = datetime.strptime(
                     data["expire_at"], "%Y-%m-%d %H:%M:%S"
                 ) - timedelta(seconds=60)
             else:
                 expires_in = int(data.get("expires_in", 3600))
-                self.token_expires_at = datetime.now() + timedelta(
-                    seconds=expires_in - 60
-                )
+                expires_at = datetime.now() + timedelta(seconds=expires_in - 60)
+
+            # 先写过期时间再写令牌，读线程看到新令牌时有效期也已更新
+            self.token_expires_at = expires_at
+            self.access_token = access_token
 
             print(
                 f"获取token成功: {self.access_token}, 有效期至: {self.token_expires_at}"
@@ -56,76 +466,341 @@ class IFindForexService:
             print(f"获取token错误: {e}")
             raise
 
+    def start_token_refresher(
+        self, lead_seconds: float = 300, retry_seconds: float = 30
+    ):
+        """启动后台线程，在令牌过期前 lead_seconds 秒主动刷新"""
+        if self._refresher_thread and self._refresher_thread.is_alive():
+            return self._refresher_thread
+
+        self._refresher_stop.clear()
+        self._refresher_thread = threading.Thread(
+            target=self._token_refresher_loop,
+            args=(lead_seconds, retry_seconds),
+            name="ifind-token-refresher",
+            daemon=True,
+        )
+        self._refresher_thread.start()
+        return self._refresher_thread
+
+    def stop_token_refresher(self):
+        """停止后台令牌刷新线程"""
+        self._refresher_stop.set()
+        if self._refresher_thread:
+            self._refresher_thread.join(timeout=5)
+            self._refresher_thread = None
+
+    def _token_refresher_loop(self, lead_seconds: float, retry_seconds: float):
+        """后台刷新循环：失败时按指数退避重试，最长间隔10分钟"""
+        backoff = retry_seconds
+        while not self._refresher_stop.is_set():
+            expires_at = self.token_expires_at
+            if self.access_token and expires_at:
+                refresh_at = expires_at - timedelta(seconds=lead_seconds)
+                wait = (refresh_at - datetime.now()).total_seconds()
+                if wait > 0:
+                    self._refresher_stop.wait(wait)
+                    continue
+
+            try:
+                self._refresh_access_token_single_flight(force=True)
+                backoff = retry_seconds
+                # 两次刷新之间至少间隔 retry_seconds，防止有效期过短时频繁刷新
+                self._refresher_stop.wait(retry_seconds)
+            except Exception:
+                self._refresher_stop.wait(backoff)
+                backoff = min(backoff * 2, 600)
+
     def get_forex_realtime_data(self, currency_pairs: str):
-        """实时行情数据"""
-        url = f"{self.base_url}/api/v1/real_time_quotation"
-        headers = {
-            "Content-Type": "application/json",
-            "access_token": self.get_access_token(),
-        }
+        """实时行情数据，开启请求合并时与同一窗口内的其他请求共用一次上游调用"""
+        if self.realtime_coalescer is None:
+            return self._fetch_realtime_data(currency_pairs)
+
+        codes = [code.strip() for code in currency_pairs.split(",") if code.strip()]
+        return self.realtime_coalescer.get_response(codes)
+
+    def _fetch_realtime_data(self, currency_pairs: str):
+        """向同花顺请求实时行情"""
+        return self._post(*self._build_realtime_request(currency_pairs))
+
+    def start_quote_poller(self, pairs=None, interval: float = 3.0):
+        """启动后台线程，按固定间隔轮询 pairs 的实时行情并发布快照"""
+        if self.quote_poller is None:
+            self.quote_poller = QuotePoller(
+                self._fetch_realtime_data,
+                self.format_realtime_data,
+                pairs or DEFAULT_QUOTE_PAIRS,
+                interval=interval,
+                listeners=[self._publish_snapshot],
+            )
+        self.quote_poller.start()
+        return self.quote_poller
+
+    def stop_quote_poller(self):
+        """停止后台行情轮询与新K线推送线程"""
+        if self.quote_poller is not None:
+            self.quote_poller.stop()
+        self._bar_stop.set()
+        self._bar_wakeup.set()
+        if self._bar_thread:
+            self._bar_thread.join(timeout=5)
+            self._bar_thread = None
+
+    def start_backfill(
+        self,
+        pairs=None,
+        minute_days: float = 60,
+        daily_years: float = 5,
+        workers: int = 4,
+    ):
+        """在后台线程中回填 pairs 的历史分钟K线与日K线，进度见 get_metrics()["backfill"]"""
+        if self.backfill_job is None or not self.backfill_job.get_stats()["running"]:
+            self.backfill_job = BackfillJob(
+                self,
+                pairs or DEFAULT_QUOTE_PAIRS,
+                backfill_ranges(minute_days, daily_years),
+                workers=workers,
+            )
+            self.backfill_job.start()
+        return self.backfill_job
+
+    def get_quote_snapshot(self):
+        """最新的实时行情快照，未启动轮询或尚未成功轮询时为 None"""
+        if self.quote_poller is None:
+            return None
+        return self.quote_poller.snapshot
+
+    def snapshot_quotes(self, snapshot, currency_pairs):
+        """
+        从行情快照读取 currency_pairs 的行情，快照中没有的交叉汇率由快照中的货币对换算
+        Returns:
+            行情列表，有货币对既不在快照中也无法换算时返回 None
+        """
+        quotes = []
+        for pair in currency_pairs:
+            quote = snapshot.quotes.get(pair)
+            if quote is None:
+                legs = find_legs(pair, snapshot.quotes)
+                quote = legs and synthesize_quote(pair, legs, snapshot.quotes)
+                if not quote:
+                    return None
+            quotes.append(quote)
+        return quotes
+
+    def _publish_snapshot(self, snapshot):
+        """向订阅者推送行情增量，由报价聚合K线，并检查是否有新收盘的K线"""
+        self.quote_stream.publish_snapshot(snapshot)
+        if self.tick_aggregator is not None:
+            self.tick_aggregator.on_snapshot(snapshot)
+        self._schedule_closed_bars()
+
+    def _schedule_closed_bars(self):
+        """通知推送线程检查新收盘的K线（线程忙时多次通知合并为一次）"""
+        with self._stats_lock:
+            if self._bar_thread is None or not self._bar_thread.is_alive():
+                self._bar_stop.clear()
+                self._bar_thread = threading.Thread(
+                    target=self._closed_bars_loop,
+                    name="forex-bar-publisher",
+                    daemon=True,
+                )
+                self._bar_thread.start()
+        self._bar_wakeup.set()
+
+    def _closed_bars_loop(self):
+        while not self._bar_stop.is_set():
+            self._bar_wakeup.wait()
+            self._bar_wakeup.clear()
+            if self._bar_stop.is_set():
+                break
+            try:
+                self._publish_closed_bars()
+            except Exception as e:
+                print(f"推送新K线失败: {e}")
+
+    def _publish_closed_bars(self):
+        """对被订阅的 (货币对, 周期)，每个K线周期结束后获取一次增量K线并推送新收盘的K线"""
+        # K线时间戳以本地时间按 UTC 换算，当前时间需使用相同换算
+        now = to_epoch(datetime.now())
+        subscriptions = self.quote_stream.bar_subscriptions()
+        # 只保留仍被订阅的位置，取消订阅后重新订阅时从头记录
+        for key in set(self._bar_marks) - subscriptions:
+            del self._bar_marks[key]
+        due = {}
+        for pair, period in subscriptions:
+            bucket = now // (int(MINUTE_PERIODS[period]) * 60)
+            mark = self._bar_marks.get((pair, period))
+            if mark is None or mark[0] != bucket:
+                due.setdefault(period, []).append(pair)
+
+        for period, pairs in due.items():
+            seconds = int(MINUTE_PERIODS[period]) * 60
+            bucket = now // seconds
+            try:
+                # 同一周期的货币对合并为一次请求
+                bars_by_pair = self.get_period_bars_batch(sorted(pairs), period, 3)
+            except Exception as e:
+                print(f"获取 {','.join(pairs)} {period} 新K线失败: {e}")
+                continue
+
+            for pair, bars in bars_by_pair.items():
+                mark = self._bar_marks.get((pair, period))
+                closed = bars.t + seconds <= now
+                if mark is None:
+                    # 首次订阅只记录位置，历史K线由 /chart 接口获取
+                    last_t = bars.t[closed][-1] if closed.any() else 0
+                else:
+                    last_t = mark[1]
+                    new = closed & (bars.t > last_t)
+                    if new.any():
+                        new_bars = type(bars)(*(col[new] for col in bars))
+                        for bar in format_bars(new_bars, "kline"):
+                            self.quote_stream.publish(
+                                "bar",
+                                pair,
+                                {"code": pair, "period": period, "bar": bar},
+                                period,
+                            )
+                        last_t = new_bars.t[-1]
+                self._bar_marks[(pair, period)] = (bucket, int(last_t))
+
+    def _build_realtime_request(self, currency_pairs: str):
+        """构造实时行情请求，返回 (接口路径, 请求体, 错误前缀)"""
         body = {
             "codes": currency_pairs,
             "indicators": "open,high,low,latest,changeRatio",
         }
-
-        resp = requests.post(url, json=body, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            raise RuntimeError(f"实时行情接口错误: {resp.text}")
-        return resp.json()
+        return REALTIME_PATH, body, "实时行情接口错误"
 
     def get_forex_kline_data(
         self, currency_pair: str, period: str = "1d", count: int = 100
     ):
         """K线数据（日线及以上周期）"""
+        if self.bar_cache is None:
+            return self._post(*self._build_kline_request(currency_pair, period, count))
+
+        start_date, end_date = self._kline_window(period, count)
+        bars = self._cached_kline_bars(
+            currency_pair,
+            period,
+            to_epoch(datetime.combine(start_date, datetime.min.time())),
+            to_epoch(datetime.combine(end_date, datetime.max.time())),
+        )
+        return bars_to_raw(currency_pair, bars, "D")
+
+    def _cached_kline_bars(self, currency_pair: str, period: str, start_ts, end_ts):
+        """通过K线缓存获取指定时间范围的日线及以上周期K线"""
+        return self._cached_kline_bars_batch([currency_pair], period, start_ts, end_ts)[
+            currency_pair
+        ]
+
+    def _cached_kline_bars_batch(self, currency_pairs, period: str, start_ts, end_ts):
+        """通过K线缓存批量获取多个货币对的日线及以上周期K线，缺失部分合并请求"""
+
+        def fetch(pairs, fetch_start, fetch_end):
+            return self.fetch_bar_range(pairs, period, fetch_start, fetch_end)
+
+        return self.bar_cache.get_windows(
+            currency_pairs, period, start_ts, end_ts, fetch
+        )
+
+    def _kline_window(self, period: str, count: int):
+        """计算K线请求的起止日期（恰好包含最近 count 根K线，跳过休市日）"""
         if period not in ["1d", "1w", "1m", "1q", "1y"]:
             raise ValueError("K线数据 period 仅支持 1d/1w/1m/1q/1y")
 
         today = datetime.now().date()
-        delta_map = {
-            "1d": timedelta(days=1),
-            "1w": timedelta(weeks=1),
-            "1m": timedelta(days=31),
-            "1q": timedelta(days=93),
-            "1y": timedelta(days=365),
-        }
+        return self.calendar.kline_start(period, count, today), today
 
-        start_date = (today - delta_map[period] * count).strftime("%Y-%m-%d")
-        end_date = today.strftime("%Y-%m-%d")
+    def _build_kline_request(self, currency_pair: str, period: str, count: int):
+        """构造K线请求，返回 (接口路径, 请求体, 错误前缀)"""
+        start_date, end_date = self._kline_window(period, count)
+        return self._build_kline_range_request(
+            currency_pair, period, start_date, end_date
+        )
 
-        url = f"{self.base_url}/api/v1/cmd_history_quotation"
-        headers = {
-            "Content-Type": "application/json",
-            "access_token": self.get_access_token(),
-        }
+    def _build_kline_range_request(
+        self, currency_pair: str, period: str, start_date, end_date
+    ):
+        """构造指定日期区间的K线请求"""
         body = {
             "codes": currency_pair,
             "indicators": "open,high,low,close,volume,amount,changeRatio",
-            "startdate": start_date,
-            "enddate": end_date,
+            "startdate": start_date.strftime("%Y-%m-%d"),
+            "enddate": end_date.strftime("%Y-%m-%d"),
             "functionpara": {"Interval": period.upper().replace("1", "")},
         }
 
-        resp = requests.post(url, json=body, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            raise RuntimeError(f"K线接口错误: {resp.text}")
-        return resp.json()
+        return HISTORY_PATH, body, "K线接口错误"
 
     def get_forex_minute_data(
         self, currency_pair: str, interval: str = "1", count: int = 500
     ):
         """分钟级数据（支持1/5/15/30/60分钟）"""
+        if self.bar_cache is None:
+            if count <= self.minute_chunk_bars:
+                return self._post(
+                    *self._build_minute_request(currency_pair, interval, count)
+                )
+            start_dt, end_dt = self._minute_window(interval, count)
+            bars = self.fetch_bar_range(
+                [currency_pair], interval, to_epoch(start_dt), to_epoch(end_dt)
+            )[currency_pair]
+            return bars_to_raw(currency_pair, bars, "m")
+
+        start_dt, end_dt = self._minute_window(interval, count)
+        bars = self._cached_minute_bars(
+            currency_pair, interval, to_epoch(start_dt), to_epoch(end_dt)
+        )
+        return bars_to_raw(currency_pair, bars, "m")
+
+    def _cached_minute_bars(self, currency_pair: str, interval: str, start_ts, end_ts):
+        """通过K线缓存获取指定时间范围的分钟K线"""
+        return self._cached_minute_bars_batch(
+            [currency_pair], interval, start_ts, end_ts
+        )[currency_pair]
+
+    def _cached_minute_bars_batch(
+        self, currency_pairs, interval: str, start_ts, end_ts
+    ):
+        """通过K线缓存批量获取多个货币对的分钟K线，缺失部分合并请求"""
+
+        def fetch(pairs, fetch_start, fetch_end):
+            return self.fetch_bar_range(pairs, interval, fetch_start, fetch_end)
+
+        live = set()
+        if self.tick_aggregator is not None and interval == TICK_BAR_INTERVAL:
+            live = self.tick_aggregator.live_pairs()
+        windows = self.bar_cache.get_windows(
+            currency_pairs, interval, start_ts, end_ts, fetch, fresh=live
+        )
+        # 本地维护的货币对：正在形成的K线取自实时报价
+        for pair in live.intersection(windows):
+            windows[pair] = self.tick_aggregator.with_current_bar(
+                pair, windows[pair], start_ts, end_ts
+            )
+        return windows
+
+    def _minute_window(self, interval: str, count: int):
+        """计算分钟数据请求的起止时间（恰好包含最近 count 根K线，跳过周末休市）"""
         if interval not in ["1", "5", "15", "30", "60"]:
             raise ValueError("分钟数据 interval 仅支持 1/5/15/30/60")
 
         end_dt = datetime.now()
-        minutes = int(interval) * count
-        start_dt = end_dt - timedelta(minutes=minutes)
+        start_ts = self.calendar.bars_start(to_epoch(end_dt), int(interval) * 60, count)
+        return from_epoch(start_ts), end_dt
 
-        url = f"{self.base_url}/api/v1/high_frequency"
-        headers = {
-            "Content-Type": "application/json",
-            "access_token": self.get_access_token(),
-        }
+    def _build_minute_request(self, currency_pair: str, interval: str, count: int):
+        """构造分钟数据请求，返回 (接口路径, 请求体, 错误前缀)"""
+        start_dt, end_dt = self._minute_window(interval, count)
+        return self._build_minute_range_request(
+            currency_pair, interval, start_dt, end_dt
+        )
+
+    def _build_minute_range_request(
+        self, currency_pair: str, interval: str, start_dt, end_dt
+    ):
+        """构造指定时间区间的分钟数据请求"""
         body = {
             "codes": currency_pair,
             "indicators": "latest,open,high,low,close",
@@ -134,10 +809,336 @@ class IFindForexService:
             "functionpara": {"Interval": interval, "Fill": "Previous"},
         }
 
-        resp = requests.post(url, json=body, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            raise RuntimeError(f"分钟数据接口错误: {resp.text}")
-        return resp.json()
+        return HIGH_FREQUENCY_PATH, body, "分钟数据接口错误"
+
+    def get_forex_period_data(
+        self,
+        currency_pair: str,
+        period: str,
+        count: int,
+        max_points: int = None,
+        chart_type: str = "line",
+    ):
+        """按图表周期获取数据（同花顺接口响应结构），指定 max_points 时按图表类型降采样"""
+        bars = self.get_period_bars(currency_pair, period, count)
+        if max_points:
+            bars = downsample_bars(bars, max_points, chart_type)
+        time_unit = "D" if period in KLINE_PERIODS else "m"
+        return bars_to_raw(currency_pair, bars, time_unit)
+
+    def get_forex_chart_data(
+        self,
+        currency_pair: str,
+        period: str,
+        count: int,
+        chart_type: str = "line",
+        max_points: int = None,
+    ):
+        """按图表周期获取图表数据，由列式K线直接格式化，结果同 format_chart_data"""
+        bars = self.get_chart_bars(currency_pair, period, count, chart_type, max_points)
+        time_unit = "D" if period in KLINE_PERIODS else "m"
+        return format_bars(bars, chart_type, time_unit)
+
+    def get_forex_chart_data_batch(
+        self,
+        currency_pairs,
+        period: str,
+        count: int,
+        chart_type: str = "line",
+        max_points: int = None,
+    ):
+        """批量获取多个货币对的图表数据（上游请求合并），返回 {同花顺代码: 图表数据}"""
+        bars_by_pair = self.get_chart_bars_batch(
+            currency_pairs, period, count, chart_type, max_points
+        )
+        time_unit = "D" if period in KLINE_PERIODS else "m"
+        return {
+            pair: format_bars(bars, chart_type, time_unit)
+            for pair, bars in bars_by_pair.items()
+        }
+
+    def get_chart_bars(
+        self,
+        currency_pair: str,
+        period: str,
+        count: int,
+        chart_type: str = "line",
+        max_points: int = None,
+    ):
+        """按图表周期获取列式K线，指定 max_points 时按图表类型降采样"""
+        bars = self.get_period_bars(currency_pair, period, count)
+        if max_points:
+            bars = downsample_bars(bars, max_points, chart_type)
+        return bars
+
+    def get_chart_bars_batch(
+        self,
+        currency_pairs,
+        period: str,
+        count: int,
+        chart_type: str = "line",
+        max_points: int = None,
+    ):
+        """批量获取多个货币对的图表K线（上游请求合并），返回 {同花顺代码: Bars}"""
+        bars_by_pair = self.get_period_bars_batch(currency_pairs, period, count)
+        if max_points:
+            bars_by_pair = {
+                pair: downsample_bars(bars, max_points, chart_type)
+                for pair, bars in bars_by_pair.items()
+            }
+        return bars_by_pair
+
+    def get_period_bars(self, currency_pair: str, period: str, count: int):
+        """按图表周期获取列式K线
+
+        分钟周期由1分钟K线、周线及以上周期由日线在本地重采样得到，
+        每个货币对只需按最细粒度请求一次，切换周期不再产生上游请求。
+        """
+        return self.get_period_bars_batch([currency_pair], period, count)[currency_pair]
+
+    def get_period_bars_batch(self, currency_pairs, period: str, count: int):
+        """
+        按图表周期批量获取多个货币对的列式K线，缺失数据以逗号分隔的代码合并请求上游
+        Args:
+            currency_pairs: 同花顺代码列表
+            period: 图表周期
+            count: 每个货币对的K线条数
+        Returns:
+            {同花顺代码: Bars}
+        """
+        pairs = list(dict.fromkeys(currency_pairs))
+        crosses = self._cross_legs(pairs, period)
+        if not crosses:
+            return self._period_bars_batch(pairs, period, count)
+
+        # 交叉汇率由已缓存的货币对换算，只有其余货币对需要请求上游
+        legs = sorted({leg for cross in crosses.values() for leg, _ in cross})
+        direct = [pair for pair in pairs if pair not in crosses]
+        fetched = self._period_bars_batch(
+            list(dict.fromkeys(direct + legs)), period, count
+        )
+        return {
+            pair: (
+                synthesize_bars(crosses[pair], fetched)
+                if pair in crosses
+                else fetched[pair]
+            )
+            for pair in pairs
+        }
+
+    def _cross_legs(self, currency_pairs, period: str):
+        """
+        本周期没有缓存数据、但可由已缓存货币对换算的交叉汇率
+        Returns:
+            {同花顺代码: find_legs 的结果}
+        """
+        if self.bar_cache is None:
+            return {}
+        if period in MINUTE_PERIODS:
+            intervals = {self.resample_base_interval, MINUTE_PERIODS[period]}
+        elif period in KLINE_PERIODS:
+            intervals = {"1d", period}
+        else:
+            return {}
+
+        available = set()
+        for interval in intervals:
+            available |= self.bar_cache.cached_pairs(interval)
+        crosses = {}
+        for pair in currency_pairs:
+            if pair not in available:
+                legs = find_legs(pair, available)
+                if legs:
+                    crosses[pair] = legs
+        return crosses
+
+    def _period_bars_batch(self, pairs, period: str, count: int):
+        """按图表周期批量获取K线（不换算交叉汇率）"""
+        if period in MINUTE_PERIODS:
+            interval = MINUTE_PERIODS[period]
+            if self.bar_cache is None:
+                request = self._build_minute_request(",".join(pairs), interval, count)
+                return self._fetch_bars_by_code(request, pairs)
+
+            start_dt, end_dt = self._minute_window(interval, count)
+            start_ts, end_ts = to_epoch(start_dt), to_epoch(end_dt)
+            base = self.resample_base_interval
+            if count * int(interval) > self.bar_cache.max_bars * int(base):
+                # 所需的基础周期K线超出缓存容量，直接请求目标周期
+                base = interval
+            bars_by_pair = self._resampled_bars(
+                pairs,
+                base,
+                interval,
+                int(interval),
+                start_ts,
+                end_ts,
+                self._cached_minute_bars_batch,
+            )
+        elif period in KLINE_PERIODS:
+            if self.bar_cache is None:
+                request = self._build_kline_request(",".join(pairs), period, count)
+                return self._fetch_bars_by_code(request, pairs)
+
+            start_date, end_date = self._kline_window(period, count)
+            start_ts = to_epoch(datetime.combine(start_date, datetime.min.time()))
+            end_ts = to_epoch(datetime.combine(end_date, datetime.max.time()))
+            base = "1d"
+            if count * KLINE_DAILY_BARS[period] > self.bar_cache.max_bars:
+                base = period
+            bars_by_pair = self._resampled_bars(
+                pairs,
+                base,
+                period,
+                period,
+                start_ts,
+                end_ts,
+                self._cached_kline_bars_batch,
+            )
+        else:
+            raise ValueError(f"不支持的图表周期: {period}")
+
+        return {pair: tail_bars(bars, count) for pair, bars in bars_by_pair.items()}
+
+    def _resampled_bars(
+        self, currency_pairs, base, target, rule, start_ts, end_ts, cached_bars
+    ):
+        """从基础周期缓存重采样得到目标周期K线，基础周期无数据的货币对直接请求目标周期
+
+        cached_bars(pairs, interval, start_ts, end_ts) -> {pair: Bars}
+        """
+        if target == base:
+            return cached_bars(currency_pairs, target, start_ts, end_ts)
+
+        # 起点对齐到目标周期的区间边界，避免第一根K线只聚合了部分数据
+        start_ts = int(bucket_starts(np.array([start_ts]), rule)[0])
+
+        result = {}
+        fallback = []
+        from_base = []
+        for pair in currency_pairs:
+            miss_at = self._resample_base_misses.get((pair, base))
+            if miss_at is None or datetime.now() - miss_at > timedelta(minutes=10):
+                from_base.append(pair)
+            else:
+                fallback.append(pair)
+
+        if from_base:
+            for pair, bars in cached_bars(from_base, base, start_ts, end_ts).items():
+                if len(bars.t):
+                    self._resample_base_misses.pop((pair, base), None)
+                    result[pair] = resample_bars(bars, rule)
+                else:
+                    # 基础周期数据为空（如部分货币对没有1分钟数据），一段时间内不再尝试
+                    self._resample_base_misses[(pair, base)] = datetime.now()
+                    fallback.append(pair)
+
+        if fallback:
+            result.update(cached_bars(fallback, target, start_ts, end_ts))
+        return {pair: result[pair] for pair in currency_pairs}
+
+    def fetch_bar_range(self, currency_pairs, interval: str, start_ts, end_ts):
+        """
+        向上游请求多个货币对 [start_ts, end_ts] 内的K线（不经过K线缓存）
+        Args:
+            currency_pairs: 同花顺代码列表
+            interval: 分钟周期（1/5/15/30/60）或K线周期（1d/1w/1m/1q/1y）
+            start_ts: 起始时间戳
+            end_ts: 结束时间戳
+        Returns:
+            {同花顺代码: Bars}
+        """
+        if interval in KLINE_PERIODS:
+            request = self._build_kline_range_request(
+                ",".join(currency_pairs),
+                interval,
+                from_epoch(start_ts).date(),
+                from_epoch(end_ts).date(),
+            )
+            return self._fetch_bars_by_code(request, currency_pairs)
+
+        # 分段按交易时长计算，跨周末的窗口不会多出没有数据的分段
+        chunk_span = self.minute_chunk_bars * int(interval) * 60
+        trading_span = self.calendar.trading_seconds(
+            end_ts
+        ) - self.calendar.trading_seconds(start_ts)
+        if trading_span > chunk_span:
+            return self._fetch_minute_chunks(
+                currency_pairs, interval, start_ts, end_ts, chunk_span
+            )
+        request = self._build_minute_range_request(
+            ",".join(currency_pairs),
+            interval,
+            from_epoch(start_ts),
+            from_epoch(end_ts),
+        )
+        return self._fetch_bars_by_code(request, currency_pairs)
+
+    def _fetch_minute_chunks(
+        self, currency_pairs, interval: str, start_ts, end_ts, chunk_span
+    ):
+        """
+        将大时间窗口的分钟数据按每段 chunk_span 秒交易时长分段并发请求，按时间顺序拼接
+        相邻分段共用边界时刻，重复的K线在拼接时去除；同时在途的分段不超过
+        chunk_workers 个，每段解析后立即写入预分配的输出数组，内存占用不随窗口长度成倍增长
+        """
+        first = int(self.calendar.trading_seconds(start_ts))
+        last = int(self.calendar.trading_seconds(end_ts))
+        bounds = self.calendar.from_trading_seconds(
+            np.append(np.arange(first, last, chunk_span), last)
+        )
+        bounds[0] = start_ts
+        bounds[-1] = end_ts
+        chunks = deque(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        capacity = (last - first) // (int(interval) * 60) + 1
+        buffers = {pair: BarsBuffer(capacity) for pair in currency_pairs}
+
+        def submit(pool):
+            chunk_start, chunk_end = chunks.popleft()
+            request = self._build_minute_range_request(
+                ",".join(currency_pairs),
+                interval,
+                from_epoch(chunk_start),
+                from_epoch(chunk_end),
+            )
+            # 在工作线程中沿用当前的限流通道
+            return pool.submit(
+                copy_context().run, self._fetch_bars_by_code, request, currency_pairs
+            )
+
+        workers = min(self.chunk_workers, len(chunks))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="forex-chunk"
+        ) as pool:
+            pending = deque(submit(pool) for _ in range(workers))
+            try:
+                while pending:
+                    fetched = pending.popleft().result()
+                    if chunks:
+                        pending.append(submit(pool))
+                    for pair, bars in fetched.items():
+                        buffers[pair].append(bars)
+                    del fetched
+            finally:
+                for future in pending:
+                    future.cancel()
+        return {pair: buffer.to_bars() for pair, buffer in buffers.items()}
+
+    def _fetch_bars(self, request):
+        """请求上游并解析为列式K线（只请求了单个代码，取第一个 table）"""
+        bars_by_code = bars_from_raw(self._post(*request))
+        return next(iter(bars_by_code.values()), empty_bars())
+
+    def _fetch_bars_by_code(self, request, currency_pairs):
+        """
+        请求上游（codes 为逗号分隔的多个代码）并按代码拆分为列式K线
+        Returns:
+            {同花顺代码: Bars}，上游未返回的代码为空K线
+        """
+        if len(currency_pairs) == 1:
+            return {currency_pairs[0]: self._fetch_bars(request)}
+        bars_by_code = bars_from_raw(self._post(*request))
+        return {pair: bars_by_code.get(pair, empty_bars()) for pair in currency_pairs}
 
     def get_forex_indicators(
         self,
@@ -147,19 +1148,65 @@ class IFindForexService:
         count: int = 500,
         interval: str = "1",
     ):
-        """技术指标数据"""
+        """技术指标数据（基于缓存K线在本地计算，不支持的指标仍请求同花顺）"""
+        name = indicator_type.upper()
+        if self.bar_cache is None or name not in DEFAULT_PARAMS:
+            with self.upstream_lane("indicators"):
+                return self._post(
+                    *self._build_indicator_request(
+                        currency_pair, indicator_type, period, count, interval
+                    )
+                )
+
+        specs = [(name, normalize_params(name, [period]))]
+        return self.get_forex_indicator_set(currency_pair, specs, count, interval)[0]
+
+    def get_forex_indicator_set(
+        self, currency_pair: str, specs, count: int = 500, interval: str = "1"
+    ):
+        """
+        获取一次K线并在本地计算多个技术指标
+        Args:
+            currency_pair: 同花顺代码
+            specs: [(指标名, 参数元组)]，见 utils.indicators.parse_indicator_specs
+            count: 输出的数据条数
+            interval: 分钟周期（1/5/15/30/60）
+        Returns:
+            与 specs 一一对应的同花顺响应结构列表
+        """
         if interval not in ["1", "5", "15", "30", "60"]:
             raise ValueError("技术指标 interval 仅支持 1/5/15/30/60")
 
-        end_dt = datetime.now()
-        minutes = int(interval) * count
-        start_dt = end_dt - timedelta(minutes=minutes)
+        # 额外获取预热K线，保证窗口内第一个指标值已经形成
+        warmup = max((warmup_bars(name, params) for name, params in specs), default=0)
+        with self.upstream_lane("indicators"):
+            bars = drop_missing(
+                self.get_period_bars(currency_pair, f"{interval}min", count + warmup)
+            )
+
+        results = []
+        for name, params in specs:
+            # 增量指标状态：新K线到达时只在上一状态基础上更新
+            t, columns = self.indicator_states.series(
+                currency_pair, interval, name, params, bars, count
+            )
+            results.append(columns_to_raw(currency_pair, t, columns))
+        return results
+
+    def _build_indicator_request(
+        self,
+        currency_pair: str,
+        indicator_type: str,
+        period: int,
+        count: int,
+        interval: str,
+    ):
+        """构造技术指标请求，返回 (接口路径, 请求体, 错误前缀)"""
+        if interval not in ["1", "5", "15", "30", "60"]:
+            raise ValueError("技术指标 interval 仅支持 1/5/15/30/60")
+
+        start_dt, end_dt = self._minute_window(interval, count)
 
-        url = f"{self.base_url}/api/v1/high_frequency"
-        headers = {
-            "Content-Type": "application/json",
-            "access_token": self.get_access_token(),
-        }
         body = {
             "codes": currency_pair,
             "indicators": indicator_type,
@@ -172,10 +1219,7 @@ class IFindForexService:
             },
         }
 
-        resp = requests.post(url, json=body, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            raise RuntimeError(f"技术指标接口错误: {resp.text}")
-        return resp.json()
+        return HIGH_FREQUENCY_PATH, body, "技术指标接口错误"
 
     def format_realtime_data(self, raw_data: dict):
         """格式化实时数据为前端需要的格式"""
@@ -184,29 +1228,21 @@ class IFindForexService:
 
         formatted_data = []
         for table in raw_data["tables"]:
-            thscode = table.get("thscode", "")
             table_data = table.get("table", {})
-
-            data_obj = {
-                "code": thscode,
-                "latest": (
-                    table_data.get("latest", [0])[0] if table_data.get("latest") else 0
-                ),
-                "changeRatio": (
-                    table_data.get("changeRatio", [0])[0]
-                    if table_data.get("changeRatio")
-                    else 0
-                ),
-                "open": table_data.get("open", [0])[0] if table_data.get("open") else 0,
-                "high": table_data.get("high", [0])[0] if table_data.get("high") else 0,
-                "low": table_data.get("low", [0])[0] if table_data.get("low") else 0,
-            }
+            data_obj = {"code": table.get("thscode", "")}
+            # 每个字段取第一个值，字段缺失或为空时为 0
+            for field in REALTIME_FIELDS:
+                values = table_data.get(field)
+                data_obj[field] = values[0] if values else 0
             formatted_data.append(data_obj)
 
         return formatted_data
 
     def format_chart_data(self, raw_data: dict, chart_type: str = "line"):
-        """格式化图表数据"""
+        """格式化图表数据（接口响应结构）
+
+        图表接口由缓存的列式K线经 format_bars 直接格式化，不经过本方法
+        """
         if not raw_data or "tables" not in raw_data or not raw_data["tables"]:
             return []
 
@@ -268,9 +1304,9 @@ class IFindForexService:
 _forex_service = None
 
 
-def init_forex_service(refresh_token: str):
+def init_forex_service(refresh_token: str, **pool_options):
     global _forex_service
-    _forex_service = IFindForexService(refresh_token)
+    _forex_service = IFindForexService(refresh_token, **pool_options)
     return _forex_service
 
 
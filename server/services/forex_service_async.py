@@ -0,0 +1,227 @@
+import asyncio
+import json
+import threading
+import time
+import aiohttp
+from services.cassette import CassettePlayer, CassetteRecorder
+
+
+class AsyncIFindForexService:
+    """IFindForexService 的异步版本
+
+    与同步服务共享 access_token（由同步服务负责单飞刷新与后台刷新），
+    自身持有一个运行在独立线程中的事件循环和 aiohttp 连接池，
+    组合接口可以并发发起多个上游请求，总耗时取决于最慢的一个。
+    """
+
+    def __init__(
+        self,
+        sync_service,
+        pool_maxsize: int = 32,
+        pool_per_host: int = 16,
+        keepalive_timeout: float = 60,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10,
+    ):
+        self.sync_service = sync_service
+        self.pool_maxsize = pool_maxsize
+        self.pool_per_host = pool_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        )
+
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._session = None
+
+    @property
+    def base_url(self):
+        return self.sync_service.base_url
+
+    def _ensure_loop(self):
+        """启动后台事件循环线程（惰性创建）"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="ifind-async-loop",
+                    daemon=True,
+                )
+                self._loop_thread.start()
+        return self._loop
+
+    def run(self, coro, timeout: float = None):
+        """在后台事件循环中执行协程并阻塞等待结果，供同步的 Flask 视图调用"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout)
+
+    async def gather(self, *coros):
+        """并发执行多个上游请求，任意一个失败则抛出异常"""
+        return await asyncio.gather(*coros)
+
+    async def _get_session(self):
+        """获取共享的 aiohttp 会话（必须在后台事件循环中调用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout
+            )
+        return self._session
+
+    async def get_access_token(self):
+        """获取访问令牌，令牌失效时在线程池中复用同步服务的单飞刷新"""
+        if self.sync_service._token_valid():
+            return self.sync_service.access_token
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sync_service.get_access_token)
+
+    async def _post(self, path: str, body: dict, error_prefix: str, lane: str = None):
+        """携带access_token异步调用同花顺接口（与同步服务共用该接口的熔断器与限流器）"""
+        url = f"{self.base_url}{path}"
+        breaker = self.sync_service._breaker(path)
+        breaker.before_call()
+        lane = lane or self.sync_service.lane_for(path)
+        limiter = self.sync_service.rate_limiter
+        settled = False
+        try:
+            if limiter is not None:
+                # 排队等待令牌会阻塞，放到线程池中执行，不占用事件循环
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, limiter.acquire, lane)
+            try:
+                headers = {
+                    "Content-Type": "application/json",
+                    "access_token": await self.get_access_token(),
+                }
+                status, text = await self._send(path, url, headers, body, lane)
+            except Exception:
+                settled = True
+                breaker.record_failure()
+                raise
+
+            settled = True
+            if status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        finally:
+            # 限流排队超时或协程被取消（CancelledError 不是 Exception）时
+            # 没有上游结果，释放半开状态的试探名额
+            if not settled:
+                breaker.cancel_call()
+        if status != 200:
+            raise RuntimeError(f"{error_prefix}: {text}")
+        return json.loads(text)
+
+    async def _send(self, path: str, url: str, headers: dict, body: dict, lane=None):
+        """发送请求，返回 (状态码, 响应原文)；录制/回放模式与同步服务共用 cassette"""
+        cassette = self.sync_service.cassette
+        if isinstance(cassette, CassettePlayer):
+            loop = asyncio.get_running_loop()
+            resp = await loop.run_in_executor(None, cassette.respond, path, body, url)
+            return resp.status_code, resp.text
+
+        session = await self._get_session()
+        started = time.monotonic()
+        try:
+            async with session.post(url, json=body, headers=headers) as resp:
+                status, text = resp.status, await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 与同步服务一致，网络错误也录制，回放时同样以连接错误返回
+            self._record(cassette, path, body, None, str(e) or repr(e), started, lane)
+            raise
+        self._record(cassette, path, body, status, text, started, lane)
+        return status, text
+
+    @staticmethod
+    def _record(cassette, path, body, status, text, started, lane):
+        """录制模式下记录一次上游调用"""
+        if isinstance(cassette, CassetteRecorder):
+            elapsed = time.monotonic() - started
+            cassette.record(path, body, status, text, started, elapsed, lane)
+
+    async def get_forex_realtime_data(self, currency_pairs: str):
+        """实时行情数据"""
+        return await self._post(
+            *self.sync_service._build_realtime_request(currency_pairs)
+        )
+
+    async def get_forex_kline_data(
+        self, currency_pair: str, period: str = "1d", count: int = 100
+    ):
+        """K线数据（日线及以上周期）"""
+        return await self._post(
+            *self.sync_service._build_kline_request(currency_pair, period, count)
+        )
+
+    async def get_forex_minute_data(
+        self, currency_pair: str, interval: str = "1", count: int = 500
+    ):
+        """分钟级数据（支持1/5/15/30/60分钟）"""
+        return await self._post(
+            *self.sync_service._build_minute_request(currency_pair, interval, count)
+        )
+
+    async def get_forex_indicators(
+        self,
+        currency_pair: str,
+        indicator_type: str = "MA",
+        period: int = 20,
+        count: int = 500,
+        interval: str = "1",
+    ):
+        """技术指标数据"""
+        return await self._post(
+            *self.sync_service._build_indicator_request(
+                currency_pair, indicator_type, period, count, interval
+            ),
+            lane="indicators",
+        )
+
+    def format_realtime_data(self, raw_data: dict):
+        """格式化实时数据为前端需要的格式"""
+        return self.sync_service.format_realtime_data(raw_data)
+
+    def format_chart_data(self, raw_data: dict, chart_type: str = "line"):
+        """格式化图表数据"""
+        return self.sync_service.format_chart_data(raw_data, chart_type)
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self):
+        """关闭连接池并停止后台事件循环"""
+        if self._loop is None:
+            return
+        self.run(self._close_session(), timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._loop = None
+        self._loop_thread = None
+
+
+# 全局实例化
+_async_forex_service = None
+
+
+def init_async_forex_service(sync_service, **pool_options):
+    global _async_forex_service
+    _async_forex_service = AsyncIFindForexService(sync_service, **pool_options)
+    return _async_forex_service
+
+
+def get_async_forex_service():
+    if _async_forex_service is None:
+        raise RuntimeError(
+            "请先调用 init_async_forex_service(sync_service) 初始化异步服务！"
+        )
+    return _async_forex_service
@@ -0,0 +1,730 @@
+import atexit
+import json
+import math
+import os
+import threading
+from collections import deque
+import numpy as np
+from utils.bar_utils import Bars
+from utils.indicators import DEFAULT_PARAMS, compute_indicator, ema, ewm
+
+NAN = float("nan")
+
+
+class IncrementalIndicator:
+    """增量指标基类
+
+    每根新K线只在上一状态的基础上做常数时间的更新。同一时间戳的K线
+    重复到达时（最后一根K线仍在形成中），先恢复到该K线之前的状态再重新计算。
+    子类实现 _get_state / _set_state / _apply，以及由批量计算直接得到状态的 _seed。
+    """
+
+    name = None
+
+    def __init__(self, params):
+        self.params = tuple(params)
+        self.last_t = None
+        self._before_last = None
+
+    def update(self, t, high, low, close):
+        """
+        输入一根K线，返回该K线对应的指标值
+        Args:
+            t: 时间戳
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+        Returns:
+            {列名: 指标值}，尚未形成时为 NaN
+        """
+        t = int(t)
+        if self.last_t is not None and t < self.last_t:
+            raise ValueError(f"K线时间戳倒退: {t} < {self.last_t}")
+
+        if t == self.last_t:
+            self._restore(self._before_last)
+        else:
+            self._before_last = self._snapshot()
+        self.last_t = t
+        return self._apply(float(high), float(low), float(close))
+
+    def seed(self, bars):
+        """
+        用整段K线向量化地计算状态，结果与逐根输入 bars 相同（不保留回退点，
+        之后的第一根K线须晚于 bars 的最后一根）
+        Args:
+            bars: 按时间升序排列的 Bars
+        """
+        if not len(bars.t):
+            return
+        self._seed(
+            np.asarray(bars.high, dtype=np.float64),
+            np.asarray(bars.low, dtype=np.float64),
+            np.asarray(bars.close, dtype=np.float64),
+        )
+        self.last_t = int(bars.t[-1])
+        self._before_last = None
+
+    def to_dict(self):
+        """序列化为可写入 JSON 的字典"""
+        return {
+            "name": self.name,
+            "params": list(self.params),
+            "last_t": self.last_t,
+            "state": self._get_state(),
+            "before_last": self._before_last,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict 的结果恢复"""
+        indicator = create_indicator(data["name"], tuple(data["params"]))
+        indicator.last_t = data["last_t"]
+        indicator._set_state(data["state"])
+        indicator._before_last = data["before_last"]
+        return indicator
+
+    def _get_state(self):
+        raise NotImplementedError
+
+    def _set_state(self, state):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        """记录输入下一根K线之前的状态，用于同一K线更新时回退"""
+        return self._get_state()
+
+    def _restore(self, snapshot):
+        self._set_state(snapshot)
+
+    def _apply(self, high, low, close):
+        raise NotImplementedError
+
+    def _seed(self, high, low, close):
+        raise NotImplementedError
+
+
+def _wilder_last(values, period):
+    """
+    Wilder 平滑在最后一个值处的状态：不足 period 个时为累计和，
+    否则以前 period 个值的均值为初值按 1/period 递推
+    """
+    if len(values) < period:
+        return float(np.sum(values))
+    seed = np.concatenate(([values[:period].mean()], values[period:]))
+    return float(ewm(seed, 1.0 / period)[-1])
+
+
+class _EMA:
+    """指数移动平均的递推核心，以首个输入值为初值"""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+
+    def push(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class _Window:
+    """定长滑动窗口，维护窗口内的和与平方和（相对首个值平移以减小误差）"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.evicted = None
+
+    def push(self, x):
+        if self.shift is None:
+            self.shift = x
+        d = x - self.shift
+        self.values.append(x)
+        self.total += d
+        self.total_sq += d * d
+        self.evicted = None
+        if len(self.values) > self.size:
+            self.evicted = self.values.popleft()
+            old = self.evicted - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+
+    def fill(self, values):
+        """直接设置为依次输入 values 之后的窗口"""
+        values = np.asarray(values[-self.size :], dtype=np.float64)
+        d = values - values[0]
+        self.values = deque(values.tolist())
+        self.shift = float(values[0])
+        self.total = float(d.sum())
+        self.total_sq = float((d * d).sum())
+        self.evicted = None
+
+    def snapshot(self):
+        """常数大小的回退点：只记录累计量，窗口内容在回退时撤销最后一次 push"""
+        return {"shift": self.shift, "total": self.total, "total_sq": self.total_sq}
+
+    def restore(self, snapshot):
+        """撤销快照之后的一次 push"""
+        self.values.pop()
+        if self.evicted is not None:
+            self.values.appendleft(self.evicted)
+        self.evicted = None
+        self.shift = snapshot["shift"]
+        self.total = snapshot["total"]
+        self.total_sq = snapshot["total_sq"]
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.shift + self.total / self.size
+
+    def std(self):
+        m = self.total / self.size
+        return math.sqrt(max(self.total_sq / self.size - m * m, 0.0))
+
+    def get_state(self):
+        return {
+            "values": list(self.values),
+            "shift": self.shift,
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "evicted": self.evicted,
+        }
+
+    def set_state(self, state):
+        self.values = deque(state["values"])
+        self.shift = state["shift"]
+        self.total = state["total"]
+        self.total_sq = state["total_sq"]
+        self.evicted = state.get("evicted")
+
+
+class SMAIndicator(IncrementalIndicator):
+    """简单移动平均：维护窗口内的累计和"""
+
+    name = "MA"
+
+    def __init__(self, params=DEFAULT_PARAMS["MA"]):
+        super().__init__(params)
+        self.window = _Window(self.params[0])
+
+    def _get_state(self):
+        return self.window.get_state()
+
+    def _set_state(self, state):
+        self.window.set_state(state)
+
+    def _snapshot(self):
+        return self.window.snapshot()
+
+    def _restore(self, snapshot):
+        self.window.restore(snapshot)
+
+    def _apply(self, high, low, close):
+        self.window.push(close)
+        return {self.name: self.window.mean() if self.window.full else NAN}
+
+    def _seed(self, high, low, close):
+        self.window.fill(close)
+
+
+class EMAIndicator(IncrementalIndicator):
+    """指数移动平均"""
+
+    name = "EMA"
+
+    def __init__(self, params=DEFAULT_PARAMS["EMA"]):
+        super().__init__(params)
+        self.ema = _EMA(2.0 / (self.params[0] + 1))
+
+    def _get_state(self):
+        return {"value": self.ema.value}
+
+    def _set_state(self, state):
+        self.ema.value = state["value"]
+
+    def _apply(self, high, low, close):
+        return {"EMA": self.ema.push(close)}
+
+    def _seed(self, high, low, close):
+        self.ema.value = float(ema(close, self.params[0])[-1])
+
+
+class MACDIndicator(IncrementalIndicator):
+    """MACD：快慢 EMA 与 DIF 的信号线均递推更新"""
+
+    name = "MACD"
+
+    def __init__(self, params=DEFAULT_PARAMS["MACD"]):
+        super().__init__(params)
+        fast, slow, signal = self.params
+        self.fast = _EMA(2.0 / (fast + 1))
+        self.slow = _EMA(2.0 / (slow + 1))
+        self.signal = _EMA(2.0 / (signal + 1))
+
+    def _get_state(self):
+        return {
+            "fast": self.fast.value,
+            "slow": self.slow.value,
+            "signal": self.signal.value,
+        }
+
+    def _set_state(self, state):
+        self.fast.value = state["fast"]
+        self.slow.value = state["slow"]
+        self.signal.value = state["signal"]
+
+    def _apply(self, high, low, close):
+        dif = self.fast.push(close) - self.slow.push(close)
+        dea = self.signal.push(dif)
+        return {"MACD": 2.0 * (dif - dea), "DIF": dif, "DEA": dea}
+
+    def _seed(self, high, low, close):
+        fast, slow, signal = self.params
+        fast_ema, slow_ema = ema(close, fast), ema(close, slow)
+        self.fast.value = float(fast_ema[-1])
+        self.slow.value = float(slow_ema[-1])
+        self.signal.value = float(ema(fast_ema - slow_ema, signal)[-1])
+
+
+class RSIIndicator(IncrementalIndicator):
+    """RSI（Wilder 平滑）：前 period 个变动取均值作为初值，之后递推"""
+
+    name = "RSI"
+
+    def __init__(self, params=DEFAULT_PARAMS["RSI"]):
+        super().__init__(params)
+        self.prev_close = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def _get_state(self):
+        return {
+            "prev_close": self.prev_close,
+            "count": self.count,
+            "avg_gain": self.avg_gain,
+            "avg_loss": self.avg_loss,
+        }
+
+    def _set_state(self, state):
+        self.prev_close = state["prev_close"]
+        self.count = state["count"]
+        self.avg_gain = state["avg_gain"]
+        self.avg_loss = state["avg_loss"]
+
+    def _apply(self, high, low, close):
+        period = self.params[0]
+        if self.prev_close is None:
+            self.prev_close = close
+            return {"RSI": NAN}
+
+        diff = close - self.prev_close
+        self.prev_close = close
+        gain, loss = max(diff, 0.0), max(-diff, 0.0)
+        self.count += 1
+
+        if self.count < period:
+            # 初值阶段先累计，满 period 个后取均值
+            self.avg_gain += gain
+            self.avg_loss += loss
+            return {"RSI": NAN}
+        if self.count == period:
+            self.avg_gain = (self.avg_gain + gain) / period
+            self.avg_loss = (self.avg_loss + loss) / period
+        else:
+            alpha = 1.0 / period
+            self.avg_gain = alpha * gain + (1.0 - alpha) * self.avg_gain
+            self.avg_loss = alpha * loss + (1.0 - alpha) * self.avg_loss
+
+        if self.avg_gain == 0 and self.avg_loss == 0:
+            return {"RSI": 50.0}
+        if self.avg_loss == 0:
+            return {"RSI": 100.0}
+        return {"RSI": 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)}
+
+    def _seed(self, high, low, close):
+        diff = np.diff(close)
+        self.prev_close = float(close[-1])
+        self.count = len(diff)
+        self.avg_gain = _wilder_last(np.clip(diff, 0, None), self.params[0])
+        self.avg_loss = _wilder_last(np.clip(-diff, 0, None), self.params[0])
+
+
+class BollingerIndicator(IncrementalIndicator):
+    """布林带：滑动窗口维护和与平方和"""
+
+    name = "BOLL"
+
+    def __init__(self, params=DEFAULT_PARAMS["BOLL"]):
+        super().__init__(params)
+        self.window = _Window(int(self.params[0]))
+
+    def _get_state(self):
+        return self.window.get_state()
+
+    def _set_state(self, state):
+        self.window.set_state(state)
+
+    def _snapshot(self):
+        return self.window.snapshot()
+
+    def _restore(self, snapshot):
+        self.window.restore(snapshot)
+
+    def _apply(self, high, low, close):
+        self.window.push(close)
+        if not self.window.full:
+            return {"UPPER": NAN, "MID": NAN, "LOWER": NAN}
+        mid = self.window.mean()
+        band = self.params[1] * self.window.std()
+        return {"UPPER": mid + band, "MID": mid, "LOWER": mid - band}
+
+    def _seed(self, high, low, close):
+        self.window.fill(close)
+
+
+class ATRIndicator(IncrementalIndicator):
+    """ATR（Wilder 平滑）：前 period 个真实波幅取均值作为初值，之后递推"""
+
+    name = "ATR"
+
+    def __init__(self, params=DEFAULT_PARAMS["ATR"]):
+        super().__init__(params)
+        self.prev_close = None
+        self.count = 0
+        self.value = 0.0
+
+    def _get_state(self):
+        return {"prev_close": self.prev_close, "count": self.count, "value": self.value}
+
+    def _set_state(self, state):
+        self.prev_close = state["prev_close"]
+        self.count = state["count"]
+        self.value = state["value"]
+
+    def _apply(self, high, low, close):
+        period = self.params[0]
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(
+                high - low, abs(high - self.prev_close), abs(low - self.prev_close)
+            )
+        self.prev_close = close
+        self.count += 1
+
+        if self.count < period:
+            self.value += tr
+            return {"ATR": NAN}
+        if self.count == period:
+            self.value = (self.value + tr) / period
+        else:
+            self.value = tr / period + (1.0 - 1.0 / period) * self.value
+        return {"ATR": self.value}
+
+    def _seed(self, high, low, close):
+        prev_close = np.concatenate(([close[0]], close[:-1]))
+        tr = np.maximum(
+            high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close))
+        )
+        tr[0] = high[0] - low[0]
+        self.prev_close = float(close[-1])
+        self.count = len(tr)
+        self.value = _wilder_last(tr, self.params[0])
+
+
+INDICATOR_CLASSES = {
+    "MA": SMAIndicator,
+    "SMA": SMAIndicator,
+    "EMA": EMAIndicator,
+    "MACD": MACDIndicator,
+    "RSI": RSIIndicator,
+    "BOLL": BollingerIndicator,
+    "ATR": ATRIndicator,
+}
+
+
+def create_indicator(name, params):
+    """按指标名创建增量指标对象"""
+    cls = INDICATOR_CLASSES.get(name)
+    if cls is None:
+        raise ValueError(f"不支持的技术指标: {name}")
+    indicator = cls(params)
+    indicator.name = name
+    return indicator
+
+
+class IndicatorStateRegistry:
+    """按 (货币对, 周期, 指标, 参数) 保存增量指标状态及最近的输出序列
+
+    新K线到达时只对新增部分做常数时间的更新；首次请求或请求窗口超出已保存的
+    输出序列时用批量计算重建：输出序列取批量结果的尾部，状态由整段K线向量化得到。
+
+    配置 path 后可保存到磁盘，重启后继续使用：后台线程每 save_interval 秒、
+    或累计 save_every 次更新后保存一次，退出时再保存一次，进程被强制结束时
+    最多丢失一个保存周期内的更新。
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        max_history: int = 5000,
+        save_interval: float = 60.0,
+        save_every: int = 500,
+    ):
+        self.path = path
+        self.max_history = max_history
+        self.save_interval = save_interval
+        self.save_every = save_every
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        self.rebuilds = 0
+        self.incremental_updates = 0
+        self.saves = 0
+
+        # 上次保存之后的更新次数；后台保存线程
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+        self._save_wakeup = threading.Event()
+        self._saver_stop = threading.Event()
+        self._saver_thread = None
+
+        if path:
+            self.load()
+            # 没有更新时不保存，避免只加载过状态的进程（如 debug 重载器的父进程）
+            # 退出时用旧状态覆盖其他进程保存的文件
+            atexit.register(lambda: self._unsaved and self.save())
+            if save_interval > 0:
+                self._saver_thread = threading.Thread(
+                    target=self._saver_loop, name="indicator-state-saver", daemon=True
+                )
+                self._saver_thread.start()
+
+    def _saver_loop(self):
+        """定期或累计足够多的更新后保存状态"""
+        while not self._saver_stop.is_set():
+            self._save_wakeup.wait(self.save_interval)
+            self._save_wakeup.clear()
+            if self._unsaved and not self._saver_stop.is_set():
+                self.save()
+
+    def stop_saver(self):
+        """停止后台保存线程"""
+        self._saver_stop.set()
+        self._save_wakeup.set()
+        if self._saver_thread:
+            self._saver_thread.join(timeout=5)
+            self._saver_thread = None
+
+    def _mark_updated(self):
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every
+        if due and self._saver_thread is not None:
+            self._save_wakeup.set()
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _new_entry(self, name, params):
+        return {
+            "indicator": create_indicator(name, params),
+            "t": deque(maxlen=self.max_history),
+            "columns": {},
+        }
+
+    def _feed(self, entry, t, high, low, close):
+        """向指标输入一根K线并记录输出（同一时间戳覆盖最后一条）"""
+        revise = entry["indicator"].last_t == int(t)
+        values = entry["indicator"].update(t, high, low, close)
+        if revise and entry["t"]:
+            entry["t"].pop()
+            for col in entry["columns"].values():
+                col.pop()
+        entry["t"].append(int(t))
+        for col, value in values.items():
+            if col not in entry["columns"]:
+                entry["columns"][col] = deque(maxlen=self.max_history)
+            entry["columns"][col].append(value)
+
+    def _rebuild(self, name, params, bars):
+        """由批量计算重建状态，不逐根递推"""
+        entry = self._new_entry(name, params)
+        n = len(bars.t)
+        if not n:
+            return entry
+        keep = min(n, self.max_history)
+        entry["t"].extend(bars.t[n - keep :].tolist())
+        for col, values in compute_indicator(name, params, bars).items():
+            entry["columns"][col] = deque(
+                values[n - keep :].tolist(), maxlen=self.max_history
+            )
+        # 最后一根K线可能仍在形成中，单独输入以保留回退点
+        indicator = entry["indicator"]
+        indicator.seed(Bars(*(col[:-1] for col in bars)))
+        indicator.update(bars.t[-1], bars.high[-1], bars.low[-1], bars.close[-1])
+        return entry
+
+    def series(self, pair: str, interval: str, name: str, params, bars, count: int):
+        """
+        获取指标在 bars 最近 count 根K线上的输出
+        Args:
+            pair: 同花顺代码
+            interval: 周期标识
+            name: 指标名
+            params: 参数元组
+            bars: 按时间升序排列、收盘价无缺失的 Bars
+            count: 输出数量
+        Returns:
+            (时间戳数组, {列名: 数组})
+        """
+        key = (pair, interval, name, tuple(params))
+        n = len(bars.t)
+        count = min(count, n)
+        if count > self.max_history:
+            # 超出保存的序列长度，直接批量计算
+            columns = compute_indicator(name, params, bars)
+            return bars.t[n - count :], {c: v[n - count :] for c, v in columns.items()}
+
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            start = 0
+            if entry is not None and entry["indicator"].last_t is not None:
+                # 从状态中最后一根K线开始（含，可能已被更新）
+                start = int(np.searchsorted(bars.t, entry["indicator"].last_t))
+                covered = len(entry["t"]) - 1 + (n - start)
+                if (
+                    start >= n
+                    or covered < count
+                    or (start < n and int(bars.t[start]) != entry["indicator"].last_t)
+                ):
+                    entry = None
+
+            if entry is None:
+                self.rebuilds += 1
+                entry = self._rebuild(name, params, bars)
+            else:
+                self.incremental_updates += 1
+                for i in range(start, n):
+                    self._feed(
+                        entry, bars.t[i], bars.high[i], bars.low[i], bars.close[i]
+                    )
+            with self._lock:
+                self._entries[key] = entry
+
+            take = min(count, len(entry["t"]))
+            t = np.array(list(entry["t"])[-take:], dtype=np.int64) if take else []
+            columns = {
+                col: np.array(list(values)[-take:], dtype=np.float64)
+                for col, values in entry["columns"].items()
+            }
+        self._mark_updated()
+        return np.asarray(t, dtype=np.int64), columns
+
+    def get_stats(self):
+        """获取状态统计信息"""
+        return {
+            "keys": len(self._entries),
+            "rebuilds": self.rebuilds,
+            "incremental_updates": self.incremental_updates,
+            "saves": self.saves,
+            "unsaved_updates": self._unsaved,
+            "path": self.path,
+        }
+
+    def to_dict(self):
+        """序列化全部状态（逐个持有键锁，可与请求并发执行）"""
+        with self._lock:
+            keys = list(self._entries)
+        items = []
+        for key in keys:
+            with self._key_lock(key):
+                entry = self._entries[key]
+                items.append(
+                    {
+                        "key": [key[0], key[1], key[2], list(key[3])],
+                        "indicator": entry["indicator"].to_dict(),
+                        "t": list(entry["t"]),
+                        "columns": {c: list(v) for c, v in entry["columns"].items()},
+                    }
+                )
+        return {"entries": items}
+
+    def from_dict(self, data):
+        """从 to_dict 的结果恢复全部状态"""
+        for item in data.get("entries", []):
+            pair, interval, name, params = item["key"]
+            entry = {
+                "indicator": IncrementalIndicator.from_dict(item["indicator"]),
+                "t": deque(item["t"], maxlen=self.max_history),
+                "columns": {
+                    c: deque(v, maxlen=self.max_history)
+                    for c, v in item["columns"].items()
+                },
+            }
+            self._entries[(pair, interval, name, tuple(params))] = entry
+
+    def save(self):
+        """保存到磁盘（NaN 以 null 写入）"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                unsaved, self._unsaved = self._unsaved, 0
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(_nan_to_none(self.to_dict()), f)
+                os.replace(tmp_path, self.path)
+                self.saves += 1
+            except OSError as e:
+                with self._lock:
+                    self._unsaved += unsaved
+                print(f"保存指标状态失败: {e}")
+
+    def load(self):
+        """从磁盘加载，文件不存在或损坏时忽略"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.from_dict(_none_to_nan(json.load(f)))
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"加载指标状态失败: {e}")
+
+
+def _nan_to_none(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+
+def _none_to_nan(value, in_columns=False):
+    if isinstance(value, dict):
+        return {
+            k: _none_to_nan(v, in_columns or k == "columns") for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_none_to_nan(v, in_columns) for v in value]
+    if value is None and in_columns:
+        return NAN
+    return value
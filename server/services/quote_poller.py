@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# 实时行情快照：seq 为单调递增的序号，timestamp 为获取时间（epoch 秒），
+# quotes 为只读的 {thscode: 行情} 映射。快照发布后不再修改，读取无需加锁
+QuoteSnapshot = namedtuple("QuoteSnapshot", ["seq", "timestamp", "quotes"])
+
+
+class QuotePoller:
+    """实时行情后台轮询
+
+    按固定间隔向同花顺请求一组货币对的实时行情，每次成功后发布新的不可变快照；
+    请求失败时保留上一份快照，由调用方根据其时间判断数据新旧。
+    """
+
+    def __init__(
+        self, fetch, format_quotes, pairs, interval: float = 3.0, listeners=()
+    ):
+        """
+        Args:
+            fetch: fetch(codes_str) -> 同花顺实时行情响应
+            format_quotes: format_quotes(raw) -> 格式化后的行情列表（含 code 字段）
+            pairs: 轮询的同花顺代码列表
+            interval: 轮询间隔（秒）
+            listeners: 每次发布快照后依次调用的 listener(snapshot)
+        """
+        self.fetch = fetch
+        self.format_quotes = format_quotes
+        self.pairs = list(pairs)
+        self.interval = interval
+        self.listeners = list(listeners)
+        self._snapshot = None
+        self._seq = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+        # 轮询统计
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def snapshot(self):
+        """最新快照，尚未成功轮询时为 None"""
+        return self._snapshot
+
+    def poll_once(self):
+        """请求一次行情并发布快照"""
+        raw = self.fetch(",".join(self.pairs))
+        quotes = {quote["code"]: quote for quote in self.format_quotes(raw)}
+        self._seq += 1
+        snapshot = QuoteSnapshot(self._seq, time.time(), MappingProxyType(quotes))
+        self._snapshot = snapshot
+
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"实时行情快照处理失败: {e}")
+        return snapshot
+
+    def start(self):
+        """启动后台轮询线程，重复调用无副作用"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="forex-quote-poller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        """按固定节奏轮询，单次耗时计入间隔内"""
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            self.polls += 1
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"实时行情轮询失败: {e}")
+
+            next_run += self.interval
+            now = time.monotonic()
+            if next_run < now:
+                # 单次请求超过轮询间隔时不补发，从当前时间重新计时
+                next_run = now
+            self._stop.wait(next_run - now)
+
+    def get_stats(self):
+        """获取轮询统计信息"""
+        snapshot = self._snapshot
+        return {
+            "pairs": self.pairs,
+            "interval": self.interval,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "seq": snapshot.seq if snapshot else 0,
+            "staleness": (
+                round(time.time() - snapshot.timestamp, 3) if snapshot else None
+            ),
+        }
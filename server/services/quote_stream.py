@@ -0,0 +1,208 @@
+import json
+import queue
+import threading
+from collections import deque
+
+
+def format_sse(event: str, data, event_id=None):
+    """编码一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def quote_delta(previous, current):
+    """
+    计算两份行情之间发生变化的字段
+    Args:
+        previous: 上一份行情字典，None 表示首次出现
+        current: 当前行情字典
+    Returns:
+        {字段: 新值}，不含 code 字段
+    """
+    return {
+        field: value
+        for field, value in current.items()
+        if field != "code" and (previous is None or previous.get(field) != value)
+    }
+
+
+class Subscription:
+    """单个推送连接的订阅：货币对、K线周期与待发送事件队列"""
+
+    def __init__(self, pairs, bar_periods=(), max_queue: int = 256):
+        self.pairs = frozenset(pairs)
+        self.bar_periods = frozenset(bar_periods)
+        self.queue = queue.Queue(max_queue)
+        self.dropped = 0
+
+    def put(self, event):
+        """加入事件；客户端消费过慢导致队列已满时丢弃最早的事件"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float = None):
+        """取出下一个事件 (事件类型, 数据, 序号)，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class QuoteStream:
+    """实时行情与K线推送的订阅管理
+
+    行情按快照序号以增量形式推送：每份快照只发送相对上一份快照发生变化的货币对和字段。
+    最近 journal_size 份快照的增量保存在日志中，断线重连的客户端可从其最后收到的
+    序号继续；序号已不在日志范围内（或首次连接）时发送完整快照。
+    """
+
+    def __init__(self, max_queue: int = 256, journal_size: int = 600):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._snapshot = None
+        # (序号, 时间戳, {thscode: 变化字段})，序号连续
+        self._journal = deque(maxlen=journal_size)
+
+        # 推送统计
+        self.published = 0
+        self.resumes = 0
+        self.full_snapshots = 0
+
+    def subscribe(self, pairs, bar_periods=()):
+        """新增订阅"""
+        subscription = Subscription(pairs, bar_periods, self.max_queue)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """取消订阅"""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish_snapshot(self, snapshot):
+        """记录新快照相对上一份快照的增量，并推送给订阅了相应货币对的连接"""
+        with self._lock:
+            previous = self._snapshot.quotes if self._snapshot else {}
+            deltas = {}
+            for code, quote in snapshot.quotes.items():
+                delta = quote_delta(previous.get(code), quote)
+                if delta:
+                    deltas[code] = delta
+            if self._snapshot is not None and snapshot.seq != self._snapshot.seq + 1:
+                # 轮询重启等导致序号不连续，旧日志不能再用于续传
+                self._journal.clear()
+            self._snapshot = snapshot
+            self._journal.append((snapshot.seq, snapshot.timestamp, deltas))
+            targets = list(self._subscriptions)
+
+        for subscription in targets:
+            changed = {c: d for c, d in deltas.items() if c in subscription.pairs}
+            if changed:
+                subscription.put(
+                    (
+                        "delta",
+                        {"seq": snapshot.seq, "t": snapshot.timestamp, "q": changed},
+                        snapshot.seq,
+                    )
+                )
+                self.published += 1
+
+    def publish(self, event: str, pair: str, data, period: str = None):
+        """
+        向订阅了 pair 的连接发送事件（不参与序号续传）
+        Args:
+            event: 事件类型，如 bar
+            pair: 同花顺代码
+            data: 事件数据
+            period: K线事件的周期，只发送给订阅了该周期的连接
+        """
+        with self._lock:
+            targets = [
+                s
+                for s in self._subscriptions
+                if pair in s.pairs and (period is None or period in s.bar_periods)
+            ]
+        for subscription in targets:
+            subscription.put((event, data, None))
+        self.published += len(targets)
+
+    def catch_up(self, pairs, since=None):
+        """
+        新连接（或重连）时需要先发送的行情事件
+        Args:
+            pairs: 订阅的同花顺代码集合
+            since: 客户端最后收到的序号，None 表示首次连接
+        Returns:
+            (events, seq)：events 为 [(事件类型, 数据, 序号)]，可续传时为 since 之后的增量，
+            否则为一份完整快照；seq 为客户端收到这些事件后所处的序号
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return [], 0
+
+            first_seq = self._journal[0][0] if self._journal else snapshot.seq + 1
+            if since is not None and first_seq - 1 <= since <= snapshot.seq:
+                self.resumes += 1
+                events = []
+                for seq, timestamp, deltas in self._journal:
+                    changed = {c: d for c, d in deltas.items() if c in pairs}
+                    if seq > since and changed:
+                        events.append(
+                            ("delta", {"seq": seq, "t": timestamp, "q": changed}, seq)
+                        )
+                return events, snapshot.seq
+
+            self.full_snapshots += 1
+            quotes = {
+                code: quote_delta(None, quote)
+                for code, quote in snapshot.quotes.items()
+                if code in pairs
+            }
+            event = (
+                "snapshot",
+                {"seq": snapshot.seq, "t": snapshot.timestamp, "q": quotes},
+                snapshot.seq,
+            )
+            return [event], snapshot.seq
+
+    def bar_subscriptions(self):
+        """当前被订阅的 (货币对, K线周期) 集合"""
+        with self._lock:
+            return {
+                (pair, period)
+                for s in self._subscriptions
+                for pair in s.pairs
+                for period in s.bar_periods
+            }
+
+    def get_stats(self):
+        """获取订阅统计信息"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            journal = (
+                [self._journal[0][0], self._journal[-1][0]] if self._journal else None
+            )
+        return {
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "queued": sum(s.queue.qsize() for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+            "journal": journal,
+            "resumes": self.resumes,
+            "full_snapshots": self.full_snapshots,
+        }
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+
+# 上游请求通道，按优先级从高到低排列
+UPSTREAM_LANES = ("realtime", "chart", "indicators", "backfill")
+
+# 各通道排队等待令牌的最长时间（秒），None 表示一直等待
+DEFAULT_MAX_WAIT = {
+    "realtime": 5.0,
+    "chart": 10.0,
+    "indicators": 10.0,
+    "backfill": None,
+}
+
+
+class RateLimitTimeout(RuntimeError):
+    """等待上游请求令牌超时"""
+
+
+class PriorityRateLimiter:
+    """带优先级通道的令牌桶限流器
+
+    令牌以 rate 个/秒的速度补充，最多积累 burst 个，每次上游请求消耗一个。
+    令牌不足时请求按通道排队：高优先级通道有请求排队时低优先级通道让行，
+    同一通道内先到先得。低优先级通道可设置保留令牌数（reserve），令牌少于
+    保留数时只放行更高优先级的请求，批量任务不会耗尽交互请求所需的令牌。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        lanes=UPSTREAM_LANES,
+        reserve=None,
+        max_wait=None,
+    ):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 令牌桶容量
+            lanes: 通道名称，按优先级从高到低
+            reserve: {通道: 保留令牌数}，默认 backfill 保留一半容量
+            max_wait: {通道: 最长等待秒数}，默认见 DEFAULT_MAX_WAIT
+        """
+        self.rate = rate
+        self.burst = burst
+        self.lanes = tuple(lanes)
+        self.reserve = {"backfill": burst // 2} if reserve is None else dict(reserve)
+        self.max_wait = dict(DEFAULT_MAX_WAIT if max_wait is None else max_wait)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._queues = {lane: deque() for lane in self.lanes}
+        self._stats = {
+            lane: {
+                "acquired": 0,
+                "waited": 0,
+                "wait_total": 0.0,
+                "wait_max": 0.0,
+                "timeouts": 0,
+                "max_queued": 0,
+            }
+            for lane in self.lanes
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _can_take(self, lane, ticket):
+        """是否轮到 ticket：更高优先级通道无排队、本通道排在最前且令牌充足"""
+        for other in self.lanes:
+            if other == lane:
+                break
+            if self._queues[other]:
+                return False
+        queue = self._queues[lane]
+        if queue and queue[0] is not ticket:
+            return False
+        return self._tokens >= 1 + self.reserve.get(lane, 0)
+
+    def acquire(self, lane: str, timeout: float = None):
+        """
+        获取一个令牌，令牌不足时排队等待
+        Args:
+            lane: 通道名称
+            timeout: 最长等待秒数，默认使用该通道的 max_wait
+        Returns:
+            等待的秒数
+        """
+        if timeout is None:
+            timeout = self.max_wait.get(lane)
+        stats = self._stats[lane]
+        start = time.monotonic()
+
+        with self._cond:
+            self._refill()
+            if self._can_take(lane, None):
+                self._tokens -= 1
+                stats["acquired"] += 1
+                return 0.0
+
+            ticket = object()
+            queue = self._queues[lane]
+            queue.append(ticket)
+            stats["max_queued"] = max(stats["max_queued"], len(queue))
+            try:
+                while True:
+                    self._refill()
+                    if self._can_take(lane, ticket):
+                        break
+                    # 等到下一个令牌补充，期间有请求拿到令牌或放弃时会被提前唤醒
+                    wait = (
+                        max(1 + self.reserve.get(lane, 0) - self._tokens, 1) / self.rate
+                    )
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - start)
+                        if remaining <= 0:
+                            stats["timeouts"] += 1
+                            raise RateLimitTimeout(
+                                f"上游请求排队超时（{lane} 通道等待 {timeout} 秒）"
+                            )
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+
+            self._tokens -= 1
+            waited = time.monotonic() - start
+            stats["acquired"] += 1
+            stats["waited"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+            return waited
+
+    def get_stats(self):
+        """获取限流统计信息：各通道排队数与等待时间"""
+        with self._cond:
+            self._refill()
+            lanes = {}
+            for lane in self.lanes:
+                stats = dict(self._stats[lane])
+                stats["queued"] = len(self._queues[lane])
+                stats["avg_wait"] = (
+                    round(stats["wait_total"] / stats["waited"], 4)
+                    if stats["waited"]
+                    else 0.0
+                )
+                stats["wait_total"] = round(stats["wait_total"], 4)
+                stats["wait_max"] = round(stats["wait_max"], 4)
+                lanes[lane] = stats
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 3),
+                "lanes": lanes,
+            }
@@ -0,0 +1,119 @@
+import threading
+import time
+
+
+class _Batch:
+    """一次合并后的上游请求"""
+
+    def __init__(self):
+        self.codes = set()
+        self.done = threading.Event()
+        self.tables = {}
+        # 上游响应中 tables 以外的字段（errorcode/errmsg 等）
+        self.envelope = {}
+        self.error = None
+
+
+class RealtimeCoalescer:
+    """实时行情请求合并
+
+    在 window 秒内到达的请求合并为一次上游调用，代码取并集；
+    上游请求进行中到达、且所需代码已包含在该请求内的调用直接等待其结果。
+    第一个到达的调用者负责发起请求，结果按代码拆分后分发给所有等待者。
+    """
+
+    def __init__(self, fetch, window: float = 0.05, wait_timeout: float = 15):
+        """
+        Args:
+            fetch: fetch(codes_str) -> 同花顺实时行情响应
+            window: 合并窗口（秒）
+            wait_timeout: 等待者最长等待时间（秒）
+        """
+        self.fetch = fetch
+        self.window = window
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._open_batch = None
+        self._inflight = []
+
+        # 合并效果统计
+        self.requests = 0
+        self.upstream_calls = 0
+
+    def get(self, codes):
+        """
+        获取若干代码的实时行情
+        Args:
+            codes: 同花顺代码列表
+        Returns:
+            {thscode: table} 字典（table 为接口响应 tables 中的单项）
+        """
+        batch = self._join(codes)
+        return {code: batch.tables[code] for code in codes if code in batch.tables}
+
+    def get_response(self, codes):
+        """
+        获取若干代码的实时行情，保持上游响应的结构
+        Args:
+            codes: 同花顺代码列表
+        Returns:
+            上游响应的各字段（errorcode/errmsg 等），tables 只包含 codes 且按 codes 排列
+        """
+        batch = self._join(codes)
+        tables = [batch.tables[code] for code in codes if code in batch.tables]
+        return {**batch.envelope, "tables": tables}
+
+    def _join(self, codes):
+        """加入或发起一次合并请求，返回已完成的 _Batch"""
+        wanted = set(codes)
+        leader = False
+        with self._lock:
+            self.requests += 1
+            batch = next((b for b in self._inflight if wanted <= b.codes), None)
+            if batch is None:
+                batch = self._open_batch
+                if batch is None:
+                    batch = self._open_batch = _Batch()
+                    leader = True
+                batch.codes |= wanted
+
+        if leader:
+            self._dispatch(batch)
+        elif not batch.done.wait(self.wait_timeout):
+            raise TimeoutError("等待合并的实时行情请求超时")
+
+        if batch.error is not None:
+            raise batch.error
+        return batch
+
+    def _dispatch(self, batch):
+        """等待合并窗口结束后发起上游请求，并唤醒所有等待者"""
+        if self.window > 0:
+            time.sleep(self.window)
+
+        with self._lock:
+            if self._open_batch is batch:
+                self._open_batch = None
+            self._inflight.append(batch)
+            self.upstream_calls += 1
+            codes = ",".join(sorted(batch.codes))
+
+        try:
+            raw = self.fetch(codes) or {}
+            batch.envelope = {k: v for k, v in raw.items() if k != "tables"}
+            for table in raw.get("tables") or []:
+                batch.tables[table.get("thscode", "")] = table
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self._inflight.remove(batch)
+            batch.done.set()
+
+    def get_stats(self):
+        """获取合并统计信息"""
+        return {
+            "window": self.window,
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+        }
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class StaleWhileRevalidate:
+    """保存每个请求最近一次成功的结果，上游异常时返回该结果并标记为过期
+
+    - 上游调用失败时返回最近一次成功的结果，而不是报错
+    - 上游处于降级状态（prefer_stale）时直接返回旧结果，刷新在后台线程中完成，
+      请求不再等待上游超时
+    - 上游正常时，同一请求已有刷新在进行则等待该次刷新的结果，不重复请求上游
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (结果, 获取时间)
+        self._refreshing = {}  # key -> 进行中刷新的 Future
+        self._lock = threading.Lock()
+
+        # 统计
+        self.fresh = 0
+        self.stale_served = 0
+        self.joined = 0
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, key, compute, prefer_stale: bool = False):
+        """
+        获取结果
+        Args:
+            key: 请求标识（可哈希）
+            compute: compute() -> 结果，请求上游
+            prefer_stale: 上游降级时为 True，有旧结果则直接返回并在后台刷新
+        Returns:
+            (结果, 过期秒数)，过期秒数为 None 表示本次从上游获取的新结果
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            flight = self._refreshing.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._refreshing[key] = Future()
+
+        if entry is not None and prefer_stale:
+            if leader:
+                self._start_refresh(key, compute, flight)
+            return self._serve_stale(entry)
+
+        if not leader:
+            # 同一请求已有刷新在进行，等待其结果
+            try:
+                value = flight.result()
+            except Exception:
+                if entry is None:
+                    raise
+                return self._serve_stale(entry)
+            self.joined += 1
+            return value, None
+
+        try:
+            value = compute()
+        except Exception as e:
+            self._finish(key, flight, error=e)
+            if entry is None:
+                raise
+            print(f"上游请求失败，返回缓存结果: {key}")
+            return self._serve_stale(entry)
+        else:
+            self._store(key, value)
+            self._finish(key, flight, value)
+        finally:
+            if not flight.done():
+                # compute 被中断（非 Exception），等待者改为返回旧结果或报错
+                self._finish(key, flight, error=RuntimeError(f"刷新被中断: {key}"))
+
+        self.fresh += 1
+        return value, None
+
+    def _serve_stale(self, entry):
+        self.stale_served += 1
+        value, fetched_at = entry
+        return value, round(time.time() - fetched_at, 3)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _finish(self, key, flight, value=None, error=None):
+        """结束刷新并通知等待者"""
+        with self._lock:
+            self._refreshing.pop(key, None)
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(value)
+
+    def _start_refresh(self, key, compute, flight):
+        """在后台线程中刷新（调用方已将 key 标记为刷新中）"""
+
+        def refresh():
+            try:
+                value = compute()
+                self._store(key, value)
+                self.background_refreshes += 1
+                self._finish(key, flight, value)
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"后台刷新失败 {key}: {e}")
+                self._finish(key, flight, error=e)
+            finally:
+                if not flight.done():
+                    self._finish(key, flight, error=RuntimeError(f"刷新被中断: {key}"))
+
+        threading.Thread(
+            target=refresh, name="forex-stale-refresh", daemon=True
+        ).start()
+
+    def get_stats(self):
+        """获取统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "refreshing": len(self._refreshing),
+                "fresh": self.fresh,
+                "joined": self.joined,
+                "stale_served": self.stale_served,
+                "background_refreshes": self.background_refreshes,
+                "refresh_errors": self.refresh_errors,
+            }
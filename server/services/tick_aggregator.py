@@ -0,0 +1,167 @@
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from utils.bar_utils import Bars, empty_bars, merge_bars, to_epoch
+
+# K线缓存中1分钟K线的周期标识
+TICK_BAR_INTERVAL = "1"
+
+
+class TickBarAggregator:
+    """由轮询到的实时行情聚合1分钟K线
+
+    每个货币对维护一根正在形成的1分钟K线（开=本分钟首个报价，高/低=报价极值，
+    收=最新报价）。报价进入下一分钟时，上一根K线收盘并写入K线缓存。
+
+    已收盘的K线只在与缓存中的最后一根相连（按交易日历，中间没有缺失的分钟）时写入，
+    写入成功后该货币对标记为“本地维护”：图表读取其1分钟K线时不再向上游请求增量，
+    正在形成的K线直接取本地状态。行情中断超过 stale_after 秒或出现缺口时取消标记，
+    由上游增量补齐后再恢复。
+
+    报价没有成交量：与缓存中已有的上游K线时间戳相同时沿用其成交量，
+    否则成交量为 NaN（重采样时按 0 计入）。
+    """
+
+    def __init__(self, bar_cache, calendar, stale_after: float = 90.0):
+        """
+        Args:
+            bar_cache: BarCache
+            calendar: FXCalendar，判断交易时段与K线是否相连
+            stale_after: 超过该秒数没有新报价时不再视为本地维护
+        """
+        self.bar_cache = bar_cache
+        self.calendar = calendar
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        # {pair: [开始时间, 开, 高, 低, 收, 是否从本分钟开始时就有报价]}
+        self._current = {}
+        self._last_tick = {}
+        self._synced = set()
+
+        # 聚合统计
+        self.ticks = 0
+        self.bars_committed = 0
+        self.bars_skipped = 0
+
+    def on_snapshot(self, snapshot):
+        """处理一份行情快照（QuotePoller 的 listener）"""
+        # 快照时间为 epoch 秒，K线时间戳以本地时间按 UTC 换算
+        ts = to_epoch(datetime.fromtimestamp(snapshot.timestamp))
+        for code, quote in snapshot.quotes.items():
+            price = quote.get("latest")
+            if price:
+                self.add_tick(code, float(price), ts)
+
+    def add_tick(self, pair: str, price: float, ts: int):
+        """
+        加入一个报价
+        Args:
+            pair: 同花顺代码
+            price: 最新价
+            ts: 报价时间戳（本地时间按 UTC 换算）
+        """
+        if not self.calendar.is_trading(ts):
+            return
+        start = ts - ts % 60
+        closed = None
+        with self._lock:
+            self.ticks += 1
+            self._last_tick[pair] = time.monotonic()
+            bar = self._current.get(pair)
+            if bar is not None and bar[0] == start:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                return
+            if bar is not None and bar[0] > start:
+                # 晚到的旧报价
+                return
+            # 首次收到报价时本分钟已开始，这根K线不完整，收盘后不写入缓存
+            complete = bar is not None
+            self._current[pair] = [start, price, price, price, price, complete]
+            closed = bar
+
+        if closed is not None:
+            self._commit(pair, closed)
+
+    def _commit(self, pair: str, bar):
+        """将收盘的K线写入缓存（与缓存中的最后一根相连时）"""
+        start, complete = bar[0], bar[5]
+        _, last_ts = self.bar_cache.coverage(pair, TICK_BAR_INTERVAL)
+        connected = (
+            last_ts is not None
+            and int(self.calendar.trading_seconds(start))
+            - int(self.calendar.trading_seconds(last_ts))
+            <= 60
+        )
+        if not complete or not connected:
+            with self._lock:
+                self.bars_skipped += 1
+                self._synced.discard(pair)
+            return
+
+        closed = _with_volume(
+            _one_bar(*bar[:5]), self.bar_cache.peek(pair, TICK_BAR_INTERVAL)
+        )
+        self.bar_cache.put(pair, TICK_BAR_INTERVAL, closed)
+        with self._lock:
+            self.bars_committed += 1
+            self._synced.add(pair)
+
+    def live_pairs(self):
+        """K线由本地行情维护、读取时无需向上游请求增量的货币对"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                pair
+                for pair in self._synced
+                if now - self._last_tick.get(pair, 0) <= self.stale_after
+            }
+
+    def current_bar(self, pair: str):
+        """正在形成的K线，没有时为空K线"""
+        with self._lock:
+            bar = self._current.get(pair)
+            if bar is None:
+                return empty_bars()
+            return _one_bar(*bar[:5])
+
+    def with_current_bar(self, pair: str, bars, start_ts: int, end_ts: int):
+        """将正在形成的K线并入 [start_ts, end_ts] 内的K线"""
+        current = self.current_bar(pair)
+        if len(current.t) and start_ts <= current.t[0] <= end_ts:
+            return merge_bars(bars, _with_volume(current, bars))
+        return bars
+
+    def get_stats(self):
+        """获取聚合统计信息"""
+        live = len(self.live_pairs())
+        with self._lock:
+            return {
+                "pairs": len(self._current),
+                "live_pairs": live,
+                "ticks": self.ticks,
+                "bars_committed": self.bars_committed,
+                "bars_skipped": self.bars_skipped,
+            }
+
+
+def _one_bar(start, open_, high, low, close):
+    """单根K线（成交量未知）"""
+    return Bars(
+        np.array([start], dtype=np.int64),
+        np.array([open_]),
+        np.array([high]),
+        np.array([low]),
+        np.array([close]),
+        np.array([np.nan]),
+    )
+
+
+def _with_volume(bar, bars):
+    """沿用 bars 中同一时间戳K线的成交量，避免被本地K线的 NaN 覆盖"""
+    i = np.searchsorted(bars.t, bar.t[0])
+    if i < len(bars.t) and bars.t[i] == bar.t[0]:
+        return bar._replace(volume=np.array([bars.volume[i]], dtype=float))
+    return bar
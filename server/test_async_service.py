@@ -0,0 +1,60 @@
+"""
+异步并发请求测试
+运行：python -m pytest test_async_service.py
+"""
+
+import time
+import pytest
+from services.forex_service import IFindForexService
+from services.forex_service_async import AsyncIFindForexService
+from tools.ifind_stub import start_in_thread
+
+LATENCY = 0.3
+
+
+@pytest.fixture
+def services():
+    stub = start_in_thread(latency=LATENCY)
+    service = IFindForexService(
+        "stub-token", enable_bar_cache=False, realtime_coalesce_window=0, rate_limit=0
+    )
+    service.base_url = stub.url
+    async_service = AsyncIFindForexService(service)
+    yield stub, service, async_service
+    async_service.close()
+    stub.shutdown()
+
+
+def test_indicator_fan_out_runs_concurrently(services):
+    stub, service, async_service = services
+    service.get_access_token()
+    indicators = ["MA", "EMA", "RSI", "MACD"]
+
+    started = time.monotonic()
+    results = async_service.run(
+        async_service.gather(
+            *(
+                async_service.get_forex_indicators("EURUSD.FX", name, 14, 50)
+                for name in indicators
+            )
+        )
+    )
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 4
+    assert all(r["tables"][0]["thscode"] == "EURUSD.FX" for r in results)
+    # 总耗时取决于最慢的一个请求，而不是各请求耗时之和
+    assert elapsed < LATENCY * 2.5
+    assert stub.stats["requests"]["/api/v1/high_frequency"] == 4
+
+
+def test_fan_out_propagates_failure(services):
+    stub, service, async_service = services
+    stub.update_config({"error_rate": 1.0})
+    with pytest.raises(RuntimeError):
+        async_service.run(
+            async_service.gather(
+                async_service.get_forex_realtime_data("USDCNY.FX"),
+                async_service.get_forex_minute_data("USDCNY.FX", "1", 10),
+            )
+        )
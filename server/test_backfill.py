@@ -0,0 +1,145 @@
+"""
+历史K线回填测试
+运行：python -m pytest test_backfill.py
+"""
+
+import numpy as np
+import pytest
+from services.backfill import DAY, BackfillJob, backfill_ranges
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+from utils.bar_utils import Bars
+
+PAIRS = ["USDCNY.FX", "EURUSD.FX"]
+SPANS = {"1": 2 * DAY, "1d": 3650 * DAY}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = start_in_thread()
+    yield server
+    server.shutdown()
+
+
+def _service(stub, store_dir):
+    service = IFindForexService(
+        "stub-token", bar_store_dir=str(store_dir), realtime_coalesce_window=0
+    )
+    service.base_url = stub.url
+    return service
+
+
+def _job(service, ranges, **kwargs):
+    return BackfillJob(service, PAIRS, ranges, chunk_spans=SPANS, **kwargs)
+
+
+def test_cold_backfill_fills_range_in_chunks(stub, tmp_path):
+    service = _service(stub, tmp_path)
+    ranges = backfill_ranges(minute_days=7, daily_years=1)
+    stats = _job(service, ranges).run()
+
+    start, end = ranges["1"]
+    minute_chunks = end // SPANS["1"] - start // SPANS["1"] + 1
+    # 同一块的两个货币对合并为一次请求
+    assert stats["requests"] == minute_chunks + 1
+    assert stats["chunks_committed"] == stats["chunks_total"] == 2 * (minute_chunks + 1)
+    assert service.rate_limiter.get_stats()["lanes"]["backfill"]["acquired"] >= 1
+
+    for pair in PAIRS:
+        covered_from, _ = service.bar_cache.coverage(pair, "1")
+        assert covered_from == start
+        bars = service.bar_cache.peek(pair, "1")
+        assert np.all(np.diff(bars.t) > 0)
+        direct = service.fetch_bar_range([pair], "1", start, end)[pair]
+        assert np.array_equal(bars.t[: len(direct.t)], direct.t)
+        assert len(service.bar_cache.peek(pair, "1d").t) > 200
+
+
+def test_resume_only_fetches_missing_chunks(stub, tmp_path):
+    ranges = backfill_ranges(minute_days=7, daily_years=0)
+    start, end = ranges["1"]
+    _job(_service(stub, tmp_path), {"1": (start + 3 * DAY, end)}).run()
+
+    # 新进程从磁盘加载已回填的部分，只请求更早的块和最新的增量
+    service = _service(stub, tmp_path)
+    _, last_ts = service.bar_cache.coverage(PAIRS[0], "1")
+    stats = _job(service, ranges).run()
+    older = (start + 3 * DAY - 1) // SPANS["1"] - start // SPANS["1"] + 1
+    newer = end // SPANS["1"] - last_ts // SPANS["1"] + 1
+    assert stats["requests"] == older + newer
+    for pair in PAIRS:
+        assert service.bar_cache.coverage(pair, "1")[0] == start
+
+
+def test_failed_chunk_keeps_coverage_contiguous(stub, tmp_path):
+    service = _service(stub, tmp_path)
+    ranges = backfill_ranges(minute_days=7, daily_years=0)
+    start, end = ranges["1"]
+    failing = (start + 3 * DAY) // SPANS["1"] * SPANS["1"]
+    fetch = service.fetch_bar_range
+
+    def flaky_fetch(pairs, interval, start_ts, end_ts):
+        if start_ts == failing:
+            raise RuntimeError("分钟数据接口错误")
+        return fetch(pairs, interval, start_ts, end_ts)
+
+    service.fetch_bar_range = flaky_fetch
+    stats = _job(service, ranges, retries=0).run()
+    assert stats["chunks_failed"] == 2
+    for pair in PAIRS:
+        # 失败块之前（更早）的块已获取但不写入，缓存不会出现空洞
+        assert service.bar_cache.coverage(pair, "1")[0] == failing + SPANS["1"]
+
+    service.fetch_bar_range = fetch
+    stats = _job(service, ranges).run()
+    assert stats["chunks_failed"] == 0
+    for pair in PAIRS:
+        assert service.bar_cache.coverage(pair, "1")[0] == start
+
+
+def test_chunk_shared_by_tail_and_head_is_requested_once(stub, tmp_path):
+    service = _service(stub, tmp_path)
+    ranges = backfill_ranges(minute_days=7, daily_years=0)
+    start, end = ranges["1"]
+    # 已缓存的K线只落在最新一块内：该块既是增量块，也是向前回填的第一块
+    first = end // SPANS["1"] * SPANS["1"]
+    t = first + 60 * np.arange(1, 31, dtype=np.int64)
+    ones = np.ones(len(t))
+    service.bar_cache.put(PAIRS[0], "1", Bars(t, ones, ones, ones, ones, ones))
+
+    job = _job(service, ranges)
+    chunks = job.plan()
+    assert all(len(set(pairs)) == len(pairs) for _, _, pairs in chunks)
+    assert ("1", end // SPANS["1"], PAIRS) in chunks
+
+    stats = job.run()
+    assert stats["requests"] == len(chunks)
+    assert stats["chunks_fetched"] == stats["chunks_total"]
+    assert stats["chunks_committed"] == stats["chunks_total"]
+    assert service.bar_cache.coverage(PAIRS[0], "1")[0] == start
+
+
+def test_chunks_behind_failed_chunk_are_not_requested(stub, tmp_path):
+    service = _service(stub, tmp_path)
+    ranges = backfill_ranges(minute_days=7, daily_years=0)
+    start, end = ranges["1"]
+    failing = (start + 3 * DAY) // SPANS["1"]
+    fetch = service.fetch_bar_range
+    requested = []
+
+    def flaky_fetch(pairs, interval, start_ts, end_ts):
+        requested.append(start_ts // SPANS["1"])
+        if start_ts // SPANS["1"] == failing:
+            raise RuntimeError("分钟数据接口错误")
+        return fetch(pairs, interval, start_ts, end_ts)
+
+    service.fetch_bar_range = flaky_fetch
+    job = _job(service, ranges, retries=0, workers=1)
+    stats = job.run()
+    # 从新到旧依次请求，失败块之后更早的块都已无法与缓存相连
+    older = failing - start // SPANS["1"]
+    assert requested == list(range(end // SPANS["1"], failing - 1, -1))
+    assert stats["chunks_failed"] == 2
+    assert stats["chunks_skipped"] == 2 * older
+    # 已获取但无法写入的块不会一直留在内存中
+    assert not any(state["done"] for state in job._keys.values())
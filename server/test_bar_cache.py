@@ -0,0 +1,139 @@
+"""
+K线缓存批量获取测试
+运行：python -m pytest test_bar_cache.py
+"""
+
+import numpy as np
+from services.bar_cache import BarCache
+from utils.bar_utils import Bars
+
+
+def make_bars(start_ts, end_ts, offset=0.0):
+    t = np.arange(start_ts, end_ts + 1, 60, dtype=np.int64)
+    close = 1.0 + offset + (t - start_ts) / 1e6
+    return Bars(t, close, close, close, close, np.zeros(len(t)))
+
+
+class FakeUpstream:
+    """记录每次请求的代码与时间段，按代码返回不同价格的K线"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, pairs, start_ts, end_ts):
+        self.calls.append((tuple(pairs), start_ts, end_ts))
+        return {
+            pair: make_bars(start_ts, end_ts, offset=i) for i, pair in enumerate(pairs)
+        }
+
+
+def test_batch_fetches_missing_pairs_in_one_request():
+    cache, upstream = BarCache(), FakeUpstream()
+    windows = cache.get_windows(["B", "A"], "1", 0, 600, upstream)
+
+    assert upstream.calls == [(("A", "B"), 0, 600)]
+    assert set(windows) == {"A", "B"}
+    assert len(windows["A"].t) == 11
+    # 各货币对的数据来自同一次响应中各自的 table
+    assert windows["A"].close[0] != windows["B"].close[0]
+
+
+def test_batch_groups_full_and_tail_fetches():
+    cache, upstream = BarCache(), FakeUpstream()
+    cache.get_windows(["A", "B"], "1", 0, 600, upstream)
+    upstream.calls.clear()
+
+    windows = cache.get_windows(["A", "B", "C"], "1", 0, 900, upstream)
+
+    # 新货币对请求完整窗口，已缓存的货币对合并为一次增量请求
+    assert upstream.calls == [(("C",), 0, 900), (("A", "B"), 600, 900)]
+    assert all(len(bars.t) == 16 for bars in windows.values())
+
+
+def test_batch_head_fetch_without_new_pairs():
+    cache, upstream = BarCache(), FakeUpstream()
+    cache.get_windows(["A", "B"], "1", 600, 1200, upstream)
+    upstream.calls.clear()
+
+    windows = cache.get_windows(["A", "B"], "1", 0, 1200, upstream)
+
+    assert upstream.calls == [(("A", "B"), 0, 600), (("A", "B"), 1200, 1200)]
+    assert len(windows["A"].t) == 21
+    assert np.all(np.diff(windows["B"].t) == 60)
+
+
+def test_pair_missing_from_response_is_empty():
+    cache = BarCache()
+    windows = cache.get_windows(
+        ["A", "B"], "1", 0, 600, lambda pairs, s, e: {"A": make_bars(s, e)}
+    )
+    assert len(windows["A"].t) == 11
+    assert len(windows["B"].t) == 0
+
+
+def test_single_window_uses_per_pair_fetch():
+    cache = BarCache()
+    calls = []
+
+    def fetch(start_ts, end_ts):
+        calls.append((start_ts, end_ts))
+        return make_bars(start_ts, end_ts)
+
+    cache.get_window("A", "1", 0, 600, fetch)
+    bars = cache.get_window("A", "1", 0, 660, fetch)
+    assert calls == [(0, 600), (600, 660)]
+    assert len(bars.t) == 12
+
+
+def test_tail_refresh_replaces_forming_bar():
+    cache = BarCache()
+    cache.get_window("A", "1", 0, 600, lambda s, e: make_bars(s, e))
+    # 最后一根K线在上次请求时仍在形成中，增量请求返回的新值覆盖旧值
+    bars = cache.get_window("A", "1", 0, 660, lambda s, e: make_bars(s, e, offset=1))
+    assert bars.close[-3] == 1.0 + 540 / 1e6
+    assert bars.close[-2] == 2.0
+    assert cache.get_stats()["full_fetches"] == 1
+    assert cache.get_stats()["tail_fetches"] == 1
+
+
+def test_head_fetch_extends_coverage():
+    cache = BarCache()
+    calls = []
+
+    def fetch(start_ts, end_ts):
+        calls.append((start_ts, end_ts))
+        return make_bars(start_ts, end_ts)
+
+    cache.get_window("A", "1", 1200, 1800, fetch)
+    bars = cache.get_window("A", "1", 600, 1800, fetch)
+    # 只补齐 covered_from 之前的部分，再请求增量
+    assert calls == [(1200, 1800), (600, 1200), (1800, 1800)]
+    assert cache.coverage("A", "1") == (600, 1800)
+    assert len(bars.t) == 21
+
+    # 已覆盖的窗口只请求增量
+    calls.clear()
+    cache.get_window("A", "1", 900, 1800, fetch)
+    assert calls == [(1800, 1800)]
+
+
+def test_max_bars_trims_oldest_and_coverage():
+    cache = BarCache(max_bars=10)
+    cache.put("A", "1", make_bars(0, 1200))
+    bars = cache.peek("A", "1")
+    assert len(bars.t) == 10
+    assert cache.coverage("A", "1") == (660, 1200)
+
+
+def test_window_larger_than_max_bars_is_served_whole_and_not_refetched():
+    cache = BarCache(max_bars=10)
+    upstream = FakeUpstream()
+    bars = cache.get_windows(["A"], "1", 0, 1200, upstream)["A"]
+    assert len(bars.t) == 21
+    # 覆盖起点不越过刚返回的窗口，再次请求只拉取增量
+    assert cache.coverage("A", "1") == (0, 1200)
+    cache.get_windows(["A"], "1", 0, 1260, upstream)
+    assert upstream.calls[1:] == [(("A",), 1200, 1260)]
+    # 之后的普通写入仍按 max_bars 裁剪
+    cache.put("A", "1", make_bars(1320, 1320))
+    assert len(cache.peek("A", "1").t) == 10
@@ -0,0 +1,191 @@
+"""
+K线磁盘存储测试
+运行：python -m pytest test_bar_store.py
+"""
+
+import os
+import threading
+import numpy as np
+import pytest
+from services.bar_cache import BarCache
+from services.bar_store import BarStore
+from utils.bar_utils import Bars
+
+
+def make_bars(start_ts, count, price=1.0):
+    t = start_ts + 60 * np.arange(count, dtype=np.int64)
+    close = np.full(count, price)
+    return Bars(
+        t, close, close + 0.1, close - 0.1, close, np.arange(count, dtype=float)
+    )
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    store = BarStore(str(tmp_path))
+    bars = make_bars(0, 100)
+    store.save("EURUSD.FX", "1", bars, covered_from=-600)
+
+    loaded, covered_from = store.load("EURUSD.FX", "1")
+    assert covered_from == -600
+    for col, expected in zip(loaded, bars):
+        assert np.array_equal(col, expected)
+    assert isinstance(loaded.close, np.memmap)
+    assert loaded.t.dtype == np.int64
+    assert store.keys() == [("EURUSD.FX", "1")]
+    assert store.load("USDJPY.FX", "1") == (None, None)
+
+
+def test_reader_always_sees_complete_version(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.save("EURUSD.FX", "1", make_bars(0, 50, 1.0))
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        for i in range(60):
+            store.save("EURUSD.FX", "1", make_bars(0, 50 + i, 1.0 + i))
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            bars, _ = store.load("EURUSD.FX", "1")
+            if bars is None:
+                continue
+            # 各列长度一致且来自同一版本（价格在版本内相同）
+            if len({len(col) for col in bars}) != 1 or len(set(bars.close)) != 1:
+                errors.append(len(bars.t))
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for r in readers:
+        r.start()
+    write()
+    for r in readers:
+        r.join()
+    assert not errors
+
+    bars, _ = store.load("EURUSD.FX", "1")
+    assert len(bars.t) == 109 and bars.close[0] == 60.0
+    # 旧版本目录只保留 keep_versions 个
+    key_dir = tmp_path / "EURUSD.FX" / "1"
+    assert len([p for p in os.listdir(key_dir) if (key_dir / p).is_dir()]) <= 2
+
+
+@pytest.mark.parametrize(
+    "pair,interval",
+    [
+        ("../etc", "1"),
+        ("EURUSD.FX/../../x", "1"),
+        ("eurusd.fx", "1"),
+        ("EURUSD.FX", ".."),
+    ],
+)
+def test_rejects_keys_unsafe_as_directories(tmp_path, pair, interval):
+    store = BarStore(str(tmp_path / "store"))
+    with pytest.raises(ValueError):
+        store.save(pair, interval, make_bars(0, 10))
+    with pytest.raises(ValueError):
+        store.load(pair, interval)
+
+    # 缓存只在内存中保存不合法的键，不访问磁盘
+    cache = BarCache(store=store)
+    cache.put(pair, interval, make_bars(0, 10))
+    assert len(cache.peek(pair, interval).t) == 10
+    assert os.listdir(tmp_path / "store") == []
+
+
+def test_cache_reloads_from_store(tmp_path):
+    cache = BarCache(store=BarStore(str(tmp_path)))
+    cache.put("USDCNY.FX", "5", make_bars(0, 30), covered_from=0)
+
+    restarted = BarCache(store=BarStore(str(tmp_path)))
+    assert restarted.coverage("USDCNY.FX", "5") == (0, 29 * 60)
+    assert restarted.get_stats()["store_loads"] == 1
+
+
+def _segment_sizes(root, pair, interval):
+    store = BarStore(str(root))
+    meta = store._read_meta(str(root / pair / interval))
+    version_dir = root / pair / interval / meta["version"]
+    return [
+        len(np.load(version_dir / segment / "t.npy")) for segment in meta["segments"]
+    ]
+
+
+def test_appends_write_only_new_bars(tmp_path):
+    cache = BarCache(store=BarStore(str(tmp_path), max_segments=4))
+    cache.put("EURUSD.FX", "1", make_bars(0, 1000), covered_from=0)
+    # 图表增量：最后一根（仍在形成中）被覆盖并追加一根
+    cache.put("EURUSD.FX", "1", make_bars(999 * 60, 2, price=2.0))
+    cache.put("EURUSD.FX", "1", make_bars(1001 * 60, 1, price=3.0))
+    # 回填：向前补齐
+    cache.put("EURUSD.FX", "1", make_bars(-100 * 60, 100, price=0.5), -6000)
+    assert _segment_sizes(tmp_path, "EURUSD.FX", "1") == [2, 1, 100]
+
+    expected = cache.peek("EURUSD.FX", "1")
+    loaded, covered_from = BarStore(str(tmp_path)).load("EURUSD.FX", "1")
+    assert covered_from == -6000
+    for col, exp in zip(loaded, expected):
+        assert np.array_equal(col, exp)
+    assert loaded.close[1099] == 2.0 and loaded.close[-1] == 3.0
+
+
+def test_segments_compact_into_new_version(tmp_path):
+    store = BarStore(str(tmp_path), max_segments=3)
+    cache = BarCache(store=store)
+    cache.put("USDJPY.FX", "1", make_bars(0, 10))
+    for i in range(10, 14):
+        cache.put("USDJPY.FX", "1", make_bars(i * 60, 1))
+    # 第 4 次追加时增量段已满，整组列写为新版本
+    assert _segment_sizes(tmp_path, "USDJPY.FX", "1") == []
+    cache.put("USDJPY.FX", "1", make_bars(14 * 60, 1))
+    assert _segment_sizes(tmp_path, "USDJPY.FX", "1") == [1]
+    loaded, _ = store.load("USDJPY.FX", "1")
+    assert np.array_equal(loaded.t, 60 * np.arange(15))
+
+
+def test_trimmed_bars_stay_trimmed_after_reload(tmp_path):
+    cache = BarCache(max_bars=20, store=BarStore(str(tmp_path)))
+    cache.put("USDCNY.FX", "1", make_bars(0, 20))
+    cache.put("USDCNY.FX", "1", make_bars(20 * 60, 5))
+    loaded, covered_from = BarStore(str(tmp_path)).load("USDCNY.FX", "1")
+    assert covered_from == 5 * 60
+    assert np.array_equal(loaded.t, cache.peek("USDCNY.FX", "1").t)
+
+
+def test_cached_pairs_scans_store_once(tmp_path, monkeypatch):
+    BarCache(store=BarStore(str(tmp_path))).put("EURUSD.FX", "1", make_bars(0, 10))
+    store = BarStore(str(tmp_path))
+    cache = BarCache(store=store)
+
+    # 启动后只维护内存中的键集合，不再扫描磁盘
+    monkeypatch.setattr(store, "keys", lambda: pytest.fail("store scanned"))
+    cache.put("USDJPY.FX", "1", make_bars(0, 10))
+    cache.put("USDCNY.FX", "5", make_bars(0, 10))
+    cache.put("GBPUSD.FX", "1", make_bars(0, 0))
+    assert cache.cached_pairs("1") == {"EURUSD.FX", "USDJPY.FX"}
+    assert cache.cached_pairs("5") == {"USDCNY.FX"}
+
+
+def test_concurrent_appends_keep_every_segment(tmp_path):
+    # 每个线程使用独立的 BarStore，模拟多个工作进程只靠文件锁互斥
+    pytest.importorskip("fcntl")
+    store = BarStore(str(tmp_path), max_segments=1000)
+    store.save("EURUSD.FX", "1", make_bars(0, 1))
+    writers, appends = 8, 10
+
+    def append(worker):
+        writer = BarStore(str(tmp_path), max_segments=1000)
+        for i in range(appends):
+            ts = 60 * (1 + worker * appends + i)
+            writer.save("EURUSD.FX", "1", None, 0, delta=make_bars(ts, 1))
+
+    threads = [threading.Thread(target=append, args=(w,)) for w in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(_segment_sizes(tmp_path, "EURUSD.FX", "1")) == writers * appends
+    loaded, _ = store.load("EURUSD.FX", "1")
+    assert np.array_equal(loaded.t, 60 * np.arange(1 + writers * appends))
+    assert store.keys() == [("EURUSD.FX", "1")]
@@ -0,0 +1,126 @@
+"""
+上游请求录制与回放测试
+运行：python -m pytest test_cassette.py
+"""
+
+import time
+from datetime import datetime, timedelta
+import aiohttp
+import pytest
+import requests
+from services.cassette import CassetteMiss, load_cassette
+from services.forex_service import IFindForexService
+from services.forex_service_async import AsyncIFindForexService
+from tools.ifind_stub import start_in_thread
+from tools.replay_cassette import replay_schedule
+
+
+@pytest.fixture(scope="module")
+def cassette(tmp_path_factory):
+    """对接口替身录制一段 cassette"""
+    path = str(tmp_path_factory.mktemp("cassette") / "ifind.jsonl.gz")
+    stub = start_in_thread(latency=0.05)
+    service = IFindForexService(
+        "stub-token",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        record_cassette=path,
+    )
+    service.base_url = stub.url
+    service.get_forex_realtime_data("USDCNY.FX")
+    service.get_forex_kline_data("EURUSD.FX", "1d", 30)
+    service.cassette.close()
+    stub.shutdown()
+    return path
+
+
+def _player(path, speed=0):
+    return IFindForexService(
+        "replay",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        replay_cassette=path,
+        replay_speed=speed,
+        rate_limit=0,
+    )
+
+
+def test_recording_redacts_token(cassette):
+    entries = load_cassette(cassette)
+    assert [e["lane"] for e in entries[1:]] == ["realtime", "chart"]
+    assert entries[0]["status"] == 200
+    assert "stub-token" not in entries[0]["response"]
+    assert "recorded-token" in entries[0]["response"]
+    assert all(e["elapsed"] >= 0.05 for e in entries[1:])
+
+
+def test_replay_matches_recording_without_network(cassette):
+    entries = load_cassette(cassette)
+    service = _player(cassette)
+    raw = service.get_forex_realtime_data("USDCNY.FX")
+    assert raw["tables"][0]["thscode"] == "USDCNY.FX"
+
+    # 时间窗口不同的同类请求同样命中录制记录
+    kline = service.get_forex_kline_data("EURUSD.FX", "1d", 60)
+    assert kline["tables"][0]["thscode"] == "EURUSD.FX"
+    assert service.cassette.get_stats()["served"] == len(entries)
+
+    with pytest.raises(CassetteMiss):
+        service.get_forex_kline_data("GBPUSD.FX", "1d", 30)
+
+
+def test_replay_keeps_recorded_timing(cassette):
+    service = _player(cassette, speed=1)
+    start = time.perf_counter()
+    service.get_forex_realtime_data("USDCNY.FX")
+    assert time.perf_counter() - start >= 0.05
+
+    fast = _player(cassette, speed=10)
+    start = time.perf_counter()
+    fast.get_forex_realtime_data("USDCNY.FX")
+    assert time.perf_counter() - start < 0.05
+
+
+def test_replay_schedule(cassette):
+    latencies, errors = replay_schedule(_player(cassette), load_cassette(cassette), 0)
+    assert len(latencies) == 2 and errors == 0
+
+
+def test_network_errors_recorded_on_both_paths(tmp_path):
+    path = str(tmp_path / "errors.jsonl.gz")
+    service = IFindForexService(
+        "stub-token",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        rate_limit=0,
+        breaker_failure_threshold=100,
+        record_cassette=path,
+    )
+    service.access_token = "token"
+    service.token_expires_at = datetime.now() + timedelta(hours=1)
+    # 没有服务监听的端口，请求发生连接错误
+    service.base_url = "http://127.0.0.1:9"
+    async_service = AsyncIFindForexService(service)
+    try:
+        with pytest.raises(requests.ConnectionError):
+            service.get_forex_realtime_data("USDCNY.FX")
+        with pytest.raises(aiohttp.ClientError):
+            async_service.run(async_service.get_forex_realtime_data("EURUSD.FX"))
+    finally:
+        async_service.close()
+    service.cassette.close()
+
+    records = load_cassette(path)
+    assert [r["status"] for r in records] == [None, None]
+    assert [r["body"]["codes"] for r in records] == ["USDCNY.FX", "EURUSD.FX"]
+
+    # 回放时两条路径都以连接错误返回
+    player = _player(path)
+    async_player = AsyncIFindForexService(player)
+    try:
+        with pytest.raises(requests.ConnectionError):
+            player.get_forex_realtime_data("EURUSD.FX")
+        with pytest.raises(requests.ConnectionError):
+            async_player.run(async_player.get_forex_realtime_data("USDCNY.FX"))
+    finally:
+        async_player.close()
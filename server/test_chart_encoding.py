@@ -0,0 +1,68 @@
+"""
+图表数据列式编码测试
+运行：python -m pytest test_chart_encoding.py
+"""
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from utils.bar_utils import Bars
+from utils.chart_encoding import (
+    bars_to_columns,
+    decode_columns,
+    encode_columns,
+    negotiate_format,
+    raw_to_columns,
+)
+
+
+def test_negotiate_format():
+    assert negotiate_format() == "json"
+    assert negotiate_format("columnar", MIMEAccept([("application/msgpack", 1)])) == (
+        "columnar"
+    )
+    assert negotiate_format(None, MIMEAccept([("application/x-msgpack", 1)])) == (
+        "msgpack"
+    )
+    assert negotiate_format(None, MIMEAccept([("*/*", 1)])) == "json"
+    with pytest.raises(ValueError):
+        negotiate_format("xml")
+
+
+def test_columns_round_trip():
+    t = np.array([1_700_000_040, 1_700_000_100], dtype=np.int64)
+    columns = {"MA": np.array([np.nan, 7.1])}
+
+    assert encode_columns(t, columns) == {
+        "t": [1_700_000_040, 1_700_000_100],
+        "MA": [None, 7.1],
+    }
+    decoded_t, decoded = decode_columns(encode_columns(t, columns, binary=True))
+    np.testing.assert_array_equal(decoded_t, t)
+    np.testing.assert_array_equal(decoded["MA"], columns["MA"])
+
+
+def test_bars_and_raw_to_columns():
+    t = np.array([60, 120, 180], dtype=np.int64)
+    close = np.array([7.1, np.nan, 7.3])
+    bars = Bars(t, close, close + 0.1, close - 0.1, close, np.array([1, np.nan, 3.0]))
+
+    line_t, line = bars_to_columns(bars, "line")
+    assert line_t.tolist() == [60, 180] and list(line) == ["c"]
+    kline_t, kline = bars_to_columns(bars, "kline")
+    assert sorted(kline) == ["c", "h", "l", "o", "v"]
+    assert kline["v"].tolist() == [1.0, 3.0]
+
+    raw = {"tables": [{"time": ["1970-01-01 00:01"], "table": {"MA": [None]}}]}
+    raw_t, raw_columns = raw_to_columns(raw)
+    assert raw_t.tolist() == [60] and np.isnan(raw_columns["MA"][0])
+
+
+def test_msgpack_payload():
+    msgpack = pytest.importorskip("msgpack")
+    from utils.chart_encoding import pack
+
+    t = np.arange(3, dtype=np.int64)
+    payload = {"success": True, "data": encode_columns(t, {"c": t * 1.5}, binary=True)}
+    decoded_t, decoded = decode_columns(msgpack.unpackb(pack(payload))["data"])
+    assert decoded_t.tolist() == [0, 1, 2] and decoded["c"].tolist() == [0, 1.5, 3]
@@ -0,0 +1,58 @@
+"""
+图表数据格式化测试
+校验向量化实现与逐元素实现（benchmark_forex.py 中的原实现）结果一致
+运行：python -m pytest test_chart_format.py
+"""
+
+import numpy as np
+from benchmark_forex import _loop_format_chart_data, make_bars
+from services.forex_service import IFindForexService
+from utils.bar_utils import bars_to_raw, format_bars
+
+service = IFindForexService("test", enable_bar_cache=False)
+
+RAW = {
+    "tables": [
+        {
+            "thscode": "USDCNY.FX",
+            "time": ["2024-01-02 09:32", "2024-01-02 09:30", "2024-01-02 09:31"],
+            "table": {
+                "open": [7.1, None, 7.3],
+                "high": [7.2, 7.3, 7.4],
+                "low": [7.0, 7.1],
+                "latest": [7.15, 7.25, None],
+                "volume": [1, None, 3],
+            },
+        },
+        {
+            "thscode": "EURUSD.FX",
+            "time": ["2024-01-02 09:30", "2024-01-02 09:29"],
+            "table": {
+                "open": [1.08, 1.07],
+                "high": [1.09, 1.08],
+                "low": [1.07, 1.06],
+                "close": [1.085, 1.075],
+            },
+        },
+    ]
+}
+
+
+def test_format_chart_data_matches_loop():
+    for chart_type in ("line", "kline"):
+        assert service.format_chart_data(RAW, chart_type) == (
+            _loop_format_chart_data(RAW, chart_type)
+        )
+    assert service.format_chart_data({"tables": []}) == []
+
+
+def test_format_bars_matches_raw_round_trip():
+    bars = make_bars(3000)
+    bars.close[::13] = np.nan
+    bars.volume[::7] = np.nan
+    for chart_type in ("line", "kline"):
+        for unit in ("m", "D"):
+            raw = bars_to_raw("USDCNY.FX", bars, unit)
+            assert format_bars(bars, chart_type, unit) == (
+                _loop_format_chart_data(raw, chart_type)
+            )
@@ -0,0 +1,235 @@
+"""
+熔断器与过期数据回退测试
+运行：python -m pytest test_circuit_breaker.py
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.forex_service import (
+    HIGH_FREQUENCY_PATH,
+    REALTIME_PATH,
+    IFindForexService,
+)
+from services.forex_service_async import AsyncIFindForexService
+from services.stale_cache import StaleWhileRevalidate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker("hf", failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()  # 成功后重新计数
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.get_stats()["rejected"] == 1
+
+
+def test_half_open_allows_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("hf", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # 试探失败重新打开
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.get_stats()["opens"] == 2
+
+
+def test_stale_value_served_on_failure():
+    cache = StaleWhileRevalidate()
+    assert cache.get("k", lambda: 1) == (1, None)
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    value, age = cache.get("k", fail)
+    assert value == 1 and age is not None
+
+    with pytest.raises(RuntimeError):
+        cache.get("other", fail)
+
+
+def test_prefer_stale_refreshes_in_background():
+    cache = StaleWhileRevalidate()
+    cache.get("k", lambda: 1)
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 2
+
+    start = time.perf_counter()
+    assert cache.get("k", slow, prefer_stale=True)[0] == 1
+    # 上游仍处于降级状态时，刷新进行中的其他请求也直接返回旧值
+    assert cache.get("k", slow, prefer_stale=True)[0] == 1
+    assert time.perf_counter() - start < 1
+
+    release.set()
+    for _ in range(100):
+        if cache.get_stats()["background_refreshes"]:
+            break
+        time.sleep(0.01)
+    assert cache.get("k", lambda: 3) == (3, None)
+    assert cache.get_stats()["background_refreshes"] == 1
+
+
+def test_concurrent_request_waits_for_refresh_when_healthy():
+    cache = StaleWhileRevalidate()
+    cache.get("k", lambda: 1)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get("k", slow)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(cache.get("k", slow)))
+    follower.start()
+    time.sleep(0.05)
+    # 上游正常时不返回旧值，而是等待进行中的刷新
+    assert results == []
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == [(2, None), (2, None)]
+    assert len(calls) == 1 and cache.get_stats()["joined"] == 1
+
+    # 进行中的刷新失败时，等待者返回旧值
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    started.clear()
+    release.clear()
+    leader = threading.Thread(target=lambda: cache.get("k", fail))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(cache.get("k", fail)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert results[-1][0] == 2 and results[-1][1] is not None
+
+
+def test_degraded_is_per_endpoint():
+    service = IFindForexService(
+        "stub-token",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        rate_limit=0,
+        breaker_failure_threshold=1,
+    )
+    service.with_fallback(("chart",), lambda: 1, HIGH_FREQUENCY_PATH)
+    service.with_fallback(("realtime",), lambda: 1, REALTIME_PATH)
+    breaker = service._breaker(HIGH_FREQUENCY_PATH)
+    breaker.before_call()
+    breaker.record_failure()
+
+    # 只有依赖熔断接口的请求返回旧值，其他接口照常请求上游
+    assert service.upstream_degraded(HIGH_FREQUENCY_PATH)
+    assert not service.upstream_degraded(REALTIME_PATH)
+    assert service.with_fallback(("chart",), lambda: 2, HIGH_FREQUENCY_PATH)[0] == 1
+    assert service.with_fallback(("realtime",), lambda: 2, REALTIME_PATH) == (2, None)
+    assert service.chart_path("1d") != service.chart_path("5min") == HIGH_FREQUENCY_PATH
+
+
+def _half_open_async_service():
+    service = IFindForexService(
+        "stub-token",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        rate_limit=0,
+        breaker_failure_threshold=1,
+        breaker_reset_timeout=0,
+    )
+    service.access_token = "token"
+    service.token_expires_at = datetime.now() + timedelta(hours=1)
+    breaker = service._breaker(REALTIME_PATH)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return AsyncIFindForexService(service), breaker
+
+
+def test_async_probe_released_on_unexpected_error():
+    async_service, breaker = _half_open_async_service()
+
+    async def broken_send(*args):
+        raise ValueError("bad payload")
+
+    async_service._send = broken_send
+    try:
+        with pytest.raises(ValueError):
+            async_service.run(async_service.get_forex_realtime_data("USDCNY.FX"))
+        assert breaker.get_stats()["failures"] == 2
+        # 试探名额已释放，下一次调用可以再次试探
+        breaker.before_call()
+    finally:
+        async_service.close()
+
+
+def test_async_probe_released_on_cancellation():
+    async_service, breaker = _half_open_async_service()
+    started = threading.Event()
+
+    async def hanging_send(*args):
+        started.set()
+        await asyncio.sleep(30)
+
+    async_service._send = hanging_send
+    try:
+        future = asyncio.run_coroutine_threadsafe(
+            async_service.get_forex_realtime_data("USDCNY.FX"),
+            async_service._ensure_loop(),
+        )
+        assert started.wait(5)
+        future.cancel()
+        deadline = time.monotonic() + 5
+        while breaker._probing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        breaker.before_call()
+        assert breaker.get_stats()["failures"] == 1
+    finally:
+        async_service.close()
@@ -0,0 +1,58 @@
+"""
+连接池复用测试
+运行：python -m pytest test_connection_pool.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+
+
+def _host_stats(service):
+    hosts = service.get_pool_stats()["hosts"]
+    assert len(hosts) == 1
+    return next(iter(hosts.values()))
+
+
+def test_sequential_requests_reuse_one_connection():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService(
+            "stub-token", enable_bar_cache=False, realtime_coalesce_window=0
+        )
+        service.base_url = stub.url
+        for _ in range(10):
+            service.get_forex_realtime_data("USDCNY.FX")
+
+        host = _host_stats(service)
+        assert host["connections_opened"] == 1
+        # 令牌 + 10 次行情
+        assert host["requests_sent"] == 11
+        assert host["idle_connections"] == 1
+    finally:
+        stub.shutdown()
+
+
+def test_concurrent_requests_bounded_by_pool_maxsize():
+    stub = start_in_thread(latency=0.05)
+    try:
+        service = IFindForexService(
+            "stub-token",
+            enable_bar_cache=False,
+            realtime_coalesce_window=0,
+            rate_limit=0,
+            pool_maxsize=4,
+        )
+        service.base_url = stub.url
+        service.get_access_token()
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            list(pool.map(service.get_forex_realtime_data, ["EURUSD.FX"] * 24))
+
+        host = _host_stats(service)
+        assert host["connections_opened"] <= 4
+        assert host["idle_connections"] == host["connections_opened"]
+        stats = service.get_pool_stats()
+        assert stats["saturated_requests"] > 0
+        assert stats["in_flight"] == 0
+    finally:
+        stub.shutdown()
@@ -0,0 +1,172 @@
+"""
+交叉汇率换算测试
+运行：python -m pytest test_cross_rates.py
+"""
+
+import numpy as np
+import pytest
+from services.forex_service import IFindForexService
+from services.quote_poller import QuoteSnapshot
+from tools.ifind_stub import start_in_thread
+from utils.bar_utils import Bars
+from utils.cross_rates import find_legs, synthesize_bars, synthesize_quote
+
+
+def _bars(t, open_, high, low, close):
+    return Bars(
+        np.array(t, dtype=np.int64),
+        *(np.array(col, dtype=float) for col in (open_, high, low, close)),
+        np.ones(len(t)),
+    )
+
+
+def test_find_legs():
+    available = {"EURUSD.FX", "USDJPY.FX", "USDCNY.FX", "EURCNY.FX"}
+    assert find_legs("EURJPY.FX", available) == [
+        ("EURUSD.FX", False),
+        ("USDJPY.FX", False),
+    ]
+    assert find_legs("CNYUSD.FX", available) == [("USDCNY.FX", True)]
+    # 优先经美元换算
+    assert find_legs("JPYCNY.FX", available) == [
+        ("USDJPY.FX", True),
+        ("USDCNY.FX", False),
+    ]
+    assert find_legs("GBPJPY.FX", available) is None
+    assert find_legs("EURUSD", {"USDEUR.FX"}) == [("USDEUR.FX", True)]
+    # 含美元的直盘不经中间货币换算
+    assert find_legs("EURUSD.FX", available - {"EURUSD.FX"}) is None
+    assert find_legs("CNYUSD.FX", {"EURCNY.FX", "EURUSD.FX"}) is None
+
+
+def test_synthesize_bars_aligns_and_bounds():
+    eurusd = _bars(
+        [60, 120, 180],
+        [1.1, 1.2, 1.3],
+        [1.2, 1.3, 1.4],
+        [1.0, 1.1, 1.2],
+        [1.2, 1.3, 1.3],
+    )
+    usdjpy = _bars(
+        [120, 180, 240],
+        [150, 151, 152],
+        [152, 153, 154],
+        [149, 150, 151],
+        [151, 152, 153],
+    )
+    cross = synthesize_bars(
+        [("EURUSD.FX", False), ("USDJPY.FX", False)],
+        {"EURUSD.FX": eurusd, "USDJPY.FX": usdjpy},
+    )
+    assert cross.t.tolist() == [120, 180]
+    assert np.allclose(cross.close, [1.3 * 151, 1.3 * 152])
+    assert np.allclose(cross.high, [1.3 * 152, 1.4 * 153])
+    assert np.allclose(cross.low, [1.1 * 149, 1.2 * 150])
+    assert np.isnan(cross.volume).all()
+
+    # 取倒数时最高价与最低价互换
+    inverse = synthesize_bars([("USDJPY.FX", True)], {"USDJPY.FX": usdjpy})
+    assert np.allclose(inverse.high, 1 / usdjpy.low)
+    assert np.allclose(inverse.low, 1 / usdjpy.high)
+    assert np.all(inverse.high >= np.fmax(inverse.open, inverse.close))
+
+
+def test_synthesize_quote():
+    quotes = {
+        "EURUSD.FX": {
+            "latest": 1.1,
+            "changeRatio": 1.0,
+            "open": 1.09,
+            "high": 1.11,
+            "low": 1.08,
+        },
+        "USDJPY.FX": {
+            "latest": 150.0,
+            "changeRatio": -2.0,
+            "open": 151.0,
+            "high": 152.0,
+            "low": 149.0,
+        },
+    }
+    quote = synthesize_quote(
+        "EURJPY.FX", [("EURUSD.FX", False), ("USDJPY.FX", False)], quotes
+    )
+    assert quote["latest"] == pytest.approx(165.0)
+    assert quote["changeRatio"] == pytest.approx((1.01 * 0.98 - 1) * 100)
+    assert quote["high"] == pytest.approx(1.11 * 152.0)
+
+    quote = synthesize_quote("JPYUSD.FX", [("USDJPY.FX", True)], quotes)
+    assert quote["latest"] == pytest.approx(1 / 150)
+    assert quote["high"] == pytest.approx(1 / 149)
+    assert quote["changeRatio"] == pytest.approx((1 / 0.98 - 1) * 100)
+    assert synthesize_quote("EURGBP.FX", [("EURGBP.FX", False)], quotes) is None
+
+
+def test_snapshot_quotes_synthesize_crosses():
+    service = IFindForexService("stub-token", realtime_coalesce_window=0)
+    quotes = {
+        "EURUSD.FX": {
+            "code": "EURUSD.FX",
+            "latest": 1.1,
+            "changeRatio": 0,
+            "open": 1.1,
+            "high": 1.1,
+            "low": 1.1,
+        },
+        "USDJPY.FX": {
+            "code": "USDJPY.FX",
+            "latest": 150.0,
+            "changeRatio": 0,
+            "open": 150.0,
+            "high": 150.0,
+            "low": 150.0,
+        },
+    }
+    snapshot = QuoteSnapshot(1, 0.0, quotes)
+    result = service.snapshot_quotes(snapshot, ["EURUSD.FX", "EURJPY.FX"])
+    assert [q["code"] for q in result] == ["EURUSD.FX", "EURJPY.FX"]
+    assert result[1]["latest"] == pytest.approx(165.0)
+    assert service.snapshot_quotes(snapshot, ["GBPUSD.FX"]) is None
+
+
+def test_cross_chart_uses_cached_legs():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService(
+            "stub-token", realtime_coalesce_window=0, rate_limit=0
+        )
+        service.base_url = stub.url
+        legs = service.get_period_bars_batch(["EURUSD.FX", "USDJPY.FX"], "5min", 200)
+
+        before = sum(stub.stats["requests"].values())
+        cross = service.get_period_bars("EURJPY.FX", "5min", 200)
+        # 只请求各腿的增量，不单独请求交叉汇率的历史数据
+        assert sum(stub.stats["requests"].values()) - before <= 1
+        assert len(cross.t) == 200
+        expected = synthesize_bars([("EURUSD.FX", False), ("USDJPY.FX", False)], legs)
+        # 已收盘的K线与换算结果一致（最后一根可能仍在形成中）
+        t, i, j = np.intersect1d(cross.t[:-1], expected.t[:-1], return_indices=True)
+        assert len(t) >= 190
+        assert np.allclose(cross.close[i], expected.close[j])
+
+        # 没有已缓存的腿时请求上游
+        assert service._cross_legs(["GBPCHF.FX"], "5min") == {}
+        assert len(service.get_period_bars("GBPCHF.FX", "5min", 50).t) == 50
+
+        # 直盘即使可由已缓存的货币对换算也请求上游，之后直接使用缓存
+        service = IFindForexService(
+            "stub-token", realtime_coalesce_window=0, rate_limit=0
+        )
+        service.base_url = stub.url
+        service.get_period_bars_batch(["EURCNY.FX", "USDCNY.FX"], "5min", 50)
+        assert service._cross_legs(["EURUSD.FX", "CNYEUR.FX"], "5min") == {
+            "CNYEUR.FX": [("EURCNY.FX", True)]
+        }
+        before = sum(stub.stats["requests"].values())
+        assert len(service.get_period_bars("EURUSD.FX", "5min", 50).t) == 50
+        assert sum(stub.stats["requests"].values()) - before == 1
+        assert "EURUSD.FX" in service.bar_cache.cached_pairs(
+            service.resample_base_interval
+        )
+    finally:
+        stub.shutdown()
@@ -0,0 +1,84 @@
+"""
+图表降采样测试
+运行：python -m pytest test_downsample.py
+"""
+
+import numpy as np
+import pytest
+from flask import Flask
+from controllers import forex_controller
+from routes.forex_routes import forex_bp
+from utils.bar_utils import Bars
+from utils.downsample import downsample_bars, lttb_indices
+
+
+def make_bars(count, seed=3):
+    rng = np.random.default_rng(seed)
+    t = 1_700_000_040 + np.arange(count, dtype=np.int64) * 60
+    close = 7.1 + np.cumsum(rng.normal(0, 0.001, count))
+    spread = np.abs(rng.normal(0, 0.0005, count))
+    return Bars(t, close, close + spread, close - spread, close, np.ones(count))
+
+
+def _naive_lttb(x, y, threshold):
+    """按算法定义逐点实现的 LTTB，作为对照"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        if i == threshold - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = np.mean(x[nlo:nhi]), np.mean(y[nlo:nhi])
+        areas = [
+            abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            for j in range(lo, hi)
+        ]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+def test_lttb_matches_reference():
+    bars = make_bars(5000)
+    picked = lttb_indices(bars.t, bars.close, 200)
+    assert len(picked) == 200
+    assert list(picked) == _naive_lttb(bars.t.astype(float), bars.close, 200)
+
+
+def test_line_downsample_skips_missing_values():
+    bars = make_bars(1000)
+    bars.close[::7] = np.nan
+    result = downsample_bars(bars, 100, "line")
+    assert len(result.t) == 100 and not np.isnan(result.close).any()
+    assert np.all(np.diff(result.t) > 0)
+
+
+def test_ohlc_downsample_preserves_range_and_volume():
+    bars = make_bars(1001)
+    result = downsample_bars(bars, 100, "kline")
+    assert len(result.t) <= 100
+    assert result.open[0] == bars.open[0] and result.close[-1] == bars.close[-1]
+    assert result.high.max() == bars.high.max()
+    assert result.low.min() == bars.low.min()
+    assert result.volume.sum() == bars.volume.sum()
+
+
+def test_no_downsample_below_limit():
+    bars = make_bars(50)
+    assert downsample_bars(bars, 100, "line") is bars
+    assert downsample_bars(bars, None, "kline") is bars
+
+
+@pytest.mark.parametrize("path", ["/api/forex/chart", "/api/forex/charts"])
+@pytest.mark.parametrize("max_points", [-5, 0, 1, 2])
+def test_chart_rejects_max_points_below_three(monkeypatch, path, max_points):
+    app = Flask(__name__)
+    app.register_blueprint(forex_bp, url_prefix="/api/forex")
+    monkeypatch.setattr(forex_controller, "get_forex_service", lambda: object())
+
+    resp = app.test_client().get(f"{path}?max_points={max_points}")
+    assert resp.status_code == 400
+    assert "max_points" in resp.get_json()["error"]
@@ -0,0 +1,79 @@
+"""
+外汇交易日历测试
+运行：python -m pytest test_fx_calendar.py
+"""
+
+import calendar
+from datetime import date, datetime
+import numpy as np
+import pytest
+from services.forex_service import IFindForexService
+from tools.ifind_stub import minute_bars, period_bars, start_in_thread
+from utils.bar_utils import bars_from_raw
+from utils.fx_calendar import FXCalendar
+
+
+def _ts(*args):
+    return calendar.timegm(datetime(*args).timetuple())
+
+
+def test_minute_span_skips_weekend():
+    cal = FXCalendar()
+    # 周一 00:05：6 根在周一（含正在形成的一根），其余在上周五收盘前
+    assert cal.bars_start(_ts(2026, 10, 19, 0, 5, 30), 60, 10) == _ts(
+        2026, 10, 16, 23, 56
+    )
+    # 周末休市期间从周五最后一根K线往前数
+    assert cal.bars_start(_ts(2026, 10, 18, 12), 300, 3) == _ts(2026, 10, 16, 23, 45)
+    assert not cal.is_trading(_ts(2026, 10, 17, 0))
+    assert cal.is_trading(_ts(2026, 10, 16, 23, 59))
+
+
+@pytest.mark.parametrize("step", [1, 5, 60])
+def test_minute_span_has_exactly_count_bars(step):
+    cal = FXCalendar()
+    rng = np.random.default_rng(step)
+    for end in rng.integers(_ts(2026, 9, 1), _ts(2026, 10, 1), 20):
+        count = int(rng.integers(1, 3000))
+        start = cal.bars_start(int(end), step * 60, count)
+        t, _ = minute_bars("EURUSD.FX", start, end, step, now_ts=end)
+        assert len(t) == count
+
+
+@pytest.mark.parametrize("period,rule", [("1d", "D"), ("1w", "W"), ("1m", "M")])
+def test_kline_span_has_exactly_count_bars(period, rule):
+    cal = FXCalendar()
+    for end in [date(2026, 10, 18), date(2026, 10, 14), date(2026, 3, 2)]:
+        end_ts = calendar.timegm(end.timetuple()) + 86399
+        for count in (1, 7, 40):
+            start = cal.kline_start(period, count, end)
+            start_ts = calendar.timegm(start.timetuple())
+            t, _ = period_bars("USDCNY.FX", start_ts, end_ts, rule, now_ts=end_ts)
+            assert len(t) == count
+
+
+def test_custom_session():
+    # 周六 05:00 收盘、周一 05:00 开盘
+    cal = FXCalendar(weekly_close=(5, 5 * 3600), weekly_open=(0, 5 * 3600))
+    assert cal.is_trading(_ts(2026, 10, 17, 4, 59))
+    assert not cal.is_trading(_ts(2026, 10, 19, 4, 59))
+    assert cal.bars_start(_ts(2026, 10, 19, 5, 0), 60, 2) == _ts(2026, 10, 17, 4, 59)
+    assert cal.kline_start("1d", 2, date(2026, 10, 19)) == date(2026, 10, 16)
+
+
+def test_service_fetches_exact_window_once():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService(
+            "stub-token", realtime_coalesce_window=0, resample_base_interval="5"
+        )
+        service.base_url = stub.url
+        before = sum(stub.stats["requests"].values())
+        raw = service.get_forex_minute_data("EURUSD.FX", "5", 600)
+        assert len(bars_from_raw(raw)["EURUSD.FX"].t) == 600
+        raw = service.get_forex_kline_data("EURUSD.FX", "1d", 30)
+        assert len(bars_from_raw(raw)["EURUSD.FX"].t) == 30
+        # 令牌 + 分钟数据 + 日K线，各一次
+        assert sum(stub.stats["requests"].values()) - before == 3
+    finally:
+        stub.shutdown()
@@ -0,0 +1,97 @@
+"""
+同花顺接口替身测试
+运行：python -m pytest test_ifind_stub.py
+"""
+
+import calendar
+from datetime import datetime
+import numpy as np
+import pytest
+from services.forex_service import IFindForexService
+from tools.ifind_stub import minute_bars, period_bars, start_in_thread
+
+# 周五 14:07:30
+NOW = calendar.timegm(datetime(2026, 10, 16, 14, 7, 30).timetuple())
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = start_in_thread()
+    yield server
+    server.shutdown()
+
+
+def _service(stub):
+    service = IFindForexService(
+        "stub-token", enable_bar_cache=False, realtime_coalesce_window=0
+    )
+    service.base_url = stub.url
+    return service
+
+
+def test_minute_intervals_aggregate_from_one_minute_bars():
+    t1, c1 = minute_bars("EURUSD.FX", NOW - 3600, NOW, 1, NOW)
+    t5, c5 = minute_bars("EURUSD.FX", NOW - 3600, NOW, 5, NOW)
+    assert len(t1) == 60 and len(t5) == 12
+    assert np.all(t5 % 300 == 0)
+
+    groups = t1 // 300
+    for i, start in enumerate(t5):
+        member = groups == start // 300
+        assert c5["open"][i] == c1["open"][member][0]
+        assert c5["close"][i] == c1["close"][member][-1]
+        assert c5["high"][i] == c1["high"][member].max()
+        assert c5["low"][i] == c1["low"][member].min()
+
+
+def test_closed_bars_are_deterministic():
+    _, before = minute_bars("USDCNY.FX", NOW - 600, NOW, 1, NOW)
+    _, after = minute_bars("USDCNY.FX", NOW - 600, NOW, 1, NOW + 3600)
+    # 最后一根为未收盘的K线，其余K线不随请求时间变化
+    assert np.array_equal(
+        before["close"][:-1], after["close"][: len(before["close"]) - 1]
+    )
+    assert np.all(before["high"] >= np.maximum(before["open"], before["close"]))
+
+
+def test_weekends_have_no_bars():
+    saturday = calendar.timegm(datetime(2026, 10, 17, 12).timetuple())
+    assert len(minute_bars("USDCNY.FX", saturday - 3600, saturday, 1, saturday)[0]) == 0
+
+    starts, _ = period_bars("USDCNY.FX", NOW - 14 * 86400, NOW, "D", NOW)
+    weekdays = (starts // 86400 + 3) % 7
+    # 10-02（周五）至 10-16（周五）共 11 个交易日
+    assert len(starts) == 11 and np.all(weekdays < 5)
+
+
+def test_service_parses_stub_responses(stub):
+    service = _service(stub)
+    quotes = service.format_realtime_data(
+        service.get_forex_realtime_data("USDCNY.FX,EURUSD.FX")
+    )
+    assert [q["code"] for q in quotes] == ["USDCNY.FX", "EURUSD.FX"]
+    assert 6 < quotes[0]["latest"] < 8
+
+    raw = service.get_forex_kline_data("EURUSD.FX", "1d", 30)
+    table = raw["tables"][0]
+    assert table["thscode"] == "EURUSD.FX"
+    assert len(table["time"]) == len(table["table"]["close"]) > 0
+
+
+def test_access_token_required(stub):
+    service = _service(stub)
+    service.access_token = "unknown"
+    service.token_expires_at = datetime(2100, 1, 1)
+    with pytest.raises(RuntimeError, match="access_token"):
+        service.get_forex_realtime_data("USDCNY.FX")
+
+
+def test_error_injection(stub):
+    service = _service(stub)
+    stub.update_config({"error_rate": 1})
+    try:
+        with pytest.raises(RuntimeError, match="injected error 500"):
+            service.get_forex_realtime_data("USDCNY.FX")
+    finally:
+        stub.update_config({"error_rate": 0})
+    assert stub.stats["statuses"]["500"] >= 1
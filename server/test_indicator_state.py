@@ -0,0 +1,168 @@
+"""
+增量技术指标测试
+校验逐根K线递推的结果与批量计算（utils/indicators.py）一致
+运行：python -m pytest test_indicator_state.py
+"""
+
+import json
+import time
+import numpy as np
+from utils.bar_utils import Bars
+from utils.indicators import compute_indicator
+from services.indicator_state import (
+    IncrementalIndicator,
+    IndicatorStateRegistry,
+    create_indicator,
+)
+
+SPECS = [
+    ("MA", (20,)),
+    ("EMA", (12,)),
+    ("MACD", (12, 26, 9)),
+    ("RSI", (14,)),
+    ("BOLL", (20, 2.0)),
+    ("ATR", (14,)),
+]
+
+
+def make_bars(count, seed=7):
+    rng = np.random.default_rng(seed)
+    t = 1_700_000_040 + np.arange(count, dtype=np.int64) * 60
+    close = 7.1 + np.cumsum(rng.normal(0, 0.001, count))
+    spread = np.abs(rng.normal(0, 0.0005, count))
+    return Bars(t, close, close + spread, close - spread, close, np.zeros(count))
+
+
+def assert_columns_close(actual, expected):
+    assert set(actual) == set(expected)
+    for col in expected:
+        np.testing.assert_allclose(
+            np.asarray(actual[col], dtype=float), expected[col], rtol=1e-9, atol=1e-9
+        )
+
+
+def stream(indicator, bars):
+    """逐根输入K线，收集输出"""
+    columns = {}
+    for i in range(len(bars.t)):
+        values = indicator.update(bars.t[i], bars.high[i], bars.low[i], bars.close[i])
+        for col, value in values.items():
+            columns.setdefault(col, []).append(value)
+    return columns
+
+
+def test_streaming_matches_batch():
+    bars = make_bars(600)
+    for name, params in SPECS:
+        expected = compute_indicator(name, params, bars)
+        actual = stream(create_indicator(name, params), bars)
+        assert_columns_close(actual, expected)
+
+
+def test_revised_last_bar_matches_batch():
+    """最后一根K线多次更新后，结果与只输入最终值一致"""
+    bars = make_bars(300)
+    for name, params in SPECS:
+        indicator = create_indicator(name, params)
+        for i in range(len(bars.t)):
+            # 每根K线先输入一个临时价格，再输入最终价格
+            indicator.update(
+                bars.t[i], bars.high[i] + 0.01, bars.low[i] - 0.01, bars.close[i] + 0.01
+            )
+            last = indicator.update(bars.t[i], bars.high[i], bars.low[i], bars.close[i])
+        expected = compute_indicator(name, params, bars)
+        for col, value in last.items():
+            np.testing.assert_allclose(value, expected[col][-1], rtol=1e-9)
+
+
+def test_serialization_round_trip():
+    bars = make_bars(400)
+    half = Bars(*(col[:250] for col in bars))
+    rest = Bars(*(col[249:] for col in bars))
+    for name, params in SPECS:
+        indicator = create_indicator(name, params)
+        stream(indicator, half)
+        restored = IncrementalIndicator.from_dict(
+            json.loads(json.dumps(indicator.to_dict()))
+        )
+        # 从最后一根K线（含）继续输入，验证回退点也被正确恢复
+        actual = stream(restored, rest)
+        expected = compute_indicator(name, params, bars)
+        assert_columns_close(actual, {c: v[249:] for c, v in expected.items()})
+
+
+def test_registry_incremental_updates(tmp_path):
+    bars = make_bars(800)
+    path = str(tmp_path / "state.json")
+    registry = IndicatorStateRegistry(path)
+
+    first = Bars(*(col[:500] for col in bars))
+    for name, params in SPECS:
+        registry.series("USDCNY.FX", "1", name, params, first, 100)
+    registry.save()
+
+    # 重启后从磁盘恢复，只对新增K线做增量更新
+    restored = IndicatorStateRegistry(path)
+    for name, params in SPECS:
+        t, columns = restored.series("USDCNY.FX", "1", name, params, bars, 100)
+        expected = compute_indicator(name, params, bars)
+        np.testing.assert_array_equal(t, bars.t[-100:])
+        assert_columns_close(columns, {c: v[-100:] for c, v in expected.items()})
+    assert restored.incremental_updates == len(SPECS)
+    assert restored.rebuilds == 0
+
+
+def test_seeded_state_continues_like_streaming():
+    bars = make_bars(300)
+    for name, params in SPECS:
+        expected = compute_indicator(name, params, bars)
+        # 覆盖初值阶段前后的各种长度
+        for k in (1, 2, 13, 14, 15, 19, 20, 21, 26, 120):
+            indicator = create_indicator(name, params)
+            indicator.seed(Bars(*(col[:k] for col in bars)))
+            actual = stream(indicator, Bars(*(col[k:] for col in bars)))
+            assert_columns_close(actual, {c: v[k:] for c, v in expected.items()})
+
+
+def test_registry_rebuild_uses_batch_and_keeps_revision_point():
+    bars = make_bars(3000)
+    registry = IndicatorStateRegistry()
+    registry._feed = None  # 重建不应逐根递推
+    for name, params in SPECS:
+        t, columns = registry.series("EURUSD.FX", "1", name, params, bars, 500)
+        expected = compute_indicator(name, params, bars)
+        np.testing.assert_array_equal(t, bars.t[-500:])
+        assert_columns_close(columns, {c: v[-500:] for c, v in expected.items()})
+    del registry._feed
+
+    # 最后一根K线更新后增量计算与批量一致
+    revised = Bars(*(col.copy() for col in bars))
+    for col in (revised.close, revised.high, revised.low):
+        col[-1] += 0.002
+    for name, params in SPECS:
+        _, columns = registry.series("EURUSD.FX", "1", name, params, revised, 10)
+        expected = compute_indicator(name, params, revised)
+        assert_columns_close(columns, {c: v[-10:] for c, v in expected.items()})
+    assert registry.rebuilds == len(SPECS)
+    assert registry.incremental_updates == len(SPECS)
+
+
+def test_registry_saves_periodically(tmp_path):
+    bars = make_bars(400)
+    path = tmp_path / "state.json"
+    registry = IndicatorStateRegistry(str(path), save_interval=3600, save_every=3)
+    try:
+        for name, params in SPECS[:2]:
+            registry.series("USDJPY.FX", "1", name, params, bars, 50)
+        assert not path.exists()
+        # 累计 save_every 次更新后由后台线程保存，无需等到进程退出
+        registry.series("USDJPY.FX", "1", *SPECS[2], bars, 50)
+        deadline = time.monotonic() + 5
+        while registry.saves == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.get_stats()["unsaved_updates"] == 0
+    finally:
+        registry.stop_saver()
+
+    restored = IndicatorStateRegistry(str(path), save_interval=0)
+    assert restored.get_stats()["keys"] == 3
@@ -0,0 +1,113 @@
+"""
+技术指标计算测试
+运行：python -m pytest test_indicators.py
+"""
+
+import math
+import numpy as np
+import pytest
+from utils.bar_utils import Bars
+from utils.indicators import (
+    atr,
+    bollinger,
+    compute_indicator,
+    ema,
+    ewm,
+    macd,
+    parse_indicator_specs,
+    rsi,
+    sma,
+)
+
+rng = np.random.default_rng(42)
+CLOSE = 7 + np.cumsum(rng.normal(0, 0.02, 1500))
+HIGH = CLOSE + rng.random(1500) * 0.03
+LOW = CLOSE - rng.random(1500) * 0.03
+
+
+def ref_ewm(values, alpha):
+    out = [values[0]]
+    for x in values[1:]:
+        out.append(alpha * x + (1 - alpha) * out[-1])
+    return np.array(out)
+
+
+def ref_wilder(values, period):
+    """以前 period 个值的均值为初值的 Wilder 平滑"""
+    out = [sum(values[:period]) / period]
+    for x in values[period:]:
+        out.append((out[-1] * (period - 1) + x) / period)
+    return np.array(out)
+
+
+def test_ewm_matches_recursion_across_blocks():
+    # alpha 很小时块长度受衰减因子限制，需要跨多个块递推
+    for alpha in (1.0, 0.5, 2 / 13, 0.01, 0.001):
+        assert np.allclose(ewm(CLOSE, alpha), ref_ewm(CLOSE, alpha), rtol=1e-10)
+    assert len(ewm(np.empty(0), 0.5)) == 0
+
+
+def test_sma_and_bollinger():
+    ma = sma(CLOSE, 20)
+    assert np.isnan(ma[:19]).all()
+    expected = [CLOSE[i - 19 : i + 1].mean() for i in range(19, len(CLOSE))]
+    assert np.allclose(ma[19:], expected)
+
+    upper, mid, lower = bollinger(CLOSE, 20, 2)
+    std = np.array([CLOSE[i - 19 : i + 1].std() for i in range(19, len(CLOSE))])
+    assert np.allclose(upper[19:], mid[19:] + 2 * std)
+    assert np.allclose(lower[19:], mid[19:] - 2 * std)
+    assert np.isnan(sma(CLOSE[:5], 20)).all()
+
+
+def test_macd():
+    dif, dea, hist = macd(CLOSE, 12, 26, 9)
+    ref_dif = ref_ewm(CLOSE, 2 / 13) - ref_ewm(CLOSE, 2 / 27)
+    assert np.allclose(dif, ref_dif)
+    assert np.allclose(dea, ref_ewm(ref_dif, 0.2))
+    assert np.allclose(hist, 2 * (dif - dea))
+    assert np.allclose(ema(CLOSE, 12), ref_ewm(CLOSE, 2 / 13))
+
+
+def test_rsi():
+    period = 14
+    value = rsi(CLOSE, period)
+    diff = np.diff(CLOSE)
+    avg_gain = ref_wilder(np.clip(diff, 0, None), period)
+    avg_loss = ref_wilder(np.clip(-diff, 0, None), period)
+    expected = 100 - 100 / (1 + avg_gain / avg_loss)
+    assert np.isnan(value[:period]).all()
+    assert np.allclose(value[period:], expected)
+    # 单边上涨时 RSI 为 100，价格不变时为 50
+    assert rsi(np.arange(30.0), period)[-1] == 100
+    assert rsi(np.ones(30), period)[-1] == 50
+
+
+def test_atr():
+    period = 14
+    tr = [HIGH[0] - LOW[0]] + [
+        max(HIGH[i] - LOW[i], abs(HIGH[i] - CLOSE[i - 1]), abs(LOW[i] - CLOSE[i - 1]))
+        for i in range(1, len(CLOSE))
+    ]
+    value = atr(HIGH, LOW, CLOSE, period)
+    assert np.isnan(value[: period - 1]).all()
+    assert np.allclose(value[period - 1 :], ref_wilder(tr, period))
+
+
+def test_compute_indicator_columns():
+    n = len(CLOSE)
+    bars = Bars(np.arange(n, dtype=np.int64) * 60, CLOSE, HIGH, LOW, CLOSE, np.ones(n))
+    specs = parse_indicator_specs("MA:10,MACD,RSI:7,BOLL:20-2.5,ATR,EMA:5")
+    columns = [set(compute_indicator(name, params, bars)) for name, params in specs]
+    assert columns == [
+        {"MA"},
+        {"MACD", "DIF", "DEA"},
+        {"RSI"},
+        {"UPPER", "MID", "LOWER"},
+        {"ATR"},
+        {"EMA"},
+    ]
+    assert specs[3] == ("BOLL", (20, 2.5))
+    assert not math.isnan(compute_indicator("ATR", (14,), bars)["ATR"][-1])
+    with pytest.raises(ValueError):
+        parse_indicator_specs("KDJ")
@@ -0,0 +1,80 @@
+"""
+大时间窗口分钟数据分段并发请求测试
+运行：python -m pytest test_minute_chunks.py
+"""
+
+import numpy as np
+import pytest
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+from utils.bar_utils import Bars, BarsBuffer, bars_from_raw
+
+PAIRS = ["USDCNY.FX", "EURUSD.FX"]
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = start_in_thread(latency=0.02)
+    yield server
+    server.shutdown()
+
+
+def _service(stub, **kwargs):
+    service = IFindForexService(
+        "stub-token",
+        enable_bar_cache=False,
+        realtime_coalesce_window=0,
+        rate_limit=0,
+        **kwargs,
+    )
+    service.base_url = stub.url
+    service.get_access_token()
+    return service
+
+
+def _minute_requests(stub):
+    return stub.stats["requests"].get("/api/v1/high_frequency", 0)
+
+
+def _bars(t):
+    t = np.asarray(t, dtype=np.int64)
+    return Bars(t, *(t.astype(float) for _ in range(5)))
+
+
+def test_buffer_skips_overlap_and_grows():
+    buffer = BarsBuffer(3)
+    buffer.append(_bars([60, 120, 180]))
+    buffer.append(_bars([180, 240, 300]))
+    buffer.append(_bars([]))
+    bars = buffer.to_bars()
+    assert bars.t.tolist() == [60, 120, 180, 240, 300]
+    assert bars.close.tolist() == [60.0, 120.0, 180.0, 240.0, 300.0]
+
+
+def test_chunked_window_matches_single_request(stub):
+    start = 1759708800  # 2025-10-06 周一
+    end = start + 3 * 86400
+
+    single = _service(stub, minute_chunk_bars=100000)
+    before = _minute_requests(stub)
+    expected = single.fetch_bar_range(PAIRS, "1", start, end)
+    assert _minute_requests(stub) - before == 1
+
+    chunked = _service(stub, minute_chunk_bars=500, chunk_workers=3)
+    before = _minute_requests(stub)
+    result = chunked.fetch_bar_range(PAIRS, "1", start, end)
+    # 3 天共 4320 分钟，每段 500 分钟
+    assert _minute_requests(stub) - before == 9
+    for pair in PAIRS:
+        assert len(result[pair].t) > 1000
+        for got, want in zip(result[pair], expected[pair]):
+            assert np.array_equal(got, want, equal_nan=True)
+
+
+def test_uncached_minute_data_is_chunked(stub):
+    service = _service(stub, minute_chunk_bars=200)
+    before = _minute_requests(stub)
+    raw = service.get_forex_minute_data("EURUSD.FX", "5", 1000)
+    assert _minute_requests(stub) - before == 5
+    t = bars_from_raw(raw)["EURUSD.FX"].t
+    assert np.all(np.diff(t) > 0)
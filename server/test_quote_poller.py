@@ -0,0 +1,53 @@
+"""
+实时行情后台轮询测试
+运行：python -m pytest test_quote_poller.py
+"""
+
+import time
+import pytest
+from services.quote_poller import QuotePoller
+
+
+def make_fetch(fail=lambda: False):
+    calls = []
+
+    def fetch(codes):
+        calls.append(codes)
+        if fail():
+            raise RuntimeError("实时数据获取失败")
+        return [{"code": c, "latest": 7.0 + len(calls)} for c in codes.split(",")]
+
+    return fetch, calls
+
+
+def test_snapshot_is_immutable_and_sequenced():
+    fetch, calls = make_fetch()
+    poller = QuotePoller(fetch, lambda raw: raw, ["USDCNY.FX", "EURUSD.FX"])
+    assert poller.snapshot is None
+
+    first = poller.poll_once()
+    second = poller.poll_once()
+    assert (first.seq, second.seq) == (1, 2)
+    assert first.quotes["USDCNY.FX"]["latest"] == 8.0
+    assert second.quotes["USDCNY.FX"]["latest"] == 9.0
+    assert poller.snapshot is second
+    with pytest.raises(TypeError):
+        first.quotes["USDCNY.FX"] = {}
+
+
+def test_failed_poll_keeps_last_snapshot():
+    failing = {"on": False}
+    fetch, calls = make_fetch(fail=lambda: failing["on"])
+    poller = QuotePoller(fetch, lambda raw: raw, ["USDCNY.FX"], interval=0.02)
+    poller.poll_once()
+    last = poller.snapshot
+
+    failing["on"] = True
+    poller.start()
+    time.sleep(0.1)
+    poller.stop()
+
+    assert poller.snapshot is last
+    stats = poller.get_stats()
+    assert stats["errors"] >= 2 and not stats["running"]
+    assert stats["staleness"] >= 0.1
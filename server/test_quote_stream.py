@@ -0,0 +1,135 @@
+"""
+行情推送订阅测试
+运行：python -m pytest test_quote_stream.py
+"""
+
+import threading
+import time
+from types import MappingProxyType
+from services.forex_service import IFindForexService
+from services.quote_poller import QuoteSnapshot
+from services.quote_stream import QuoteStream, format_sse
+from utils.bar_utils import empty_bars
+
+
+def make_snapshot(seq, **latest):
+    quotes = {
+        code: {"code": code, "latest": value, "changeRatio": 0.1, "high": 7.2}
+        for code, value in latest.items()
+    }
+    return QuoteSnapshot(seq, 1_700_000_000.0 + seq, MappingProxyType(quotes))
+
+
+def test_events_routed_by_pair_and_period():
+    stream = QuoteStream()
+    cny = stream.subscribe(["USDCNY.FX"], ["1min"])
+    eur = stream.subscribe(["EURUSD.FX", "USDCNY.FX"], [])
+
+    stream.publish("quote", "USDCNY.FX", {"latest": 7.1})
+    stream.publish("quote", "EURUSD.FX", {"latest": 1.08})
+    stream.publish("bar", "USDCNY.FX", {"bar": []}, "1min")
+
+    assert [cny.get(0)[0], cny.get(0)[0], cny.get(0)] == ["quote", "bar", None]
+    assert [eur.get(0)[1]["latest"], eur.get(0)[1]["latest"], eur.get(0)] == [
+        7.1,
+        1.08,
+        None,
+    ]
+    assert stream.bar_subscriptions() == {("USDCNY.FX", "1min")}
+
+    stream.unsubscribe(cny)
+    assert stream.bar_subscriptions() == set()
+
+
+def test_slow_subscriber_drops_oldest_events():
+    stream = QuoteStream(max_queue=3)
+    subscription = stream.subscribe(["USDCNY.FX"])
+    for i in range(5):
+        stream.publish("quote", "USDCNY.FX", {"seq": i})
+
+    assert [subscription.get(0)[1]["seq"] for _ in range(3)] == [2, 3, 4]
+    assert stream.get_stats()["dropped"] == 2
+
+
+def test_format_sse():
+    message = format_sse("quote", {"code": "USDCNY.FX"}, event_id=3)
+    assert message == 'id: 3\nevent: quote\ndata: {"code":"USDCNY.FX"}\n\n'
+
+
+def test_delta_contains_only_changed_fields():
+    stream = QuoteStream()
+    stream.publish_snapshot(make_snapshot(1, CNY=7.1, EUR=1.08))
+    subscription = stream.subscribe(["CNY", "EUR"])
+    stream.publish_snapshot(make_snapshot(2, CNY=7.2, EUR=1.08))
+    stream.publish_snapshot(make_snapshot(3, CNY=7.2, EUR=1.08))
+
+    event, data, seq = subscription.get(0)
+    assert (event, seq) == ("delta", 2)
+    assert data["q"] == {"CNY": {"latest": 7.2}}
+    # 无变化的快照不推送
+    assert subscription.get(0) is None
+
+
+def test_resume_from_sequence_or_full_snapshot():
+    stream = QuoteStream(journal_size=3)
+    for seq in range(1, 6):
+        stream.publish_snapshot(make_snapshot(seq, CNY=7.0 + seq / 10, EUR=1.08))
+
+    # 日志保留 seq 3~5，从 seq 3 续传只补发之后的增量
+    events, last = stream.catch_up({"CNY"}, since=3)
+    assert [(e, s) for e, _, s in events] == [("delta", 4), ("delta", 5)]
+    assert events[-1][1]["q"] == {"CNY": {"latest": 7.5}}
+    assert last == 5
+
+    # 落后太多或首次连接时发送完整快照
+    for since in (1, None):
+        events, last = stream.catch_up({"CNY"}, since=since)
+        assert [(e, s) for e, _, s in events] == [("snapshot", 5)]
+        assert events[0][1]["q"] == {
+            "CNY": {"latest": 7.5, "changeRatio": 0.1, "high": 7.2}
+        }
+
+
+def test_sequence_restart_discards_journal():
+    stream = QuoteStream()
+    for seq in range(1, 4):
+        stream.publish_snapshot(make_snapshot(seq, CNY=7.0 + seq))
+    stream.publish_snapshot(make_snapshot(1, CNY=7.0))
+
+    events, last = stream.catch_up({"CNY"}, since=3)
+    assert [e for e, _, _ in events] == ["snapshot"] and last == 1
+
+
+def test_closed_bars_checked_off_the_poller_thread():
+    service = IFindForexService(
+        "stub-token", enable_bar_cache=False, realtime_coalesce_window=0
+    )
+    release = threading.Event()
+    calls = []
+
+    def slow_batch(pairs, period, count):
+        calls.append((tuple(pairs), period))
+        release.wait(5)
+        return {pair: empty_bars() for pair in pairs}
+
+    service.get_period_bars_batch = slow_batch
+    subscription = service.quote_stream.subscribe(["USDCNY.FX"], ["1min"])
+    service._bar_marks[("EURUSD.FX", "5min")] = (0, 0)
+    try:
+        start = time.perf_counter()
+        service._publish_snapshot(make_snapshot(1, **{"USDCNY.FX": 7.1}))
+        # 上游请求未返回时行情推送照常完成
+        assert time.perf_counter() - start < 0.5
+        assert subscription.get(1) is not None
+        service._publish_snapshot(make_snapshot(2, **{"USDCNY.FX": 7.2}))
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while ("USDCNY.FX", "1min") not in service._bar_marks:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # 不再订阅的位置被清理
+        assert set(service._bar_marks) == {("USDCNY.FX", "1min")}
+        assert calls[0] == (("USDCNY.FX",), "1min")
+    finally:
+        service.stop_quote_poller()
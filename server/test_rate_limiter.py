@@ -0,0 +1,59 @@
+"""
+上游限流器测试
+运行：python -m pytest test_rate_limiter.py
+"""
+
+import threading
+import time
+import pytest
+from services.rate_limiter import PriorityRateLimiter, RateLimitTimeout
+
+
+def test_higher_priority_lanes_served_first():
+    limiter = PriorityRateLimiter(rate=10, burst=1)
+    limiter.acquire("chart")  # 用掉初始令牌，后续请求都需要排队
+
+    order = []
+
+    def worker(lane):
+        limiter.acquire(lane)
+        order.append(lane)
+
+    threads = []
+    for lane in ("backfill", "indicators", "chart", "realtime"):
+        thread = threading.Thread(target=worker, args=(lane,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["realtime", "chart", "indicators", "backfill"]
+
+
+def test_backfill_keeps_reserve_for_interactive_lanes():
+    limiter = PriorityRateLimiter(rate=1, burst=4, reserve={"backfill": 2})
+    assert limiter.acquire("backfill") == 0
+    assert limiter.acquire("backfill") == 0
+    # 剩余令牌不足 1 + 保留数，批量任务需要等待，交互请求仍可立即获取
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("backfill", timeout=0.05)
+    assert limiter.acquire("chart") == 0
+    assert limiter.acquire("realtime") == 0
+
+
+def test_wait_metrics():
+    limiter = PriorityRateLimiter(rate=20, burst=1)
+    limiter.acquire("chart")
+    waited = limiter.acquire("chart")
+    assert 0.02 < waited < 0.5
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("realtime", timeout=0.001)
+
+    stats = limiter.get_stats()["lanes"]
+    assert stats["chart"]["acquired"] == 2
+    assert stats["chart"]["waited"] == 1
+    assert stats["chart"]["wait_max"] >= stats["chart"]["avg_wait"] > 0
+    assert stats["realtime"]["timeouts"] == 1
+    assert all(lane["queued"] == 0 for lane in stats.values())
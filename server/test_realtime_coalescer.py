@@ -0,0 +1,105 @@
+"""
+实时行情请求合并测试
+运行：python -m pytest test_realtime_coalescer.py
+"""
+
+import threading
+import time
+import pytest
+from services.realtime_coalescer import RealtimeCoalescer
+
+
+class FakeUpstream:
+    """记录调用次数的模拟实时行情接口"""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def __call__(self, codes):
+        self.calls.append(codes)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {
+            "tables": [
+                {"thscode": code, "table": {"latest": [float(i)]}}
+                for i, code in enumerate(codes.split(","))
+            ]
+        }
+
+
+def run_concurrently(coalescer, requests):
+    results = [None] * len(requests)
+
+    def worker(i, codes):
+        try:
+            results[i] = coalescer.get(codes)
+        except Exception as e:
+            results[i] = e
+
+    threads = [
+        threading.Thread(target=worker, args=(i, codes))
+        for i, codes in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_overlapping_requests_share_one_upstream_call():
+    upstream = FakeUpstream()
+    coalescer = RealtimeCoalescer(upstream, window=0.05)
+    requests = [["USDCNY.FX", "EURUSD.FX"], ["EURUSD.FX"], ["GBPUSD.FX"]] * 5
+
+    results = run_concurrently(coalescer, requests)
+
+    assert upstream.calls == ["EURUSD.FX,GBPUSD.FX,USDCNY.FX"]
+    for codes, result in zip(requests, results):
+        assert list(result) == codes
+    assert coalescer.get_stats()["requests"] == len(requests)
+
+
+def test_request_during_flight_waits_for_covering_call():
+    upstream = FakeUpstream(delay=0.2)
+    coalescer = RealtimeCoalescer(upstream, window=0.01)
+    leader = threading.Thread(target=coalescer.get, args=(["USDCNY.FX", "EURUSD.FX"],))
+    leader.start()
+    time.sleep(0.05)
+
+    # 上游请求进行中，所需代码已被覆盖，不再发起新请求
+    assert list(coalescer.get(["EURUSD.FX"])) == ["EURUSD.FX"]
+    leader.join()
+    assert len(upstream.calls) == 1
+
+
+def test_error_is_raised_to_all_waiters():
+    upstream = FakeUpstream(error=RuntimeError("实时数据获取失败"))
+    coalescer = RealtimeCoalescer(upstream, window=0.05)
+
+    results = run_concurrently(coalescer, [["USDCNY.FX"]] * 4)
+
+    assert len(upstream.calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # 失败后的请求重新发起上游调用
+    with pytest.raises(RuntimeError):
+        coalescer.get(["USDCNY.FX"])
+    assert len(upstream.calls) == 2
+
+
+def test_response_keeps_upstream_envelope():
+    def upstream(codes):
+        return {
+            "errorcode": -4210,
+            "errmsg": "部分代码无数据",
+            "tables": [{"thscode": "USDCNY.FX", "table": {"latest": [7.1]}}],
+        }
+
+    coalescer = RealtimeCoalescer(upstream, window=0)
+    response = coalescer.get_response(["EURUSD.FX", "USDCNY.FX"])
+    assert response["errorcode"] == -4210
+    assert response["errmsg"] == "部分代码无数据"
+    assert [t["thscode"] for t in response["tables"]] == ["USDCNY.FX"]
@@ -0,0 +1,161 @@
+"""
+K线重采样测试
+运行：python -m pytest test_resample.py
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+from utils.bar_utils import Bars, from_epoch, to_epoch
+from utils.resample import resample_bars
+
+
+def random_bars(count, step, seed=0, start="2026-01-01"):
+    rng = np.random.default_rng(seed)
+    start_ts = to_epoch(datetime.fromisoformat(start))
+    # 随机间隔，模拟休市与缺失的K线
+    t = start_ts + np.cumsum(rng.integers(1, 4, count)) * step
+    close = 7 + np.cumsum(rng.normal(0, 0.01, count))
+    open_ = close + rng.normal(0, 0.005, count)
+    high = np.maximum(open_, close) + rng.random(count) * 0.01
+    low = np.minimum(open_, close) - rng.random(count) * 0.01
+    volume = rng.integers(0, 100, count).astype(float)
+    volume[rng.random(count) < 0.1] = np.nan
+    high[rng.random(count) < 0.05] = np.nan
+    return Bars(t.astype(np.int64), open_, high, low, close, volume)
+
+
+def _bucket(dt, rule):
+    """逐根K线计算区间起点（参考实现）"""
+    if isinstance(rule, int):
+        minutes = dt.hour * 60 + dt.minute
+        day = datetime(dt.year, dt.month, dt.day)
+        return day + timedelta(minutes=minutes - minutes % rule)
+    day = datetime(dt.year, dt.month, dt.day)
+    if rule == "1d":
+        return day
+    if rule == "1w":
+        return day - timedelta(days=day.weekday())
+    if rule == "1m":
+        return datetime(dt.year, dt.month, 1)
+    if rule == "1q":
+        return datetime(dt.year, dt.month - (dt.month - 1) % 3, 1)
+    return datetime(dt.year, 1, 1)
+
+
+def reference_resample(bars, rule):
+    groups = {}
+    for i, ts in enumerate(bars.t):
+        groups.setdefault(_bucket(from_epoch(ts), rule), []).append(i)
+    rows = []
+    for start, idx in sorted(groups.items()):
+        highs = [bars.high[i] for i in idx if not np.isnan(bars.high[i])]
+        volumes = [bars.volume[i] for i in idx if not np.isnan(bars.volume[i])]
+        # 日线及以上周期以区间内最后一根K线的日期为时间戳
+        label = (
+            start
+            if isinstance(rule, int)
+            else _bucket(from_epoch(bars.t[idx[-1]]), "1d")
+        )
+        rows.append(
+            (
+                to_epoch(label),
+                bars.open[idx[0]],
+                max(highs) if highs else np.nan,
+                min(bars.low[i] for i in idx),
+                bars.close[idx[-1]],
+                sum(volumes),
+            )
+        )
+    return Bars(*(np.array(col) for col in zip(*rows)))
+
+
+@pytest.mark.parametrize(
+    "rule,step,count",
+    [(5, 60, 3000), (15, 60, 3000), (60, 300, 2000), ("1d", 3600, 2000)]
+    + [("1w", 86400, 800), ("1m", 86400, 800), ("1q", 86400, 800)]
+    + [("1y", 86400, 1500)],
+)
+def test_matches_reference(rule, step, count):
+    bars = random_bars(count, step, seed=count + step)
+    result = resample_bars(bars, rule)
+    expected = reference_resample(bars, rule)
+    assert np.array_equal(result.t, expected.t)
+    for col, exp in zip(result[1:], expected[1:]):
+        assert np.allclose(col, exp, equal_nan=True)
+
+
+def test_matches_pandas():
+    pd = pytest.importorskip("pandas")
+    bars = random_bars(5000, 60, seed=7)
+    frame = pd.DataFrame(
+        {name: getattr(bars, name) for name in Bars._fields[1:]},
+        index=pd.to_datetime(bars.t, unit="s"),
+    )
+    expected = (
+        frame.resample("15min")
+        .agg(
+            {
+                "open": "first",
+                "high": "max",
+                "low": "min",
+                "close": "last",
+                "volume": "sum",
+            }
+        )
+        .dropna(subset=["close"])
+    )
+    result = resample_bars(bars, 15)
+    assert np.array_equal(
+        result.t, expected.index.values.astype("datetime64[s]").astype(np.int64)
+    )
+    for name in Bars._fields[1:]:
+        assert np.allclose(getattr(result, name), expected[name].values)
+
+
+def test_empty_input():
+    bars = random_bars(0, 60)
+    assert len(resample_bars(bars, 5).t) == 0
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = start_in_thread()
+    yield server
+    server.shutdown()
+
+
+def _service(stub):
+    service = IFindForexService("stub-token", realtime_coalesce_window=0, rate_limit=0)
+    service.base_url = stub.url
+    return service
+
+
+def test_window_beyond_cache_capacity_fetches_target_interval(stub):
+    service = _service(stub)
+    service.bar_cache.max_bars = 1000
+    # 30 根60分钟K线需要 1800 根1分钟K线，超出缓存容量时直接请求60分钟K线
+    bars = service.get_period_bars("EURUSD.FX", "60min", 30)
+    assert len(bars.t) == 30
+    assert service.bar_cache.cached_pairs("60") == {"EURUSD.FX"}
+    assert service.bar_cache.cached_pairs("1") == set()
+
+    assert len(service.get_period_bars("EURUSD.FX", "15min", 60).t) == 60
+    assert service.bar_cache.cached_pairs("1") == {"EURUSD.FX"}
+
+
+@pytest.mark.parametrize("period", ["1w", "1m", "1q"])
+def test_cached_calendar_bars_match_direct_fetch(stub, period):
+    cached = _service(stub).get_period_bars("EURUSD.FX", period, 12)
+
+    direct_service = _service(stub)
+    direct_service.bar_cache = None
+    direct = direct_service.get_period_bars("EURUSD.FX", period, 12)
+
+    # 由日线重采样与直接请求的同一周期K线时间戳一致（区间内最后一个交易日）
+    assert np.array_equal(cached.t, direct.t)
+    assert all(from_epoch(ts).weekday() < 5 for ts in cached.t)
+    assert np.allclose(cached.open, direct.open)
+    assert np.allclose(cached.close, direct.close)
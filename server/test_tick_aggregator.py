@@ -0,0 +1,123 @@
+"""
+实时报价聚合1分钟K线测试
+运行：python -m pytest test_tick_aggregator.py
+"""
+
+import calendar
+from datetime import datetime
+import numpy as np
+from services.bar_cache import BarCache
+from services.forex_service import IFindForexService
+from services.tick_aggregator import TickBarAggregator
+from tools.ifind_stub import start_in_thread
+from utils.bar_utils import Bars
+from utils.fx_calendar import FXCalendar
+
+PAIR = "EURUSD.FX"
+# 周五 10:00
+T0 = calendar.timegm(datetime(2026, 10, 16, 10).timetuple())
+
+
+def _seed(cache, t):
+    t = np.array(t, dtype=np.int64)
+    cache.put(PAIR, "1", Bars(t, *(np.full(len(t), 1.0) for _ in range(5))))
+
+
+def test_ticks_build_and_commit_closed_bars():
+    cache = BarCache()
+    _seed(cache, [T0 - 60, T0])
+    agg = TickBarAggregator(cache, FXCalendar())
+
+    agg.add_tick(PAIR, 1.10, T0 + 30)  # 启动时本分钟已开始，不完整
+    for offset, price in [(65, 1.12), (80, 1.15), (95, 1.11), (110, 1.13)]:
+        agg.add_tick(PAIR, price, T0 + offset)
+    assert agg.live_pairs() == set()
+    agg.add_tick(PAIR, 1.14, T0 + 121)
+
+    stats = agg.get_stats()
+    assert stats["bars_skipped"] == 1 and stats["bars_committed"] == 1
+    assert agg.live_pairs() == {PAIR}
+    bars = cache.peek(PAIR, "1")
+    assert bars.t[-1] == T0 + 60
+    assert [bars.open[-1], bars.high[-1], bars.low[-1], bars.close[-1]] == [
+        1.12,
+        1.15,
+        1.11,
+        1.13,
+    ]
+    current = agg.current_bar(PAIR)
+    assert current.t[0] == T0 + 120 and current.close[0] == 1.14
+
+    # 晚到的旧报价被忽略
+    agg.add_tick(PAIR, 9.0, T0 + 100)
+    assert cache.peek(PAIR, "1").high[-1] == 1.15
+
+
+def test_gap_stops_local_maintenance():
+    cache = BarCache()
+    _seed(cache, [T0])
+    agg = TickBarAggregator(cache, FXCalendar())
+    for offset in (30, 61, 121, 600, 660):
+        agg.add_tick(PAIR, 1.1, T0 + offset)
+    # T0+60、T0+120 写入；T0+600 与缓存之间缺少分钟，不写入
+    assert cache.peek(PAIR, "1").t[-1] == T0 + 120
+    assert agg.get_stats()["bars_skipped"] == 2
+    assert agg.live_pairs() == set()
+
+
+def test_weekend_is_not_a_gap():
+    friday_close = calendar.timegm(datetime(2026, 10, 16, 23, 59).timetuple())
+    monday = calendar.timegm(datetime(2026, 10, 19).timetuple())
+    cache = BarCache()
+    _seed(cache, [friday_close])
+    agg = TickBarAggregator(cache, FXCalendar())
+    agg.add_tick(PAIR, 1.1, friday_close + 30)
+    agg.add_tick(PAIR, 1.1, calendar.timegm(datetime(2026, 10, 17, 12).timetuple()))
+    agg.add_tick(PAIR, 1.1, monday + 1)
+    agg.add_tick(PAIR, 1.1, monday + 61)
+    assert cache.peek(PAIR, "1").t[-1] == monday
+    assert agg.live_pairs() == {PAIR}
+
+
+def test_chart_reads_live_pairs_without_upstream():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService(
+            "stub-token", realtime_coalesce_window=0, rate_limit=0
+        )
+        service.base_url = stub.url
+        seeded = service._cached_minute_bars_batch([PAIR], "1", T0 - 3600, T0)[PAIR]
+        assert seeded.t[-1] == T0
+
+        agg = service.tick_aggregator
+        for offset, price in [(1, 1.2), (61, 1.21), (90, 1.25), (121, 1.22)]:
+            agg.add_tick(PAIR, price, T0 + offset)
+
+        before = sum(stub.stats["requests"].values())
+        bars = service._cached_minute_bars_batch([PAIR], "1", T0 - 3600, T0 + 150)[PAIR]
+        assert sum(stub.stats["requests"].values()) == before
+        assert bars.t[-2:].tolist() == [T0 + 60, T0 + 120]
+        assert bars.high[-2] == 1.25 and bars.close[-1] == 1.22
+        assert service.get_metrics()["tick_aggregator"]["live_pairs"] == 1
+    finally:
+        stub.shutdown()
+
+
+def test_committed_bar_keeps_upstream_volume():
+    cache = BarCache()
+    t = np.array([T0 - 60, T0], dtype=np.int64)
+    ones = np.ones(2)
+    # 上游已返回当前分钟（仍在形成中）的K线及其成交量
+    cache.put(PAIR, "1", Bars(t, ones, ones, ones, ones, np.array([5.0, 7.0])))
+    agg = TickBarAggregator(cache, FXCalendar())
+    agg.add_tick(PAIR, 1.1, T0 - 30)
+    agg.add_tick(PAIR, 1.2, T0 + 10)
+    assert agg.with_current_bar(PAIR, cache.peek(PAIR, "1"), T0, T0).volume[-1] == 7
+
+    agg.add_tick(PAIR, 1.3, T0 + 70)
+    bars = cache.peek(PAIR, "1")
+    assert bars.t[-1] == T0 and bars.close[-1] == 1.2
+    assert list(bars.volume) == [5.0, 7.0]
+    # 本地聚合的新K线没有成交量，重采样时按 0 计入
+    agg.add_tick(PAIR, 1.4, T0 + 130)
+    assert np.isnan(cache.peek(PAIR, "1").volume[-1])
@@ -0,0 +1,90 @@
+"""
+访问令牌单飞刷新测试
+运行：python -m pytest test_token_refresh.py
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from services.forex_service import IFindForexService
+from tools.ifind_stub import start_in_thread
+
+TOKEN_PATH = "/api/v1/get_access_token"
+
+
+def test_concurrent_callers_share_one_refresh():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService("stub-token", realtime_coalesce_window=0)
+        service.base_url = stub.url
+        fetch = service._fetch_access_token
+
+        def slow_fetch():
+            # 拉长刷新耗时，保证其余线程在刷新进行中到达
+            time.sleep(0.2)
+            return fetch()
+
+        service._fetch_access_token = slow_fetch
+        barrier = threading.Barrier(16)
+        tokens = []
+
+        def call():
+            barrier.wait()
+            tokens.append(service.get_access_token())
+
+        threads = [threading.Thread(target=call) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(tokens) == 16 and len(set(tokens)) == 1
+        assert stub.stats["requests"][TOKEN_PATH] == 1
+
+        # 令牌过期后只刷新一次
+        service.token_expires_at = datetime.now() - timedelta(seconds=1)
+        assert service.get_access_token() != tokens[0]
+        assert stub.stats["requests"][TOKEN_PATH] == 2
+    finally:
+        stub.shutdown()
+
+
+def test_waiters_see_refresh_failure():
+    service = IFindForexService("stub-token", realtime_coalesce_window=0)
+    service.base_url = "http://127.0.0.1:1"
+    errors = []
+
+    def call():
+        try:
+            service.get_access_token()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 4
+    assert not service._token_refreshing
+
+
+def test_background_refresher_renews_before_expiry():
+    stub = start_in_thread()
+    try:
+        service = IFindForexService("stub-token", realtime_coalesce_window=0)
+        service.base_url = stub.url
+        first = service.get_access_token()
+        # 距过期不足 lead_seconds，后台线程立即刷新
+        service.token_expires_at = datetime.now() + timedelta(seconds=60)
+        service.start_token_refresher(lead_seconds=300, retry_seconds=30)
+        try:
+            deadline = datetime.now() + timedelta(seconds=5)
+            while service.access_token == first and datetime.now() < deadline:
+                time.sleep(0.02)
+        finally:
+            service.stop_token_refresher()
+        assert service.access_token != first
+        assert service.token_expires_at > datetime.now() + timedelta(days=1)
+    finally:
+        stub.shutdown()
@@ -0,0 +1,90 @@
+"""
+历史K线回填：新部署冷启动时预先把历史分钟K线与日K线写入本地K线存储
+
+用法：
+    IFIND_REFRESH_TOKEN=... python -m tools.backfill USDCNY EURUSD --minute-days 60 --daily-years 5
+
+已写入的数据即断点，中断后重新运行只请求尚未写入的部分。
+"""
+
+import argparse
+import os
+import threading
+from services.backfill import BackfillJob, backfill_ranges
+from services.forex_service import IFindForexService
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bars"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发分块回填历史K线")
+    parser.add_argument("pairs", nargs="+", help="货币对，如 USDCNY EURUSD")
+    parser.add_argument("--minute-days", type=float, default=60, help="分钟K线天数")
+    parser.add_argument("--minute-interval", default="1", help="分钟K线周期")
+    parser.add_argument("--daily-years", type=float, default=5, help="日K线年数")
+    parser.add_argument("--workers", type=int, default=4, help="并发请求数")
+    parser.add_argument(
+        "--store-dir",
+        default=os.getenv("FOREX_BAR_STORE_DIR", DEFAULT_STORE_DIR),
+        help="K线存储目录",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=float(os.getenv("IFIND_RATE_LIMIT", 10)),
+        help="上游限流（次/秒）",
+    )
+    parser.add_argument("--base-url", help="同花顺接口地址（如本地接口替身）")
+    args = parser.parse_args()
+
+    service = IFindForexService(
+        os.getenv("IFIND_REFRESH_TOKEN", "your_refresh_token_here"),
+        pool_maxsize=max(args.workers, 4),
+        bar_store_dir=args.store_dir,
+        rate_limit=args.rate_limit,
+    )
+    if args.base_url:
+        service.base_url = args.base_url
+
+    pairs = [p if p.endswith(".FX") else f"{p}.FX" for p in args.pairs]
+    job = BackfillJob(
+        service,
+        pairs,
+        backfill_ranges(args.minute_days, args.daily_years, args.minute_interval),
+        workers=args.workers,
+    )
+
+    # 定期输出进度
+    done = threading.Event()
+
+    def report():
+        while not done.wait(5):
+            stats = job.get_stats()
+            print(
+                f"进度 {stats['chunks_committed']}/{stats['chunks_total']} 块，"
+                f"{stats['bars']} 根K线，{stats['requests']} 次请求"
+            )
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        stats = job.run()
+    except KeyboardInterrupt:
+        job.stop()
+        stats = job.get_stats()
+        print("已中断，重新运行可从已写入的位置继续")
+    finally:
+        done.set()
+
+    print(
+        f"完成 {stats['chunks_committed']}/{stats['chunks_total']} 块，"
+        f"失败 {stats['chunks_failed']} 块，{stats['bars']} 根K线，"
+        f"{stats['requests']} 次请求，用时 {stats['elapsed']}s"
+    )
+    for error in stats["errors"]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
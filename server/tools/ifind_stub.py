@@ -0,0 +1,541 @@
+"""
+同花顺 iFinD 接口本地替身，用于离线压测与基准测试
+
+实现 get_access_token、real_time_quotation、cmd_history_quotation、high_frequency
+四个接口，响应结构与同花顺一致（tables / thscode / table / time）。行情由货币对代码
+和时间确定性地生成：已收盘的K线无论何时请求都相同，各分钟周期K线均由同一组1分钟K线
+聚合得到。周六、周日不生成K线。
+
+用法：
+    python -m tools.ifind_stub --port 8700
+    python -m tools.ifind_stub --port 8700 --latency 0.05 --jitter 0.02 --error-rate 0.01
+
+然后将服务指向替身：
+    service = IFindForexService("any-token")
+    service.base_url = "http://127.0.0.1:8700"
+
+运行中可通过 POST /_stub/config 修改延迟与错误注入参数，GET /_stub/stats 查看请求统计。
+"""
+
+import argparse
+import calendar
+import json
+import random
+import secrets
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# 常见货币对的基准价格，其余代码由代码哈希生成
+BASE_PRICES = {
+    "USDCNY": 7.1,
+    "USDCNH": 7.1,
+    "EURUSD": 1.08,
+    "GBPUSD": 1.27,
+    "USDJPY": 150.0,
+    "AUDUSD": 0.66,
+    "USDCAD": 1.36,
+    "USDCHF": 0.88,
+    "EURCNY": 7.7,
+    "JPYCNY": 0.047,
+}
+
+# 延迟与错误注入的默认参数
+DEFAULT_CONFIG = {
+    "latency": 0.0,  # 每个数据请求的固定延迟（秒）
+    "jitter": 0.0,  # 额外的随机延迟上限（秒）
+    "error_rate": 0.0,  # 返回 500 的概率
+    "timeout_rate": 0.0,  # 挂起 hang 秒后才响应的概率（模拟上游超时）
+    "hang": 30.0,
+    "max_rps": 0.0,  # 每秒最多处理的数据请求数，超出返回 429，0 表示不限
+    "token_ttl": 7 * 24 * 3600,
+    "seed": 0,
+}
+
+_KLINE_INTERVALS = ("D", "W", "M", "Q", "Y")
+
+
+def _hash_unit(keys, seed):
+    """将整数数组确定性地映射到 [-1, 1)（splitmix64）"""
+    with np.errstate(over="ignore"):
+        x = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(seed)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) * 2 - 1
+
+
+def _code_seed(code):
+    return zlib.crc32(code.encode("utf-8"))
+
+
+def base_price(code):
+    """货币对的基准价格"""
+    pair = code.split(".")[0].upper()
+    if pair in BASE_PRICES:
+        return BASE_PRICES[pair]
+    return 0.5 + _code_seed(code) % 1500 / 1000
+
+
+def price_at(code, ts):
+    """
+    代码在各时刻的合成价格
+    Args:
+        code: 同花顺代码
+        ts: 秒级时间戳数组（本地时间按 UTC 换算，与服务端一致）
+    Returns:
+        float64 价格数组
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    seed = _code_seed(code)
+    phase = seed % 1000 / 1000 * 2 * np.pi
+    # 周、日、小时级别的平滑波动
+    smooth = (
+        0.01 * np.sin(2 * np.pi * ts / (7 * 86400) + phase)
+        + 0.003 * np.sin(2 * np.pi * ts / 86400 + 2 * phase)
+        + 0.001 * np.sin(2 * np.pi * ts / 5820 + 3 * phase)
+    )
+    # 分钟级噪声，分钟之间线性插值，保证价格随时间连续变化
+    minute = np.floor(ts / 60)
+    frac = ts / 60 - minute
+    n0 = _hash_unit(minute.astype(np.int64), seed)
+    n1 = _hash_unit(minute.astype(np.int64) + 1, seed)
+    noise = 0.0004 * (n0 + (n1 - n0) * frac)
+    return base_price(code) * (1 + smooth + noise)
+
+
+def trading_mask(ts):
+    """是否为交易时间：周六、周日休市"""
+    weekday = (np.asarray(ts, dtype=np.int64) // 86400 + 3) % 7  # 1970-01-01 为周四
+    return weekday < 5
+
+
+def minute_bars(code, start_ts, end_ts, interval=1, now_ts=None):
+    """
+    生成 [start_ts, end_ts] 内开始的 interval 分钟K线（不含周末和未来时间）
+    多分钟K线由1分钟K线聚合得到，与服务端从1分钟K线重采样的结果一致
+    Returns:
+        (开始时间戳数组, {open, high, low, close, volume} 数组字典)
+    """
+    step = interval * 60
+    now_ts = int(now_ts if now_ts is not None else _now_ts())
+    first = -(-int(start_ts) // step) * step
+    last = min(int(end_ts), now_ts) // step * step
+    minutes = np.arange(first, min(last + step, now_ts + 1), 60, dtype=np.int64)
+    minutes = minutes[trading_mask(minutes)]
+
+    # 1分钟K线：开盘为分钟开始时的价格，收盘为分钟结束（未收盘时为当前）时的价格
+    points = np.minimum(minutes[:, None] + np.array([0, 20, 40, 60]), now_ts)
+    prices = price_at(code, points)
+    seed = _code_seed(code)
+    spread = base_price(code) * 0.0001 * np.abs(_hash_unit(minutes // 60, seed + 1))
+    columns = {
+        "open": prices[:, 0],
+        "high": prices.max(axis=1) + spread,
+        "low": prices.min(axis=1) - spread,
+        "close": prices[:, -1],
+        "volume": np.floor(1000 + 500 * np.abs(_hash_unit(minutes, seed + 2))),
+    }
+    if interval == 1 or not len(minutes):
+        return minutes, columns
+
+    keys = minutes // step
+    first_idx = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    last_idx = np.concatenate((first_idx[1:] - 1, [len(keys) - 1]))
+    return keys[first_idx] * step, {
+        "open": columns["open"][first_idx],
+        "high": np.maximum.reduceat(columns["high"], first_idx),
+        "low": np.minimum.reduceat(columns["low"], first_idx),
+        "close": columns["close"][last_idx],
+        "volume": np.add.reduceat(columns["volume"], first_idx),
+    }
+
+
+def daily_bars(code, start_ts, end_ts, now_ts=None):
+    """生成 [start_ts, end_ts] 内的日K线（按小时取点计算高低价），不含周末"""
+    now_ts = int(now_ts if now_ts is not None else _now_ts())
+    days = np.arange(int(start_ts) // 86400, min(end_ts, now_ts) // 86400 + 1)
+    starts = days * 86400
+    starts = starts[trading_mask(starts)]
+    points = starts[:, None] + np.arange(25, dtype=np.int64)[None, :] * 3600
+    points = np.minimum(points, now_ts)
+    prices = price_at(code, points)
+    seed = _code_seed(code)
+    spread = base_price(code) * 0.001 * np.abs(_hash_unit(starts // 86400, seed + 3))
+    columns = {
+        "open": prices[:, 0],
+        "high": prices.max(axis=1) + spread,
+        "low": prices.min(axis=1) - spread,
+        "close": prices[:, -1],
+        "volume": np.floor(100000 + 50000 * np.abs(_hash_unit(starts, seed + 4))),
+    }
+    return starts, columns
+
+
+def period_bars(code, start_ts, end_ts, interval="D", now_ts=None):
+    """生成日/周/月/季/年K线，周期K线的时间为该周期最后一个交易日"""
+    starts, columns = daily_bars(code, start_ts, end_ts, now_ts)
+    if interval == "D" or not len(starts):
+        return starts, columns
+
+    days = starts // 86400
+    if interval == "W":
+        keys = (days + 3) // 7  # 周一为一周的开始
+    else:
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        keys = {"M": months, "Q": months // 3, "Y": months // 12}[interval]
+
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    first = np.concatenate(([0], boundaries))
+    last = np.concatenate((boundaries - 1, [len(keys) - 1]))
+    grouped = {
+        "open": columns["open"][first],
+        "high": np.maximum.reduceat(columns["high"], first),
+        "low": np.minimum.reduceat(columns["low"], first),
+        "close": columns["close"][last],
+        "volume": np.add.reduceat(columns["volume"], first),
+    }
+    return starts[last], grouped
+
+
+def _now_ts():
+    """当前本地时间按 UTC 换算的时间戳（与服务端 to_epoch 一致）"""
+    return calendar.timegm(datetime.now().timetuple())
+
+
+def _parse_ts(text, fmt):
+    return calendar.timegm(datetime.strptime(text, fmt).timetuple())
+
+
+def _format_times(starts, unit):
+    """时间戳数组格式化为同花顺的时间字符串"""
+    text = np.datetime_as_string(
+        starts.astype("datetime64[s]").astype(f"datetime64[{unit}]")
+    )
+    return [t.replace("T", " ") for t in text.tolist()]
+
+
+def _sma(values, period):
+    out = np.full(len(values), np.nan)
+    if period > 0 and len(values) >= period:
+        csum = np.cumsum(np.concatenate(([0.0], values)))
+        out[period - 1 :] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def _ema(values, period):
+    out = np.empty(len(values))
+    alpha = 2.0 / (period + 1)
+    for i, v in enumerate(values):
+        out[i] = v if i == 0 else alpha * v + (1 - alpha) * out[i - 1]
+    return out
+
+
+def _calculated_column(name, params, close):
+    """high_frequency 接口 calculate 参数的简化实现：支持 MA/EMA，其余指标返回空值"""
+    try:
+        period = int(str(params).split(",")[0])
+    except ValueError:
+        period = 20
+    if name.upper() == "MA":
+        return _sma(close, period)
+    if name.upper() == "EMA":
+        return _ema(close, period)
+    return np.full(len(close), np.nan)
+
+
+def _column_list(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, np.round(values, 6)).tolist()
+
+
+class IFindStubServer(ThreadingHTTPServer):
+    """同花顺接口替身服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address, **config):
+        super().__init__(address, _StubHandler)
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update({k: v for k, v in config.items() if v is not None})
+        self.tokens = set()
+        self.lock = threading.Lock()
+        self.random = random.Random(self.config["seed"])
+        self.stats = {"requests": {}, "statuses": {}}
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def update_config(self, values):
+        with self.lock:
+            for key, value in values.items():
+                if key in DEFAULT_CONFIG:
+                    self.config[key] = float(value)
+            if "seed" in values:
+                self.random.seed(values["seed"])
+            return dict(self.config)
+
+    def record(self, path, status):
+        with self.lock:
+            requests = self.stats["requests"]
+            requests[path] = requests.get(path, 0) + 1
+            statuses = self.stats["statuses"]
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def inject(self):
+        """
+        按配置注入延迟与错误
+        Returns:
+            需要返回的错误状态码，None 表示正常处理
+        """
+        with self.lock:
+            config = dict(self.config)
+            roll = self.random.random()
+            jitter = self.random.random() * config["jitter"]
+            throttled = False
+            if config["max_rps"] > 0:
+                now = time.monotonic()
+                if now - self._window_start >= 1:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                throttled = self._window_count > config["max_rps"]
+
+        if throttled:
+            return 429
+        delay = config["latency"] + jitter
+        if roll < config["timeout_rate"]:
+            delay = config["hang"]
+        if delay > 0:
+            time.sleep(delay)
+        if (
+            config["timeout_rate"]
+            <= roll
+            < config["timeout_rate"] + config["error_rate"]
+        ):
+            return 500
+        return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # 先计数再响应，客户端收到响应时统计已包含该请求
+        self.server.record(self.path, status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, errcode, message):
+        self._reply(status, {"errorcode": errcode, "errmsg": message})
+
+    def do_GET(self):
+        if self.path == "/_stub/stats":
+            with self.server.lock:
+                payload = json.loads(json.dumps(self.server.stats))
+            return self._reply(200, payload)
+        self._error(404, -1, "not found")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._error(400, -4001, "invalid json")
+
+        if self.path == "/_stub/config":
+            return self._reply(200, self.server.update_config(body))
+        if self.path == "/api/v1/get_access_token":
+            return self._access_token()
+
+        handlers = {
+            "/api/v1/real_time_quotation": self._real_time_quotation,
+            "/api/v1/cmd_history_quotation": self._cmd_history_quotation,
+            "/api/v1/high_frequency": self._high_frequency,
+        }
+        handler = handlers.get(self.path)
+        if handler is None:
+            return self._error(404, -1, "not found")
+        if self.headers.get("access_token") not in self.server.tokens:
+            return self._error(401, -1302, "access_token is invalid")
+
+        status = self.server.inject()
+        if status is not None:
+            return self._error(status, -1, f"injected error {status}")
+        try:
+            codes = [c for c in str(body.get("codes", "")).split(",") if c]
+            if not codes:
+                return self._error(400, -4001, "codes is required")
+            self._reply(
+                200, {"errorcode": 0, "errmsg": "", "tables": handler(codes, body)}
+            )
+        except (KeyError, ValueError) as e:
+            self._error(400, -4001, f"invalid parameter: {e}")
+
+    def _access_token(self):
+        if not self.headers.get("refresh_token"):
+            return self._error(401, -1301, "refresh_token is required")
+        token = secrets.token_hex(16)
+        expire_at = datetime.now() + timedelta(seconds=self.server.config["token_ttl"])
+        with self.server.lock:
+            self.server.tokens.add(token)
+        self._reply(
+            200,
+            {
+                "errorcode": 0,
+                "errmsg": "Success!",
+                "data": {
+                    "access_token": token,
+                    "expire_at": expire_at.strftime("%Y-%m-%d %H:%M:%S"),
+                },
+            },
+        )
+
+    def _real_time_quotation(self, codes, body):
+        indicators = str(body.get("indicators") or "latest").split(",")
+        now_ts = _now_ts()
+        day_start = now_ts // 86400 * 86400
+        tables = []
+        for code in codes:
+            _, day = minute_bars(code, day_start, now_ts, 1, now_ts)
+            latest = float(price_at(code, [now_ts])[0])
+            pre_close = float(price_at(code, [day_start])[0])
+            values = {
+                "latest": latest,
+                "open": float(day["open"][0]) if len(day["open"]) else latest,
+                "high": float(day["high"].max()) if len(day["high"]) else latest,
+                "low": float(day["low"].min()) if len(day["low"]) else latest,
+                "preClose": pre_close,
+                "change": latest - pre_close,
+                "changeRatio": (latest / pre_close - 1) * 100,
+                "volume": float(day["volume"].sum()),
+            }
+            tables.append(
+                {
+                    "thscode": code,
+                    "time": _format_times(np.array([now_ts]), "s"),
+                    "table": {
+                        name: [round(values[name], 6) if name in values else None]
+                        for name in indicators
+                    },
+                }
+            )
+        return tables
+
+    def _cmd_history_quotation(self, codes, body):
+        indicators = str(body.get("indicators") or "close").split(",")
+        interval = (body.get("functionpara") or {}).get("Interval", "D")
+        if interval not in _KLINE_INTERVALS:
+            raise ValueError(f"Interval={interval}")
+        start_ts = _parse_ts(body["startdate"], "%Y-%m-%d")
+        end_ts = _parse_ts(body["enddate"], "%Y-%m-%d") + 86399
+
+        tables = []
+        for code in codes:
+            starts, columns = period_bars(code, start_ts, end_ts, interval)
+            close = columns["close"]
+            prev = np.concatenate((columns["open"][:1], close[:-1]))
+            columns["amount"] = columns["volume"] * close
+            columns["changeRatio"] = (close / prev - 1) * 100 if len(close) else close
+            tables.append(
+                {
+                    "thscode": code,
+                    "time": _format_times(starts, "D"),
+                    "table": {
+                        name: _column_list(columns[name])
+                        for name in indicators
+                        if name in columns
+                    },
+                }
+            )
+        return tables
+
+    def _high_frequency(self, codes, body):
+        indicators = str(body.get("indicators") or "close").split(",")
+        para = body.get("functionpara") or {}
+        interval = int(para.get("Interval", 1))
+        start_ts = _parse_ts(body["starttime"], "%Y-%m-%d %H:%M:%S")
+        end_ts = _parse_ts(body["endtime"], "%Y-%m-%d %H:%M:%S")
+
+        tables = []
+        for code in codes:
+            starts, columns = minute_bars(code, start_ts, end_ts, interval)
+            columns["latest"] = columns["close"]
+            table = {}
+            for name in indicators:
+                if name in columns:
+                    table[name] = _column_list(columns[name])
+                elif name in (para.get("calculate") or {}):
+                    params = para["calculate"][name]
+                    column = _calculated_column(name, params, columns["close"])
+                    table[name] = _column_list(column)
+            tables.append(
+                {"thscode": code, "time": _format_times(starts, "m"), "table": table}
+            )
+        return tables
+
+
+def make_server(host="127.0.0.1", port=0, **config):
+    """创建替身服务（未启动），port 为 0 时自动分配端口"""
+    return IFindStubServer((host, port), **config)
+
+
+def start_in_thread(host="127.0.0.1", port=0, **config):
+    """在后台线程中启动替身服务，返回服务对象（server.url 为访问地址）"""
+    server = make_server(host, port, **config)
+    threading.Thread(
+        target=server.serve_forever, name="ifind-stub", daemon=True
+    ).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同花顺 iFinD 接口本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, help="返回 500 的概率")
+    parser.add_argument("--timeout-rate", type=float, help="挂起不响应的概率")
+    parser.add_argument("--hang", type=float, help="挂起的秒数")
+    parser.add_argument("--max-rps", type=float, help="每秒最多处理的请求数")
+    parser.add_argument("--seed", type=int, help="错误注入随机数种子")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang=args.hang,
+        max_rps=args.max_rps,
+        seed=args.seed,
+    )
+    print(f"同花顺接口替身已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
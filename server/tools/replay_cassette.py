@@ -0,0 +1,91 @@
+"""
+按录制时的请求节奏回放 cassette，用于复现线上性能问题与回归基准
+
+用法：
+    python -m tools.replay_cassette cassette.jsonl.gz --speed 4
+
+每条录制请求在 t / speed 时刻经 IFindForexService._post 发出（含熔断、限流与连接池），
+上游响应由回放模式的 cassette 提供，不需要网络连接。
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.cassette import TOKEN_PATH, load_cassette
+from services.forex_service import IFindForexService
+
+
+def replay_schedule(service: IFindForexService, entries, speed: float = 1.0):
+    """
+    按录制时间表并发重放请求
+    Args:
+        service: 回放模式的服务实例
+        entries: cassette 记录
+        speed: 回放倍速，0 表示不等待、尽快发出全部请求
+    Returns:
+        各请求的耗时（秒）与失败数
+    """
+    entries = [e for e in entries if e["path"] != TOKEN_PATH]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run(entry):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            with service.upstream_lane(entry.get("lane") or "chart"):
+                service._post(entry["path"], entry["body"], "回放请求失败")
+        except Exception:
+            with lock:
+                errors += 1
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=service.pool_maxsize) as pool:
+        for entry in entries:
+            if speed > 0:
+                delay = entry["t"] / speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(run, entry)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按录制节奏回放同花顺接口 cassette")
+    parser.add_argument("cassette", help="录制文件路径（.jsonl.gz）")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，0 为不等待")
+    parser.add_argument("--rate-limit", type=float, default=0, help="上游限流（次/秒）")
+    parser.add_argument("--pool-maxsize", type=int, default=20, help="连接池大小")
+    args = parser.parse_args()
+
+    service = IFindForexService(
+        "replay",
+        replay_cassette=args.cassette,
+        replay_speed=args.speed,
+        rate_limit=args.rate_limit,
+        pool_maxsize=args.pool_maxsize,
+    )
+    entries = load_cassette(args.cassette)
+    start = time.perf_counter()
+    latencies, errors = replay_schedule(service, entries, args.speed)
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print("cassette 中没有可回放的请求")
+        return
+    ms = np.array(latencies) * 1000
+    print(f"回放 {len(latencies)} 个请求，失败 {errors} 个，用时 {elapsed:.2f}s")
+    print(
+        f"耗时 p50 {np.percentile(ms, 50):.1f}ms  p99 {np.percentile(ms, 99):.1f}ms  "
+        f"max {ms.max():.1f}ms"
+    )
+    print(f"cassette: {service.cassette.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import numpy as np
+
+# K线数据的列式表示：t 为 int64 时间戳（秒，按服务器本地时间直接换算，不做时区转换），
+# 其余各列为 float64 数组，缺失值用 NaN 表示
+Bars = namedtuple("Bars", ["t", "open", "high", "low", "close", "volume"])
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def empty_bars():
+    """
+    创建空的K线数据
+    Returns:
+        不含任何数据的 Bars
+    """
+    return Bars(np.empty(0, dtype=np.int64), *(np.empty(0) for _ in PRICE_FIELDS))
+
+
+def to_epoch(dt):
+    """
+    将本地时间转换为秒级时间戳
+    Args:
+        dt: datetime 对象
+    Returns:
+        int 时间戳
+    """
+    return int((dt - _EPOCH).total_seconds())
+
+
+def from_epoch(ts):
+    """
+    将秒级时间戳转换为本地时间
+    Args:
+        ts: int 时间戳
+    Returns:
+        datetime 对象
+    """
+    return _EPOCH + timedelta(seconds=int(ts))
+
+
+def to_float_array(values, size):
+    """将可能包含 None 的列表转换为长度为 size 的 float64 数组"""
+    arr = np.full(size, np.nan)
+    if values:
+        n = min(len(values), size)
+        arr[:n] = np.array(values[:n], dtype=float)
+    return arr
+
+
+def time_keys(times):
+    """
+    将时间字符串数组转换为可排序的键：能解析时为 int64 时间戳，否则保留字符串
+    Args:
+        times: 时间字符串数组
+    Returns:
+        与 times 等长的数组
+    """
+    try:
+        return np.array(times, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        return np.array(times, dtype=str)
+
+
+def bars_from_table(time_arr, table):
+    """
+    将同花顺接口返回的单个 table 转换为列式K线数据
+    Args:
+        time_arr: 时间字符串列表
+        table: 各指标数据字典（open/high/low/close/latest/volume）
+    Returns:
+        按时间升序排列的 Bars
+    """
+    if not time_arr:
+        return empty_bars()
+
+    size = len(time_arr)
+    t = np.array(time_arr, dtype="datetime64[s]").astype(np.int64)
+    closes = table.get("latest") or table.get("close")
+    bars = Bars(
+        t,
+        to_float_array(table.get("open"), size),
+        to_float_array(table.get("high"), size),
+        to_float_array(table.get("low"), size),
+        to_float_array(closes, size),
+        to_float_array(table.get("volume"), size),
+    )
+    return sort_bars(bars)
+
+
+def bars_from_raw(raw_data):
+    """
+    将同花顺接口响应转换为列式K线数据
+    Args:
+        raw_data: 接口返回的 JSON（包含 tables 字段）
+    Returns:
+        {thscode: Bars} 字典
+    """
+    result = {}
+    if not raw_data or not raw_data.get("tables"):
+        return result
+
+    for tbl in raw_data["tables"]:
+        result[tbl.get("thscode", "")] = bars_from_table(
+            tbl.get("time", []), tbl.get("table", {})
+        )
+    return result
+
+
+# 一天内各分钟的 " HH:MM" 字符串
+_MINUTE_LABELS = np.array(
+    [f" {h:02d}:{m:02d}" for h in range(24) for m in range(60)], dtype=object
+)
+
+
+def format_times(t, time_unit="m"):
+    """
+    将时间戳数组格式化为同花顺接口使用的时间字符串
+    日期部分只对不重复的日期格式化一次，分钟部分查表拼接
+    Args:
+        t: int64 时间戳数组
+        time_unit: 时间精度，"m" 输出到分钟，"D" 只输出日期
+    Returns:
+        时间字符串列表
+    """
+    t = np.asarray(t, dtype=np.int64)
+    if time_unit not in ("m", "D"):
+        times = np.datetime_as_string(t.astype("datetime64[s]"), unit=time_unit)
+        return np.char.replace(times, "T", " ").tolist()
+
+    days, seconds = np.divmod(t, 86400)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    labels = np.datetime_as_string(unique_days.astype("datetime64[D]"), unit="D")
+    labels = labels.astype(object)[inverse]
+    if time_unit == "m":
+        labels = labels + _MINUTE_LABELS[seconds // 60]
+    return labels.tolist()
+
+
+def rows_from_columns(times, columns):
+    """
+    将时间与若干数据列组装为行格式 [[时间, 列1, 列2, ...], ...]
+    Args:
+        times: 时间字符串数组
+        columns: 形状为 (列数, 行数) 的 float64 数组
+    Returns:
+        行列表，数值为 Python float
+    """
+    rows = np.empty((len(times), len(columns) + 1), dtype=object)
+    rows[:, 0] = times
+    rows[:, 1:] = np.asarray(columns).T
+    return rows.tolist()
+
+
+def chart_columns(opens, closes, lows, highs, volumes, chart_type="line"):
+    """
+    选取图表需要的数据列并过滤缺失值
+    Args:
+        opens/closes/lows/highs/volumes: 等长 float64 数组，缺失值为 NaN（line 只使用 closes）
+        chart_type: line 只保留收盘价；kline 保留 [开, 收, 低, 高, 量]，成交量缺失按 0 计
+    Returns:
+        (valid, columns)：valid 为有效行的布尔掩码，columns 为过滤后的 (列数, 行数) 数组
+    """
+    if chart_type == "kline":
+        columns = np.vstack([opens, closes, lows, highs, np.nan_to_num(volumes)])
+        valid = ~np.isnan(columns[:4]).any(axis=0)
+    else:
+        columns = np.asarray(closes)[np.newaxis]
+        valid = ~np.isnan(columns[0])
+    return valid, columns[:, valid]
+
+
+def format_bars(bars, chart_type="line", time_unit="m"):
+    """
+    将按时间升序排列的列式K线直接格式化为图表数据
+    结果与先转换为接口响应结构再格式化一致，但省去中间的列表转换与时间解析
+    Args:
+        bars: Bars
+        chart_type: line 输出 [时间, 价格]；kline 输出 [时间, 开, 收, 低, 高, 量]
+        time_unit: 时间精度
+    Returns:
+        行列表
+    """
+    valid, columns = chart_columns(
+        bars.open, bars.close, bars.low, bars.high, bars.volume, chart_type
+    )
+    return rows_from_columns(format_times(bars.t[valid], time_unit), columns)
+
+
+def columns_to_raw(thscode, t, columns, time_unit="m"):
+    """
+    将时间戳与若干数据列组装为同花顺接口的响应结构，NaN 输出为 None
+    Args:
+        thscode: 同花顺代码
+        t: int64 时间戳数组
+        columns: {列名: float64 数组}
+        time_unit: 时间精度
+    Returns:
+        包含 tables 字段的字典
+    """
+    table = {
+        name: np.where(np.isnan(col), None, col).tolist()
+        for name, col in columns.items()
+    }
+    return {
+        "tables": [
+            {
+                "thscode": thscode,
+                "time": format_times(t, time_unit),
+                "table": table,
+            }
+        ]
+    }
+
+
+def bars_to_raw(thscode, bars, time_unit="m"):
+    """
+    将列式K线数据还原为同花顺接口的响应结构，便于复用现有格式化逻辑
+    Args:
+        thscode: 同花顺代码
+        bars: Bars
+        time_unit: 时间精度，"m" 输出到分钟，"D" 只输出日期
+    Returns:
+        包含 tables 字段的字典
+    """
+    raw = columns_to_raw(
+        thscode,
+        bars.t,
+        {field: getattr(bars, field) for field in PRICE_FIELDS},
+        time_unit,
+    )
+    table = raw["tables"][0]["table"]
+    table["latest"] = table["close"]
+    return raw
+
+
+class BarsBuffer:
+    """按时间顺序追加K线的预分配列式缓冲区
+
+    分段获取的K线依次追加，与已写入部分重叠的K线（时间戳不晚于最后一根）被跳过，
+    各段数据拷贝后即可释放，内存占用只取决于最终的K线数量。
+    """
+
+    def __init__(self, capacity: int):
+        self._cols = [np.empty(capacity, dtype=np.int64)] + [
+            np.empty(capacity) for _ in PRICE_FIELDS
+        ]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, bars):
+        """追加一段按时间升序排列的K线"""
+        if self._size:
+            bars = slice_bars(bars, int(self._cols[0][self._size - 1]) + 1)
+        n = len(bars.t)
+        if not n:
+            return
+        if self._size + n > len(self._cols[0]):
+            capacity = max(self._size + n, 2 * len(self._cols[0]))
+            for col in self._cols:
+                col.resize(capacity, refcheck=False)
+        for col, values in zip(self._cols, bars):
+            col[self._size : self._size + n] = values
+        self._size += n
+
+    def to_bars(self):
+        """
+        收缩到已写入的长度（原地释放多余的预分配空间），之后不应再追加
+        Returns:
+            已写入的 Bars
+        """
+        for col in self._cols:
+            col.resize(self._size, refcheck=False)
+        return Bars(*self._cols)
+
+
+def drop_missing(bars):
+    """
+    去除收盘价缺失的K线
+    Args:
+        bars: Bars
+    Returns:
+        收盘价均有效的 Bars
+    """
+    mask = ~np.isnan(bars.close)
+    if mask.all():
+        return bars
+    return Bars(*(col[mask] for col in bars))
+
+
+def sort_bars(bars):
+    """
+    按时间升序排列并去除重复时间戳（重复时保留靠后的记录）
+    Args:
+        bars: Bars
+    Returns:
+        有序且时间戳唯一的 Bars
+    """
+    if len(bars.t) == 0:
+        return bars
+
+    # 反转后 np.unique 返回的是每个时间戳最后一次出现的位置
+    rev_t = bars.t[::-1]
+    _, rev_idx = np.unique(rev_t, return_index=True)
+    idx = len(bars.t) - 1 - rev_idx
+    return Bars(*(col[idx] for col in bars))
+
+
+def merge_bars(old, new):
+    """
+    合并两段K线数据，同一时间戳以新数据为准
+    Args:
+        old: 已缓存的 Bars
+        new: 新获取的 Bars
+    Returns:
+        合并后的 Bars
+    """
+    if len(old.t) == 0:
+        return new
+    if len(new.t) == 0:
+        return old
+    return sort_bars(Bars(*(np.concatenate(cols) for cols in zip(old, new))))
+
+
+def slice_bars(bars, start_ts=None, end_ts=None):
+    """
+    截取时间范围 [start_ts, end_ts] 内的K线
+    Args:
+        bars: Bars
+        start_ts: 起始时间戳（含），None 表示不限
+        end_ts: 结束时间戳（含），None 表示不限
+    Returns:
+        截取后的 Bars
+    """
+    lo = 0 if start_ts is None else np.searchsorted(bars.t, start_ts, side="left")
+    hi = len(bars.t) if end_ts is None else np.searchsorted(bars.t, end_ts, "right")
+    return Bars(*(col[lo:hi] for col in bars))
+
+
+def tail_bars(bars, count):
+    """
+    取最近的 count 根K线
+    Args:
+        bars: Bars
+        count: 数量
+    Returns:
+        截取后的 Bars
+    """
+    return Bars(*(col[-count:] if count > 0 else col[:0] for col in bars))
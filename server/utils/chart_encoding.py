@@ -0,0 +1,117 @@
+import numpy as np
+from utils.bar_utils import chart_columns, time_keys, to_float_array
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时不支持二进制格式
+    msgpack = None
+
+# 响应格式：json 为默认的行格式，columnar 为列式 JSON，msgpack 为列式二进制
+RESPONSE_FORMATS = ("json", "columnar", "msgpack")
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+# 图表列名：时间、开、高、低、收、量
+CHART_COLUMN_NAMES = ("o", "c", "l", "h", "v")
+
+
+def negotiate_format(format_param=None, accept_mimetypes=None):
+    """
+    确定响应格式：format 查询参数优先，其次按 Accept 请求头，默认 json
+    Args:
+        format_param: format 查询参数
+        accept_mimetypes: Flask 的 request.accept_mimetypes
+    Returns:
+        RESPONSE_FORMATS 之一
+    """
+    if format_param:
+        if format_param not in RESPONSE_FORMATS:
+            raise ValueError(f"不支持的响应格式: {format_param}")
+        return format_param
+    if accept_mimetypes is not None:
+        best = accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES)
+        if best in MSGPACK_MIMETYPES:
+            return "msgpack"
+    return "json"
+
+
+def bars_to_columns(bars, chart_type="line"):
+    """
+    将列式K线转换为图表列：分时线只有收盘价 c，K线为 o/c/l/h/v，缺失值所在行被过滤
+    Args:
+        bars: Bars
+        chart_type: line 或 kline
+    Returns:
+        (t, {列名: float64 数组})
+    """
+    valid, columns = chart_columns(
+        bars.open, bars.close, bars.low, bars.high, bars.volume, chart_type
+    )
+    names = CHART_COLUMN_NAMES if chart_type == "kline" else ("c",)
+    return bars.t[valid], dict(zip(names, columns))
+
+
+def raw_to_columns(raw_data):
+    """
+    将同花顺接口响应（首个 table）转换为列
+    Args:
+        raw_data: 包含 tables 字段的字典
+    Returns:
+        (t, {列名: float64 数组})，缺失值为 NaN
+    """
+    tables = (raw_data or {}).get("tables") or []
+    if not tables or not tables[0].get("time"):
+        return np.empty(0, dtype=np.int64), {}
+
+    time_arr = tables[0]["time"]
+    size = len(time_arr)
+    columns = {
+        name: to_float_array(values, size)
+        for name, values in tables[0].get("table", {}).items()
+    }
+    return time_keys(time_arr), columns
+
+
+def encode_columns(t, columns, binary=False):
+    """
+    编码列式数据
+    Args:
+        t: int64 时间戳数组（秒，按服务器本地时间换算）
+        columns: {列名: float64 数组}
+        binary: True 时各列编码为小端字节串（t 为 int64，其余为 float64，缺失值为 NaN）；
+                False 时编码为列表（缺失值为 None）
+    Returns:
+        {"t": ..., 列名: ...} 字典
+    """
+    if binary:
+        encoded = {"t": np.asarray(t, dtype="<i8").tobytes()}
+        for name, col in columns.items():
+            encoded[name] = np.asarray(col, dtype="<f8").tobytes()
+        return encoded
+
+    encoded = {"t": np.asarray(t, dtype=np.int64).tolist()}
+    for name, col in columns.items():
+        col = np.asarray(col, dtype=np.float64)
+        encoded[name] = np.where(np.isnan(col), None, col).tolist()
+    return encoded
+
+
+def decode_columns(encoded):
+    """
+    解码 encode_columns(binary=True) 的结果
+    Returns:
+        (t, {列名: float64 数组})
+    """
+    t = np.frombuffer(encoded["t"], dtype="<i8")
+    columns = {
+        name: np.frombuffer(value, dtype="<f8")
+        for name, value in encoded.items()
+        if name != "t"
+    }
+    return t, columns
+
+
+def pack(payload):
+    """将响应序列化为 msgpack"""
+    if msgpack is None:
+        raise RuntimeError("未安装 msgpack，无法使用二进制响应格式")
+    return msgpack.packb(payload, use_bin_type=True)
@@ -0,0 +1,159 @@
+import numpy as np
+from utils.bar_utils import Bars, empty_bars
+
+# 优先作为中间货币的币种
+BRIDGE_CURRENCIES = ("USD", "EUR")
+
+
+def split_pair(code: str):
+    """
+    拆分货币对代码
+    Args:
+        code: 同花顺代码，如 EURJPY.FX
+    Returns:
+        (基准货币, 计价货币)，不是六位货币对代码时返回 None
+    """
+    name = code.split(".")[0].upper()
+    if len(name) != 6 or not name.isalpha():
+        return None
+    return name[:3], name[3:]
+
+
+def _leg(base: str, quote: str, available):
+    """base/quote 汇率对应的已有货币对：(代码, 是否取倒数)"""
+    if f"{base}{quote}.FX" in available:
+        return f"{base}{quote}.FX", False
+    if f"{quote}{base}.FX" in available:
+        return f"{quote}{base}.FX", True
+    return None
+
+
+def find_legs(code: str, available):
+    """
+    寻找可以换算出 code 的已有货币对
+    Args:
+        code: 交叉汇率代码，如 EURJPY.FX
+        available: 已有数据的同花顺代码集合
+    Returns:
+        [(代码, 是否取倒数), ...]，相乘即为 code 的汇率：
+        直接取倒数时为一项（如 CNYUSD 由 USDCNY），经中间货币时为两项
+        （如 EURJPY = EURUSD × USDJPY）；无法换算时返回 None
+
+    含美元的货币对都有上游直接报价，只允许由其反向货币对取倒数，不经中间货币换算，
+    避免直盘被换算值长期替代。
+    """
+    currencies = split_pair(code)
+    if currencies is None:
+        return None
+    base, quote = currencies
+    inverse = _leg(quote, base, available)
+    if inverse is not None:
+        return [(inverse[0], not inverse[1])]
+    if "USD" in (base, quote):
+        return None
+
+    bridges = set()
+    for pair in available:
+        bridges.update(split_pair(pair) or ())
+    bridges -= {base, quote}
+    for bridge in sorted(
+        bridges,
+        key=lambda c: (BRIDGE_CURRENCIES.index(c) if c in BRIDGE_CURRENCIES else 9, c),
+    ):
+        first = _leg(base, bridge, available)
+        second = _leg(bridge, quote, available)
+        if first and second:
+            return [first, second]
+    return None
+
+
+def invert_bars(bars):
+    """取倒数：开/收取倒数，最高价为原最低价的倒数，最低价为原最高价的倒数"""
+    with np.errstate(divide="ignore"):
+        return Bars(
+            bars.t,
+            1 / bars.open,
+            1 / bars.low,
+            1 / bars.high,
+            1 / bars.close,
+            bars.volume,
+        )
+
+
+def multiply_bars(a, b):
+    """
+    两段K线按时间戳对齐后相乘
+    两边的最高价未必出现在同一时刻，最高价之积是交叉汇率最高价的上界、最低价之积是下界，
+    再保证最高/最低价包含开盘价与收盘价。成交量没有意义，置为 NaN
+    """
+    t, ia, ib = np.intersect1d(a.t, b.t, assume_unique=True, return_indices=True)
+    open_ = a.open[ia] * b.open[ib]
+    close = a.close[ia] * b.close[ib]
+    return Bars(
+        t,
+        open_,
+        np.fmax(a.high[ia] * b.high[ib], np.fmax(open_, close)),
+        np.fmin(a.low[ia] * b.low[ib], np.fmin(open_, close)),
+        close,
+        np.full(len(t), np.nan),
+    )
+
+
+def synthesize_bars(legs, bars_by_code):
+    """
+    由各腿的K线换算交叉汇率K线
+    Args:
+        legs: find_legs 的结果
+        bars_by_code: {同花顺代码: Bars}
+    Returns:
+        交叉汇率的 Bars（只保留各腿都有数据的时间戳）
+    """
+    result = None
+    for code, inverted in legs:
+        bars = bars_by_code.get(code, empty_bars())
+        if inverted:
+            bars = invert_bars(bars)
+        result = bars if result is None else multiply_bars(result, bars)
+    return result
+
+
+def synthesize_quote(code: str, legs, quotes):
+    """
+    由各腿的实时行情换算交叉汇率行情
+    Args:
+        code: 交叉汇率代码
+        legs: find_legs 的结果
+        quotes: {同花顺代码: 行情字典（latest/changeRatio/open/high/low）}
+    Returns:
+        行情字典，任一腿缺少报价时返回 None
+    """
+    latest, open_, high, low, change = 1.0, 1.0, 1.0, 1.0, 1.0
+    for leg, inverted in legs:
+        quote = quotes.get(leg)
+        if not quote or not all(
+            quote.get(f) for f in ("latest", "open", "high", "low")
+        ):
+            return None
+        # 涨跌幅为百分比，换算为相对昨收的比值后相乘
+        ratio = 1 + (quote.get("changeRatio") or 0) / 100
+        if inverted:
+            latest /= quote["latest"]
+            open_ /= quote["open"]
+            high /= quote["low"]
+            low /= quote["high"]
+            change /= ratio
+        else:
+            latest *= quote["latest"]
+            open_ *= quote["open"]
+            high *= quote["high"]
+            low *= quote["low"]
+            change *= ratio
+    return {
+        "code": code,
+        "latest": latest,
+        "changeRatio": (change - 1) * 100,
+        "open": open_,
+        "high": max(high, latest, open_),
+        "low": min(low, latest, open_),
+        "synthetic": True,
+    }
@@ -0,0 +1,92 @@
+import numpy as np
+from utils.bar_utils import Bars
+from utils.resample import aggregate_bars
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样，保留折线的视觉形状
+    首末点固定保留，其余点均分为 threshold-2 个桶，每个桶选取与前一选中点、
+    下一个桶均值点构成三角形面积最大的点
+    Args:
+        x: 横坐标数组（升序）
+        y: 纵坐标数组（不含 NaN）
+        threshold: 目标点数
+    Returns:
+        选中点的下标数组（升序）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:threshold]
+
+    # 中间 n-2 个点划分为 threshold-2 个桶，edges[i]~edges[i+1] 为第 i 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # 各桶均值用前缀和一次算出
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_x = (cx[nhi] - cx[nlo]) / (nhi - nlo)
+            avg_y = (cy[nhi] - cy[nlo]) / (nhi - nlo)
+        else:
+            # 最后一个桶以末点作为下一个桶
+            avg_x, avg_y = x[-1], y[-1]
+
+        # 三角形面积（省略常数 1/2）
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(bars, max_points):
+    """
+    分时线降采样：按收盘价做 LTTB，收盘价缺失的K线不参与
+    Args:
+        bars: 按时间升序排列的 Bars
+        max_points: 最大点数
+    Returns:
+        选中K线组成的 Bars
+    """
+    valid = np.flatnonzero(~np.isnan(bars.close))
+    if len(valid) <= max_points:
+        return Bars(*(col[valid] for col in bars))
+    picked = valid[lttb_indices(bars.t[valid], bars.close[valid], max_points)]
+    return Bars(*(col[picked] for col in bars))
+
+
+def downsample_ohlc(bars, max_points):
+    """
+    K线降采样：相邻K线按等数量分组聚合，保留每组的开、高、低、收与成交量
+    Args:
+        bars: 按时间升序排列的 Bars
+        max_points: 最大K线数量
+    Returns:
+        聚合后的 Bars，时间为组内首根K线的时间
+    """
+    n = len(bars.t)
+    if n <= max_points or max_points < 1:
+        return bars
+    size = -(-n // max_points)
+    return aggregate_bars(bars, np.arange(0, n, size))
+
+
+def downsample_bars(bars, max_points, chart_type="line"):
+    """按图表类型降采样：分时线使用 LTTB，K线使用OHLC分组聚合"""
+    if not max_points or len(bars.t) <= max_points:
+        return bars
+    if chart_type == "kline":
+        return downsample_ohlc(bars, max_points)
+    return downsample_line(bars, max_points)
@@ -0,0 +1,105 @@
+import numpy as np
+from datetime import timedelta
+
+DAY = 86400
+WEEK = 7 * DAY
+
+# 1970-01-01 为周四，往前 3 天为周一
+_MONDAY_EPOCH = -3 * DAY
+
+
+class FXCalendar:
+    """外汇交易日历
+
+    外汇市场每周连续交易，只有一段固定的周末休市。K线时间戳按服务器本地时间换算，
+    默认周六 00:00 至周一 00:00 休市（日K线只有周一至周五），可按数据源调整，
+    如 FXCalendar(weekly_close=(5, 5 * 3600), weekly_open=(0, 5 * 3600))。
+
+    交易时间被映射为连续的“交易秒数”：N 根K线的时间跨度只需将结束时刻换算为
+    交易秒数，往前减去 N 个周期后再换算回实际时间，不需要逐根K线遍历。
+    """
+
+    def __init__(self, weekly_close=(5, 0), weekly_open=(0, 0)):
+        """
+        Args:
+            weekly_close: 每周收盘时刻 (星期, 当日秒数)，周一为 0
+            weekly_open: 每周开盘时刻 (星期, 当日秒数)，须与分钟K线周期对齐（整点）
+        """
+        open_offset = weekly_open[0] * DAY + weekly_open[1]
+        close_offset = weekly_close[0] * DAY + weekly_close[1]
+        self.weekly_close = weekly_close
+        self.weekly_open = weekly_open
+        # 每周的交易秒数，以及某次开盘的时间戳（换算交易秒数的原点）
+        self.session = (close_offset - open_offset) % WEEK
+        self._origin = _MONDAY_EPOCH + open_offset
+
+    def is_trading(self, ts):
+        """时间戳是否处于交易时段（支持数组）"""
+        return (
+            np.mod(np.asarray(ts, dtype=np.int64) - self._origin, WEEK) < self.session
+        )
+
+    def trading_seconds(self, ts):
+        """原点至 ts 之间的交易秒数（支持数组），休市期间保持为上次收盘时的值"""
+        weeks, rest = np.divmod(np.asarray(ts, dtype=np.int64) - self._origin, WEEK)
+        return weeks * self.session + np.minimum(rest, self.session)
+
+    def from_trading_seconds(self, seconds):
+        """交易秒数换算回时间戳（恰为收盘时刻的值换算为下一次开盘）"""
+        weeks, rest = np.divmod(np.asarray(seconds, dtype=np.int64), self.session)
+        return self._origin + weeks * WEEK + rest
+
+    def bars_start(self, end_ts: int, step: int, count: int):
+        """
+        截至 end_ts 的最近 count 根K线中第一根的开始时间
+        Args:
+            end_ts: 结束时间戳，交易时段内时包含正在形成的K线
+            step: K线周期（秒）
+            count: K线数量
+        Returns:
+            int 时间戳，[返回值, end_ts] 内恰好有 count 根交易时段的K线
+        """
+        if count <= 0:
+            return int(end_ts)
+        elapsed = int(self.trading_seconds(end_ts))
+        if self.is_trading(end_ts):
+            last = elapsed // step * step
+        else:
+            # 休市期间最近一根K线是收盘前的最后一根
+            last = elapsed - step
+        return int(self.from_trading_seconds(last - (count - 1) * step))
+
+    def trading_days(self, start_date, end_date):
+        """[start_date, end_date] 内的交易日（当日中午处于交易时段）"""
+        days = np.arange(
+            np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1
+        )
+        noon = days.astype(np.int64) * DAY + DAY // 2
+        return days[self.is_trading(noon)]
+
+    def kline_start(self, period: str, count: int, end_date):
+        """
+        截至 end_date 的最近 count 根日线及以上周期K线所覆盖的第一天
+        Args:
+            period: 1d/1w/1m/1q/1y
+            count: K线数量
+            end_date: 结束日期（date）
+        Returns:
+            起始日期（date）
+        """
+        count = max(count, 1)
+        if period == "1d":
+            # 每周至少一个交易日，按周数放宽候选范围后取倒数第 count 个交易日
+            weeks = count // max(self.session // DAY, 1) + 2
+            days = self.trading_days(end_date - timedelta(weeks=weeks), end_date)
+            return days[-count].astype(object)
+        if period == "1w":
+            monday = end_date - timedelta(days=end_date.weekday())
+            return monday - timedelta(weeks=count - 1)
+
+        months = {"1m": 1, "1q": 3, "1y": 12}.get(period)
+        if months is None:
+            raise ValueError(f"不支持的K线周期: {period}")
+        month = np.datetime64(end_date, "M").astype(np.int64)
+        first = month - month % months - (count - 1) * months
+        return np.datetime64(int(first), "M").astype("datetime64[D]").astype(object)
@@ -0,0 +1,263 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 各指标的默认参数
+DEFAULT_PARAMS = {
+    "MA": (20,),
+    "SMA": (20,),
+    "EMA": (12,),
+    "MACD": (12, 26, 9),
+    "RSI": (14,),
+    "BOLL": (20, 2),
+    "ATR": (14,),
+}
+
+
+def ewm(values, alpha):
+    """
+    指数加权移动平均 y[i] = alpha * x[i] + (1 - alpha) * y[i-1]，y[0] = x[0]
+    分块使用闭式解向量化计算，每块长度保证衰减因子不会溢出
+    Args:
+        values: float64 数组
+        alpha: 平滑系数 (0, 1]
+    Returns:
+        与 values 等长的数组
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    out = np.empty(n)
+    if n == 0:
+        return out
+
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = x
+        return out
+
+    # 块内 decay**-k 不超过 e**200
+    block = max(1, min(n, int(200 / -np.log(decay))))
+    powers = decay ** np.arange(block)
+    carry = x[0]
+    start = 0
+    while start < n:
+        chunk = x[start : start + block]
+        size = len(chunk)
+        p = powers[:size]
+        # y_i = decay**i * (decay * carry + alpha * sum_{k<=i} x_k * decay**-k)
+        acc = np.cumsum(chunk / p) * alpha + decay * carry
+        out[start : start + size] = acc * p
+        carry = out[start + size - 1]
+        start += size
+    return out
+
+
+def sma(close, period):
+    """
+    简单移动平均
+    Args:
+        close: 收盘价数组
+        period: 周期
+    Returns:
+        SMA 数组，前 period-1 个值为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if period <= 0 or len(close) < period:
+        return out
+    csum = np.cumsum(np.concatenate(([0.0], close)))
+    out[period - 1 :] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def ema(close, period):
+    """
+    指数移动平均，alpha = 2 / (period + 1)，以首个收盘价作为初值
+    Args:
+        close: 收盘价数组
+        period: 周期
+    Returns:
+        EMA 数组
+    """
+    return ewm(close, 2.0 / (period + 1))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+    MACD 指标
+    公式：DIF = EMA(fast) - EMA(slow)，DEA = EMA(DIF, signal)，MACD = 2 × (DIF - DEA)
+    Args:
+        close: 收盘价数组
+        fast: 快线周期
+        slow: 慢线周期
+        signal: 信号线周期
+    Returns:
+        (DIF, DEA, MACD) 三个数组
+    """
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, 2.0 * (dif - dea)
+
+
+def rsi(close, period=14):
+    """
+    相对强弱指标（Wilder 平滑）
+    Args:
+        close: 收盘价数组
+        period: 周期
+    Returns:
+        RSI 数组（0~100），前 period 个值为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+
+    diff = np.diff(close)
+    gains = np.clip(diff, 0, None)
+    losses = np.clip(-diff, 0, None)
+
+    # 以前 period 个变动的均值作为初值，之后按 1/period 递推
+    seed_gain = gains[:period].mean()
+    seed_loss = losses[:period].mean()
+    avg_gain = ewm(np.concatenate(([seed_gain], gains[period:])), 1.0 / period)
+    avg_loss = ewm(np.concatenate(([seed_loss], losses[period:])), 1.0 / period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    value = np.where(avg_loss == 0, 100.0, value)
+    value = np.where((avg_gain == 0) & (avg_loss == 0), 50.0, value)
+    out[period:] = value
+    return out
+
+
+def bollinger(close, period=20, width=2.0):
+    """
+    布林带
+    Args:
+        close: 收盘价数组
+        period: 周期
+        width: 标准差倍数
+    Returns:
+        (上轨, 中轨, 下轨) 三个数组
+    """
+    close = np.asarray(close, dtype=np.float64)
+    mid = sma(close, period)
+    std = np.full(len(close), np.nan)
+    if period > 0 and len(close) >= period:
+        std[period - 1 :] = sliding_window_view(close, period).std(axis=1)
+    return mid + width * std, mid, mid - width * std
+
+
+def atr(high, low, close, period=14):
+    """
+    平均真实波幅（Wilder 平滑）
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        period: 周期
+    Returns:
+        ATR 数组，前 period-1 个值为 NaN
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) < period:
+        return out
+
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    tr = np.maximum(
+        high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+    tr[0] = high[0] - low[0]
+
+    seed = tr[:period].mean()
+    out[period - 1 :] = ewm(np.concatenate(([seed], tr[period:])), 1.0 / period)
+    return out
+
+
+def parse_indicator_specs(text):
+    """
+    解析指标描述字符串，例如 "MA:20,MACD:12-26-9,RSI,BOLL:20-2"
+    Args:
+        text: 逗号分隔的指标描述，参数用 "-" 分隔
+    Returns:
+        [(指标名, 参数元组)] 列表
+    """
+    specs = []
+    for item in (text or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, params = item.partition(":")
+        name = name.strip().upper()
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"不支持的技术指标: {name}")
+        values = [float(p) for p in params.split("-") if p.strip()]
+        specs.append((name, normalize_params(name, values)))
+    return specs
+
+
+def indicator_labels(specs):
+    """
+    生成指标在响应中的键名：同名指标只出现一次时用小写名称，否则附加参数
+    Args:
+        specs: [(指标名, 参数元组)]
+    Returns:
+        与 specs 一一对应的键名列表
+    """
+    names = [name for name, _ in specs]
+    labels = []
+    for name, params in specs:
+        label = name.lower()
+        if names.count(name) > 1:
+            label += "_" + "_".join(f"{p:g}" for p in params)
+        labels.append(label)
+    return labels
+
+
+def normalize_params(name, values):
+    """用默认参数补齐指标参数，周期类参数取整"""
+    defaults = DEFAULT_PARAMS[name]
+    merged = list(values[: len(defaults)]) + list(defaults[len(values) :])
+    if name == "BOLL":
+        return (int(merged[0]), float(merged[1]))
+    return tuple(int(v) for v in merged)
+
+
+def warmup_bars(name, params):
+    """指标在输出窗口之前需要额外获取的K线数量，保证首个输出值已收敛"""
+    if name in ("MA", "SMA", "BOLL"):
+        return params[0]
+    if name == "MACD":
+        return params[1] * 4 + params[2] * 4
+    return params[0] * 4
+
+
+def compute_indicator(name, params, bars):
+    """
+    基于K线计算单个指标
+    Args:
+        name: 指标名（MA/SMA/EMA/MACD/RSI/BOLL/ATR）
+        params: 参数元组
+        bars: Bars（收盘价中不应含 NaN）
+    Returns:
+        {列名: 数组} 字典
+    """
+    close = bars.close
+    if name in ("MA", "SMA"):
+        return {name: sma(close, params[0])}
+    if name == "EMA":
+        return {"EMA": ema(close, params[0])}
+    if name == "MACD":
+        dif, dea, hist = macd(close, *params)
+        return {"MACD": hist, "DIF": dif, "DEA": dea}
+    if name == "RSI":
+        return {"RSI": rsi(close, params[0])}
+    if name == "BOLL":
+        upper, mid, lower = bollinger(close, *params)
+        return {"UPPER": upper, "MID": mid, "LOWER": lower}
+    if name == "ATR":
+        return {"ATR": atr(bars.high, bars.low, close, params[0])}
+    raise ValueError(f"不支持的技术指标: {name}")
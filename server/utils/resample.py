@@ -0,0 +1,88 @@
+import numpy as np
+from utils.bar_utils import Bars, empty_bars
+
+# 日线及以上周期对应的 numpy 日历单位
+CALENDAR_UNITS = {"1d": "D", "1w": "W", "1m": "M", "1q": "Q", "1y": "Y"}
+
+_SECONDS_PER_DAY = 86400
+# 1970-01-01 是星期四，向前偏移 3 天使周线以星期一为起点
+_WEEK_OFFSET_DAYS = 3
+
+
+def bucket_starts(t, rule):
+    """
+    计算每根K线所属聚合区间的起始时间戳
+    Args:
+        t: int64 时间戳数组（秒）
+        rule: 分钟数（int）或日历周期（"1d"/"1w"/"1m"/"1q"/"1y"）
+    Returns:
+        与 t 等长的 int64 区间起点数组
+    """
+    t = np.asarray(t, dtype=np.int64)
+    if isinstance(rule, (int, np.integer)):
+        width = int(rule) * 60
+        return t - np.mod(t, width)
+
+    unit = CALENDAR_UNITS.get(rule)
+    if unit is None:
+        raise ValueError(f"不支持的重采样周期: {rule}")
+
+    days = np.floor_divide(t, _SECONDS_PER_DAY)
+    if unit == "D":
+        start_days = days
+    elif unit == "W":
+        start_days = days - np.mod(days + _WEEK_OFFSET_DAYS, 7)
+    else:
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        if unit == "Q":
+            months = months - np.mod(months, 3)
+        elif unit == "Y":
+            months = months - np.mod(months, 12)
+        start_days = months.astype("datetime64[M]").astype("datetime64[D]")
+        start_days = start_days.astype(np.int64)
+
+    return start_days * _SECONDS_PER_DAY
+
+
+def resample_bars(bars, rule):
+    """
+    将细粒度K线聚合为粗粒度K线（开=首个，高=最大，低=最小，收=最后，量=求和）
+    Args:
+        bars: 按时间升序排列的 Bars
+        rule: 分钟数（int）或日历周期（"1d"/"1w"/"1m"/"1q"/"1y"）
+    Returns:
+        聚合后的 Bars。分钟周期的时间戳为区间起点；日线及以上周期与上游一致，
+        为区间内最后一根K线所在的日期（即最后一个交易日）
+    """
+    if len(bars.t) == 0:
+        return empty_bars()
+
+    keys = bucket_starts(bars.t, rule)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    if isinstance(rule, (int, np.integer)):
+        return aggregate_bars(bars, starts, keys[starts])
+    ends = np.concatenate((starts[1:], [len(bars.t)])) - 1
+    return aggregate_bars(bars, starts, bucket_starts(bars.t[ends], "1d"))
+
+
+def aggregate_bars(bars, starts, t=None):
+    """
+    按分组起始下标聚合连续K线（开=首个，高=最大，低=最小，收=最后，量=求和）
+    Args:
+        bars: 按时间升序排列的 Bars
+        starts: 各组起始下标（升序，首个为 0）
+        t: 各组的时间戳，默认取组内首根K线的时间
+    Returns:
+        聚合后的 Bars
+    """
+    ends = np.concatenate((starts[1:], [len(bars.t)])) - 1
+
+    # 缺失值不参与最高/最低价比较；成交量缺失按 0 计
+    return Bars(
+        bars.t[starts] if t is None else t,
+        bars.open[starts],
+        np.fmax.reduceat(bars.high, starts),
+        np.fmin.reduceat(bars.low, starts),
+        bars.close[ends],
+        np.add.reduceat(np.nan_to_num(bars.volume), starts),
+    )